@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import datetime
+import importlib.util
+import json
+import pathlib
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import func, update
+from sqlmodel import select
+
+from digimon import models, config, main, security
+
+
+# Requests go through the same in-process ASGI transport as the tests, so the
+# numbers cover routing, validation, dependencies, serialization and the
+# database, without sockets or a server in the way.
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def load_generator():
+    path = pathlib.Path(__file__).with_name("generate-data.py")
+    spec = importlib.util.spec_from_file_location("generate_data", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=pathlib.Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def build_dataset(args, settings, transactions):
+    generator = load_generator()
+    models.init_db(settings)
+    await generator.generate(
+        argparse.Namespace(
+            seed=args.seed,
+            merchants=max(10, transactions // 1_000),
+            customers=max(max(args.concurrency), transactions // 10),
+            items=20,
+            transactions=transactions,
+            zipf_s=1.1,
+            cart_alpha=2.0,
+            max_cart_size=50,
+            password="password",
+            bcrypt_rounds=args.bcrypt_rounds,
+            batch_size=20_000,
+        )
+    )
+
+
+async def prepare(client_count):
+    async with models.sessionmanager.session() as session:
+        result = await session.exec(
+            select(models.DBUser.id, models.DBUser.username)
+            .where(models.DBUser.role == models.UserRole.customer)
+            .order_by(models.DBUser.id)
+            .limit(client_count)
+        )
+        customers = result.all()
+
+        # enough money that /buy never fails for lack of balance
+        await session.exec(
+            update(models.DBWallet)
+            .where(models.DBWallet.user_id.in_([user_id for user_id, _ in customers]))
+            .values(balance=1_000_000_000.0)
+        )
+        await session.commit()
+
+        max_item_id = (await session.exec(select(func.max(models.DBItem.id)))).one()
+
+    clients = [
+        dict(
+            username=username,
+            headers={
+                "Authorization": "Bearer "
+                + security.create_access_token(data={"sub": user_id})
+            },
+        )
+        for user_id, username in customers
+    ]
+    return clients, max_item_id
+
+
+def scenarios(max_item_id):
+    async def token(client, user, rng):
+        return await client.post(
+            "/token", data=dict(username=user["username"], password="password")
+        )
+
+    async def buy(client, user, rng):
+        return await client.post(
+            "/buy", json=dict(item_id=rng.randint(1, max_item_id)), headers=user["headers"]
+        )
+
+    async def read_items(client, user, rng):
+        return await client.get("/items", params=dict(page=1))
+
+    async def read_item(client, user, rng):
+        return await client.get(f"/items/{rng.randint(1, max_item_id)}")
+
+    async def me(client, user, rng):
+        return await client.get("/users/me", headers=user["headers"])
+
+    async def wallet_add(client, user, rng):
+        return await client.put(
+            "/wallets/add", json=dict(balance=1.0), headers=user["headers"]
+        )
+
+    return {
+        "token": token,
+        "buy": buy,
+        "items": read_items,
+        "item": read_item,
+        "me": me,
+        "wallet_add": wallet_add,
+    }
+
+
+async def measure(client, scenario, clients, concurrency, requests, seed):
+    latencies = []
+    statuses = {}
+    remaining = requests
+
+    async def worker(index):
+        nonlocal remaining
+        rng = random.Random(seed * 1_000 + index)
+        user = clients[index % len(clients)]
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await scenario(client, user, rng)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker(index) for index in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    return dict(
+        requests=len(latencies),
+        statuses={str(code): count for code, count in sorted(statuses.items())},
+        elapsed=round(elapsed, 3),
+        throughput=round(len(latencies) / elapsed, 1),
+        mean_ms=round(statistics.fmean(latencies), 2),
+        p50_ms=round(percentile(latencies, 50), 2),
+        p95_ms=round(percentile(latencies, 95), 2),
+        p99_ms=round(percentile(latencies, 99), 2),
+        max_ms=round(max(latencies), 2),
+    )
+
+
+async def run_size(args, transactions):
+    # the tables come from create_all, not from the migrations
+    settings = config.Settings(
+        SQLDB_URL=args.url, RATE_LIMIT_ENABLED=False, SCHEMA_CHECK=False
+    )
+    if args.no_cache:
+        settings.ITEM_CACHE_SIZE = 0
+        settings.PRINCIPAL_CACHE_SIZE = 0
+
+    await build_dataset(args, settings, transactions)
+    app = main.create_app(settings)
+    clients, max_item_id = await prepare(max(args.concurrency))
+
+    results = []
+    # the lifespan runs the job workers, the login flusher and the other
+    # background tasks as under a server, and closes the database after them
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(
+            transport=ASGITransport(app=app), base_url="http://localhost"
+        ) as client:
+            for name, scenario in scenarios(max_item_id).items():
+                if args.endpoints and name not in args.endpoints:
+                    continue
+
+                requests = args.requests
+                if name == "token":
+                    # every request is a full bcrypt verification
+                    requests = max(1, requests // args.token_divisor)
+
+                await measure(client, scenario, clients, 1, min(20, requests), args.seed)
+                for concurrency in args.concurrency:
+                    result = dict(
+                        endpoint=name,
+                        transactions=transactions,
+                        concurrency=concurrency,
+                        **await measure(
+                            client, scenario, clients, concurrency, requests, args.seed
+                        ),
+                    )
+                    results.append(result)
+                    print(
+                        f"size={transactions:<9} {name:<11} c={concurrency:<4} "
+                        f"req/s={result['throughput']:<9} p50={result['p50_ms']:<8} "
+                        f"p95={result['p95_ms']:<8} p99={result['p99_ms']:<8} "
+                        f"statuses={result['statuses']}"
+                    )
+
+    return results
+
+
+def compare(baseline_path, results):
+    with open(baseline_path) as source:
+        baseline = {
+            (r["endpoint"], r["transactions"], r["concurrency"]): r
+            for r in json.load(source)["results"]
+        }
+
+    print(f"\ncompared with {baseline_path}")
+    for result in results:
+        old = baseline.get((result["endpoint"], result["transactions"], result["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"size={result['transactions']:<9} {result['endpoint']:<11} "
+            f"c={result['concurrency']:<4} "
+            f"req/s x{result['throughput'] / old['throughput']:.2f} "
+            f"p50 x{result['p50_ms'] / old['p50_ms']:.2f} "
+            f"p99 x{result['p99_ms'] / old['p99_ms']:.2f}"
+        )
+
+
+async def run(args):
+    results = []
+    for transactions in args.sizes:
+        results.extend(await run_size(args, transactions))
+
+    report = dict(
+        commit=git_commit(),
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        args=vars(args),
+        results=results,
+    )
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure throughput and p50/p95/p99 latency of the hot API "
+        "paths in process. Recreates all tables for every dataset size."
+    )
+    parser.add_argument("--url", default="sqlite+aiosqlite:///./benchmark.db")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 1_000_000],
+        help="transactions in the generated dataset",
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=500, help="per endpoint and level")
+    parser.add_argument(
+        "--token-divisor", type=int, default=10, help="/token runs requests / this"
+    )
+    parser.add_argument("--endpoints", nargs="+", help="default: all")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--no-cache", action="store_true", help="disable response caches")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-api.json")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
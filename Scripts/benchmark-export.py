@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import datetime
+import os
+import resource
+import time
+
+from sqlalchemy import insert
+
+from digimon import models, config, exports
+
+
+async def seed(rows, batch_size=50_000):
+    await models.recreate_table()
+    created_at = datetime.datetime.now()
+    async with models.sessionmanager.session() as session:
+        for start in range(0, rows, batch_size):
+            await session.exec(
+                insert(models.DBTransection),
+                params=[
+                    dict(
+                        item_id=i % 1_000 + 1,
+                        price=float(i % 100),
+                        merchant_id=i % 50 + 1,
+                        customer_id=i % 10_000 + 1,
+                        description=None,
+                        created_at=created_at,
+                    )
+                    for i in range(start, min(start + batch_size, rows))
+                ],
+            )
+            await session.commit()
+
+
+async def export(format, chunk_size):
+    encode = exports.encode_csv if format == "csv" else exports.encode_ndjson
+    count = 0
+    started = time.perf_counter()
+
+    with open(os.devnull, "w") as output:
+        async with models.sessionmanager.session() as session:
+            statement = exports.export_statement()
+            async for rows in exports.iter_chunks(session, statement, chunk_size):
+                output.write(encode(rows))
+                count += len(rows)
+
+    elapsed = time.perf_counter() - started
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{format:>6} chunk={chunk_size:<6} rows={count} elapsed={elapsed:.2f}s "
+        f"rows/sec={count / elapsed:.0f} max_rss={max_rss:.0f}MB"
+    )
+
+
+async def run(args):
+    await seed(args.rows)
+    for format in args.formats:
+        for chunk_size in args.chunk_size:
+            await export(format, chunk_size)
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recreate all tables in the benchmark database, seed synthetic "
+        "transactions and time streaming them out in keyset chunks."
+    )
+    parser.add_argument("--url", default="sqlite+aiosqlite:///./benchmark.db")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument(
+        "--formats", nargs="+", choices=["ndjson", "csv"], default=["ndjson", "csv"]
+    )
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[exports.CHUNK_SIZE])
+    args = parser.parse_args()
+
+    settings = config.Settings(SQLDB_URL=args.url)
+    models.init_db(settings)
+    asyncio.run(run(args))
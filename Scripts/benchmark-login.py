@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient, ASGITransport
+
+from digimon import models, config, main, security
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def seed(user_count):
+    password = await security.hash_password("password")
+    async with models.sessionmanager.session() as session:
+        user = models.DBUser(
+            username="bench-merchant",
+            email="bench-merchant@email.local",
+            first_name="Bench",
+            last_name="Merchant",
+            password=password,
+            role=models.UserRole.merchant,
+        )
+        merchant = models.DBMerchant(name="bench-merchant", user=user)
+        item = models.DBItem(
+            name="bench-item",
+            price=1.0,
+            user=user,
+            merchant=merchant,
+            role=models.UserRole.merchant,
+        )
+        session.add_all([user, merchant, item])
+
+        for i in range(user_count):
+            session.add(
+                models.DBUser(
+                    username=f"bench-user{i}",
+                    email=f"bench-user{i}@email.local",
+                    first_name="Bench",
+                    last_name="User",
+                    password=password,
+                    role=models.UserRole.customer,
+                )
+            )
+
+        await session.commit()
+        return item.id
+
+
+async def probe(client, item_id, stop):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(f"/items/{item_id}")
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+async def login(client, i, stop, results):
+    while not stop.is_set():
+        response = await client.post(
+            "/token", data=dict(username=f"bench-user{i}", password="password")
+        )
+        results[response.status_code] = results.get(response.status_code, 0) + 1
+
+
+async def phase(client, item_id, logins, seconds):
+    stop = asyncio.Event()
+    results = {}
+    probe_task = asyncio.create_task(probe(client, item_id, stop))
+    login_tasks = [
+        asyncio.create_task(login(client, i, stop, results)) for i in range(logins)
+    ]
+
+    await asyncio.sleep(seconds)
+    stop.set()
+    latencies = await probe_task
+    await asyncio.gather(*login_tasks)
+
+    print(
+        f"logins={logins:<4} probe p50={percentile(latencies, 50):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms "
+        f"login responses={dict(sorted(results.items()))}"
+    )
+
+
+async def run(args, app):
+    await models.recreate_table()
+    item_id = await seed(args.logins)
+
+    if args.inline:
+        # the pre-offload behaviour: bcrypt runs on the event loop
+        async def inline(func, *func_args):
+            return func(*func_args)
+
+        security.get_password_hasher().run = inline
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://localhost"
+    ) as client:
+        await phase(client, item_id, 0, args.seconds)
+        await phase(client, item_id, args.logins, args.seconds)
+
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure GET /items/{id} latency during a /token login storm. "
+        "Recreates all tables."
+    )
+    parser.add_argument("--url", default="sqlite+aiosqlite:///./benchmark.db")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent logins")
+    parser.add_argument("--seconds", type=float, default=5.0, help="per phase")
+    parser.add_argument(
+        "--inline", action="store_true", help="hash on the event loop for comparison"
+    )
+    args = parser.parse_args()
+
+    # one client logging in as fast as it can is what the limiter refuses
+    settings = config.Settings(SQLDB_URL=args.url, RATE_LIMIT_ENABLED=False)
+    app = main.create_app(settings)
+    asyncio.run(run(args, app))
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import time
+
+from digimon import models, config, purchases
+
+
+async def seed(merchant_count, customer_count):
+    async with models.sessionmanager.session() as session:
+        items = []
+        for i in range(merchant_count):
+            user = models.DBUser(
+                username=f"bench-merchant{i}",
+                email=f"bench-merchant{i}@email.local",
+                first_name="Bench",
+                last_name="Merchant",
+                password="-",
+                role=models.UserRole.merchant,
+            )
+            merchant = models.DBMerchant(name=f"bench-merchant{i}", user=user)
+            wallet = models.DBWallet(balance=0.0, user=user, role=models.UserRole.merchant)
+            item = models.DBItem(
+                name=f"bench-item{i}",
+                price=1.0,
+                user=user,
+                merchant=merchant,
+                role=models.UserRole.merchant,
+            )
+            session.add_all([user, merchant, wallet, item])
+            items.append(item)
+
+        customers = []
+        for i in range(customer_count):
+            user = models.DBUser(
+                username=f"bench-customer{i}",
+                email=f"bench-customer{i}@email.local",
+                first_name="Bench",
+                last_name="Customer",
+                password="-",
+                role=models.UserRole.customer,
+            )
+            customer = models.DBCustomer(name=f"bench-customer{i}", user=user)
+            wallet = models.DBWallet(
+                balance=1_000_000_000.0, user=user, role=models.UserRole.customer
+            )
+            session.add_all([user, customer, wallet])
+            customers.append(user)
+
+        await session.commit()
+        return [item.id for item in items], [user.id for user in customers]
+
+
+async def client(customer_user_id, item_ids, purchases_per_client):
+    async with models.sessionmanager.session() as session:
+        for i in range(purchases_per_client):
+            item_id = item_ids[i % len(item_ids)]
+            await purchases.purchase_item(
+                session,
+                customer_user_id,
+                models.CreatedTransaction(item_id=item_id),
+            )
+
+
+async def run(args):
+    await models.recreate_table()
+    item_ids, customer_user_ids = await seed(args.merchants, max(args.concurrency))
+
+    for concurrency in args.concurrency:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *[
+                client(
+                    customer_user_ids[i],
+                    item_ids[i % len(item_ids):] + item_ids[: i % len(item_ids)],
+                    args.purchases,
+                )
+                for i in range(concurrency)
+            ]
+        )
+        elapsed = time.perf_counter() - started
+        total = concurrency * args.purchases
+        print(
+            f"clients={concurrency:<4} purchases={total:<7} "
+            f"elapsed={elapsed:.2f}s purchases/sec={total / elapsed:.1f}"
+        )
+
+    if args.cart_size:
+        await compare_cart(customer_user_ids[0], item_ids, args.cart_size)
+
+    await models.close_session()
+
+
+async def compare_cart(customer_user_id, item_ids, cart_size):
+    cart_item_ids = [item_ids[i % len(item_ids)] for i in range(cart_size)]
+
+    async with models.sessionmanager.session() as session:
+        started = time.perf_counter()
+        for item_id in cart_item_ids:
+            await purchases.purchase_item(
+                session,
+                customer_user_id,
+                models.CreatedTransaction(item_id=item_id),
+            )
+        single = time.perf_counter() - started
+
+        cart = models.CreatedCart(
+            items=[models.CartItem(item_id=item_id) for item_id in cart_item_ids]
+        )
+        started = time.perf_counter()
+        await purchases.purchase_cart(session, customer_user_id, cart)
+        batch = time.perf_counter() - started
+
+    print(
+        f"cart_size={cart_size:<4} "
+        f"single per-item={single / cart_size * 1000:.2f}ms "
+        f"batch per-item={batch / cart_size * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure POST /buy purchase throughput. Recreates all tables."
+    )
+    parser.add_argument("--url", default="sqlite+aiosqlite:///./benchmark.db")
+    parser.add_argument("--merchants", type=int, default=64)
+    parser.add_argument("--purchases", type=int, default=200, help="per client")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument(
+        "--cart-size",
+        type=int,
+        default=20,
+        help="compare one POST /buy/batch cart against this many single purchases",
+    )
+    args = parser.parse_args()
+
+    settings = config.Settings(SQLDB_URL=args.url)
+    models.init_db(settings)
+    asyncio.run(run(args))
@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import datetime
+import importlib.util
+import json
+import os
+import pathlib
+import platform
+import shlex
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+from sqlalchemy import func
+from sqlmodel import select
+
+from digimon import models, config
+
+
+# Unlike benchmark-api.py this goes over real sockets to a separately started
+# server, so it measures the server setup itself: the gevent patched single
+# uvicorn process the app used to run under, against digimon.server with a
+# number of workers.
+
+CURRENT = (
+    "from gevent import monkey; monkey.patch_all(); import uvicorn; "
+    "uvicorn.run('digimon.main:create_app', factory=True, host='127.0.0.1', "
+    "port={port}, log_level='warning')"
+)
+
+
+def load_script(name):
+    path = pathlib.Path(__file__).with_name(f"{name}.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+benchmark_api = load_script("benchmark-api")
+
+
+async def build_dataset(args):
+    generator = benchmark_api.load_generator()
+    models.init_db(config.Settings(SQLDB_URL=args.url))
+    await generator.generate(
+        argparse.Namespace(
+            seed=args.seed,
+            merchants=max(10, args.transactions // 1_000),
+            customers=max(10, args.transactions // 10),
+            items=20,
+            transactions=args.transactions,
+            zipf_s=1.1,
+            cart_alpha=2.0,
+            max_cart_size=50,
+            password="password",
+            bcrypt_rounds=4,
+            batch_size=20_000,
+        )
+    )
+    models.init_db(config.Settings(SQLDB_URL=args.url))
+    async with models.sessionmanager.session() as session:
+        max_item_id = (
+            await session.exec(select(func.max(models.DBItem.id)))
+        ).one()
+    await models.close_session()
+    return max_item_id
+
+
+def setups(args):
+    python = shlex.split(args.python)
+    yield "current", python + ["-c", CURRENT.format(port=args.port)]
+    for workers in args.workers:
+        yield f"workers={workers}", python + [
+            "-m",
+            "digimon.server",
+            "--port",
+            str(args.port),
+            "--workers",
+            str(workers),
+        ]
+
+
+async def wait_ready(client, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            response = await client.get("/metrics")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def scenarios(max_item_id):
+    async def read_items(client, user, rng):
+        return await client.get("/items", params=dict(page=1))
+
+    async def read_item(client, user, rng):
+        return await client.get(f"/items/{rng.randint(1, max_item_id)}")
+
+    async def read_merchants(client, user, rng):
+        return await client.get("/merchants")
+
+    return {"items": read_items, "item": read_item, "merchants": read_merchants}
+
+
+async def run_setup(args, name, command, max_item_id):
+    env = dict(
+        os.environ,
+        SQLDB_URL=args.url,
+        DB_MAX_CONNECTIONS=str(args.db_connections),
+        WEB_MAX_REQUESTS="0",
+        SCHEMA_CHECK="false",
+        RATE_LIMIT_ENABLED="false",
+    )
+    process = subprocess.Popen(command, env=env, start_new_session=True)
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=max(args.concurrency))
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60
+        ) as client:
+            await wait_ready(client, process)
+            try:
+                await client.get("/merchants", timeout=args.probe_timeout)
+            except httpx.TimeoutException:
+                # the old setup: gevent turns the driver thread of aiosqlite
+                # into a greenlet that never runs while the event loop waits
+                print(f"{name:<11} database requests do not complete")
+                return [dict(setup=name, error="database requests time out")]
+
+            for endpoint, scenario in scenarios(max_item_id).items():
+                if args.endpoints and endpoint not in args.endpoints:
+                    continue
+
+                await benchmark_api.measure(client, scenario, [None], 1, 20, args.seed)
+                for concurrency in args.concurrency:
+                    result = dict(
+                        setup=name,
+                        endpoint=endpoint,
+                        concurrency=concurrency,
+                        **await benchmark_api.measure(
+                            client, scenario, [None], concurrency, args.requests, args.seed
+                        ),
+                    )
+                    results.append(result)
+                    print(
+                        f"{name:<11} {endpoint:<10} c={concurrency:<4} "
+                        f"req/s={result['throughput']:<9} p50={result['p50_ms']:<8} "
+                        f"p95={result['p95_ms']:<8} p99={result['p99_ms']:<8} "
+                        f"statuses={result['statuses']}"
+                    )
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    return results
+
+
+async def run(args):
+    max_item_id = await build_dataset(args)
+
+    results = []
+    for name, command in setups(args):
+        if args.setups and name not in args.setups:
+            continue
+        results.extend(await run_setup(args, name, command, max_item_id))
+
+    report = dict(
+        commit=benchmark_api.git_commit(),
+        date=datetime.datetime.now().isoformat(timespec="seconds"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        args=vars(args),
+        results=results,
+    )
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"\nwrote {args.output}")
+
+    baseline = {
+        (r["endpoint"], r["concurrency"]): r
+        for r in results
+        if r["setup"] == "current" and "error" not in r
+    }
+    for result in results:
+        old = baseline.get((result.get("endpoint"), result.get("concurrency")))
+        if old is None or result is old:
+            continue
+        print(
+            f"{result['setup']:<11} {result['endpoint']:<10} c={result['concurrency']:<4} "
+            f"req/s x{result['throughput'] / old['throughput']:.2f} "
+            f"p99 x{result['p99_ms'] / old['p99_ms']:.2f} vs current"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the old gevent patched uvicorn process with the "
+        "multi-worker launcher over HTTP. Recreates all tables in --url."
+    )
+    parser.add_argument("--url", default="sqlite+aiosqlite:///./benchmark-server.db")
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--setups", nargs="+", help="default: all, e.g. current workers=4")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=2_000, help="per endpoint and level")
+    parser.add_argument("--endpoints", nargs="+", help="default: all")
+    parser.add_argument("--db-connections", type=int, default=20, help="for all workers together")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--probe-timeout", type=float, default=10, help="seconds for the first DB request"
+    )
+    parser.add_argument("--python", default=sys.executable, help="command that starts the servers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark-server.json")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
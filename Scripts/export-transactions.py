@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import resource
+import sys
+import time
+
+from digimon import models, config, exports
+
+
+async def export(args, output):
+    count = 0
+    started = time.perf_counter()
+
+    async with models.sessionmanager.session() as session:
+        statement = exports.export_statement(
+            merchant_id=args.merchant_id,
+            customer_id=args.customer_id,
+            min_id=args.min_id,
+            max_id=args.max_id,
+        )
+        if args.format == "csv":
+            output.write(exports.encode_csv([], header=True))
+        async for rows in exports.iter_chunks(session, statement, args.chunk_size):
+            if args.format == "csv":
+                output.write(exports.encode_csv(rows))
+            else:
+                output.write(exports.encode_ndjson(rows))
+            count += len(rows)
+
+    elapsed = time.perf_counter() - started
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"rows={count} elapsed={elapsed:.2f}s rows/sec={count / elapsed:.0f} "
+        f"max_rss={max_rss:.0f}MB",
+        file=sys.stderr,
+    )
+
+
+async def run(args):
+    if args.output == "-":
+        await export(args, sys.stdout)
+    else:
+        with open(args.output, "w", newline="") as output:
+            await export(args, output)
+
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream transactions as NDJSON or CSV in keyset chunks."
+    )
+    parser.add_argument("--url", help="defaults to SQLDB_URL from the settings")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--output", default="-", help="file path, - for stdout")
+    parser.add_argument("--merchant-id", type=int)
+    parser.add_argument("--customer-id", type=int)
+    parser.add_argument("--min-id", type=int)
+    parser.add_argument("--max-id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=exports.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    settings = config.get_settings() if args.url is None else config.Settings(SQLDB_URL=args.url)
+    models.init_db(settings)
+    asyncio.run(run(args))
@@ -0,0 +1,271 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import math
+import random
+import time
+
+import bcrypt
+from sqlalchemy import insert
+
+from digimon import models, config, sales
+
+
+BCRYPT_ALPHABET = "./ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
+
+EPOCH = datetime.datetime(2024, 1, 1)
+TOP_UP = 100.0
+
+# Every value below comes from one random.Random(seed), drawn in a fixed
+# order, so the same arguments always produce the same rows. Ids are assigned
+# here instead of by the database, which lets each table be loaded with plain
+# batched executemany INSERTs without reading anything back.
+
+
+def password_hash(rng, password, rounds):
+    # bcrypt salts are random by design; draw one from the seed instead (the
+    # last character only carries two bits, hence the short alphabet)
+    salt = "".join(rng.choice(BCRYPT_ALPHABET) for _ in range(21)) + rng.choice(".Oeu")
+    return bcrypt.hashpw(
+        password.encode("utf-8"), f"$2b${rounds:02d}${salt}".encode("ascii")
+    ).decode("utf-8")
+
+
+def zipf_cum_weights(n, s):
+    total = 0.0
+    cum_weights = []
+    for rank in range(1, n + 1):
+        total += 1.0 / rank**s
+        cum_weights.append(total)
+    return cum_weights
+
+
+def heavy_tail(rng, alpha, cap):
+    # 1 most of the time, occasionally large: a Pareto tail capped at cap
+    return min(cap, int(rng.paretovariate(alpha)))
+
+
+class Loader:
+    def __init__(self, connection, batch_size):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.counts = {}
+
+    async def load(self, table, rows):
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, self.batch_size)):
+            await self.connection.execute(insert(table), batch)
+            self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+        await self.connection.commit()
+
+
+async def generate(args):
+    rng = random.Random(args.seed)
+    hashed_password = password_hash(rng, args.password, args.bcrypt_rounds)
+
+    merchant_count = args.merchants
+    customer_count = args.customers
+
+    # merchant popularity follows Zipf, with ranks shuffled so that the most
+    # popular merchant is not simply merchant 1
+    merchant_ranks = list(range(1, merchant_count + 1))
+    rng.shuffle(merchant_ranks)
+    merchant_weights = zipf_cum_weights(merchant_count, args.zipf_s)
+
+    # catalog sizes are heavy tailed too; the mean is roughly --items
+    merchant_items = {}
+    item_rows = []
+    item_id = 0
+    for merchant_id in range(1, merchant_count + 1):
+        count = max(1, min(args.items * 50, round(rng.paretovariate(1.5) * args.items / 3)))
+        merchant_items[merchant_id] = []
+        for _ in range(count):
+            item_id += 1
+            price = round(min(10_000.0, rng.lognormvariate(3.0, 1.0)), 2)
+            merchant_items[merchant_id].append((item_id, price))
+            item_rows.append(
+                dict(
+                    id=item_id,
+                    name=f"item-{item_id}",
+                    description=None,
+                    price=price,
+                    tax=None,
+                    merchant_id=merchant_id,
+                    user_id=merchant_id,
+                    role=models.UserRole.merchant,
+                )
+            )
+
+    def users():
+        for i in range(1, merchant_count + customer_count + 1):
+            role = models.UserRole.merchant if i <= merchant_count else models.UserRole.customer
+            name = f"merchant{i}" if i <= merchant_count else f"customer{i - merchant_count}"
+            register_date = EPOCH + datetime.timedelta(seconds=rng.randrange(365 * 86400))
+            yield dict(
+                id=i,
+                username=name,
+                email=f"{name}@email.local",
+                first_name=name.capitalize(),
+                last_name="Generated",
+                password=hashed_password,
+                role=role,
+                register_date=register_date,
+                updated_date=register_date,
+                last_login_date=None,
+            )
+
+    revenue = [0.0] * (merchant_count + 1)
+    spent = [0.0] * (customer_count + 1)
+
+    def transactions():
+        produced = 0
+        while produced < args.transactions:
+            merchant_id = merchant_ranks[
+                rng.choices(range(merchant_count), cum_weights=merchant_weights)[0]
+            ]
+            items = merchant_items[merchant_id]
+            customer_id = rng.randrange(1, customer_count + 1)
+            cart_size = heavy_tail(rng, args.cart_alpha, args.max_cart_size)
+            created_at = EPOCH + datetime.timedelta(seconds=rng.randrange(365 * 86400))
+            for _ in range(min(cart_size, args.transactions - produced)):
+                item_id, price = items[rng.randrange(len(items))]
+                revenue[merchant_id] += price
+                spent[customer_id] += price
+                produced += 1
+                yield dict(
+                    id=produced,
+                    item_id=item_id,
+                    description=None,
+                    price=price,
+                    merchant_id=merchant_id,
+                    customer_id=customer_id,
+                    created_at=created_at,
+                )
+
+    def wallets():
+        # balances agree with the generated history: merchants hold their
+        # revenue, customers topped up in steps of TOP_UP enough to cover all
+        # their purchases, plus a random amount they did not spend
+        for merchant_id in range(1, merchant_count + 1):
+            yield dict(
+                id=merchant_id,
+                balance=round(revenue[merchant_id], 2),
+                user_id=merchant_id,
+                role=models.UserRole.merchant,
+                stripes=0,
+            )
+        for customer_id in range(1, customer_count + 1):
+            top_ups = math.ceil(spent[customer_id] / TOP_UP) * TOP_UP
+            top_ups += rng.choice([0.0, 100.0, 500.0, 1_000.0, 5_000.0])
+            yield dict(
+                id=merchant_count + customer_id,
+                balance=round(top_ups - spent[customer_id], 2),
+                user_id=merchant_count + customer_id,
+                role=models.UserRole.customer,
+                stripes=0,
+            )
+
+    await models.recreate_table()
+
+    tables = [
+        models.DBUser.__table__,
+        models.DBMerchant.__table__,
+        models.DBCustomer.__table__,
+        models.DBItem.__table__,
+        models.DBTransection.__table__,
+        models.DBWallet.__table__,
+    ]
+
+    started = time.perf_counter()
+    async with models.engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            await connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+            await connection.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        # indexes are cheaper to build once at the end than to maintain per row
+        for table in tables:
+            for index in table.indexes:
+                await connection.run_sync(index.drop)
+        await connection.commit()
+
+        loader = Loader(connection, args.batch_size)
+        await loader.load(models.DBUser.__table__, users())
+        await loader.load(
+            models.DBMerchant.__table__,
+            (
+                dict(id=i, name=f"merchant{i}", description=None, tax_id=None, user_id=i)
+                for i in range(1, merchant_count + 1)
+            ),
+        )
+        await loader.load(
+            models.DBCustomer.__table__,
+            (
+                dict(
+                    id=i,
+                    name=f"customer{i}",
+                    description=None,
+                    tax_id=None,
+                    user_id=merchant_count + i,
+                )
+                for i in range(1, customer_count + 1)
+            ),
+        )
+        await loader.load(models.DBItem.__table__, item_rows)
+        await loader.load(models.DBTransection.__table__, transactions())
+        await loader.load(models.DBWallet.__table__, wallets())
+        await sales.rebuild(connection)
+
+        if connection.dialect.name == "postgresql":
+            # ids were given explicitly, move the sequences past them
+            for table in tables:
+                await connection.exec_driver_sql(
+                    f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                    f"(SELECT coalesce(max(id), 0) + 1 FROM {table.name}), false)"
+                )
+
+        index_started = time.perf_counter()
+        for table in tables:
+            for index in table.indexes:
+                await connection.run_sync(index.create)
+        await connection.commit()
+        index_elapsed = time.perf_counter() - index_started
+
+    elapsed = time.perf_counter() - started
+    total = sum(loader.counts.values())
+    for name, count in loader.counts.items():
+        print(f"{name:<15} {count:>12,}")
+    print(
+        f"rows={total:,} elapsed={elapsed:.1f}s (indexes {index_elapsed:.1f}s) "
+        f"rows/sec={total / elapsed:,.0f}"
+    )
+
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Recreate all tables and fill them with a deterministic, "
+        "skewed synthetic dataset. Every user's password is --password."
+    )
+    parser.add_argument("--url", help="defaults to SQLDB_URL from the settings")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--merchants", type=int, default=1_000)
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--items", type=int, default=20, help="mean items per merchant")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument(
+        "--zipf-s", type=float, default=1.1, help="merchant popularity skew"
+    )
+    parser.add_argument(
+        "--cart-alpha", type=float, default=2.0, help="Pareto shape of cart sizes"
+    )
+    parser.add_argument("--max-cart-size", type=int, default=50)
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=20_000)
+    args = parser.parse_args()
+
+    settings = config.get_settings() if args.url is None else config.Settings(SQLDB_URL=args.url)
+    models.init_db(settings)
+    asyncio.run(generate(args))
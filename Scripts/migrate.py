@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+import logging
+
+from digimon import models, config, migrations
+
+
+async def run(args):
+    async with models.engine.connect() as connection:
+        pending = await migrations.pending_migrations(connection)
+
+    if args.check:
+        for version, name, _ in pending:
+            print(f"pending {version}: {name}")
+        missing = await migrations.check_schema(models.engine)
+        for name in missing:
+            print(f"missing {name}")
+    else:
+        applied = await migrations.migrate(models.engine)
+        print(f"applied {applied}" if applied else "schema is up to date")
+
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Apply pending schema migrations. Index builds run "
+        "CONCURRENTLY on PostgreSQL."
+    )
+    parser.add_argument("--url", help="defaults to SQLDB_URL from the settings")
+    parser.add_argument(
+        "--check", action="store_true", help="list pending migrations and missing indexes"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    settings = config.get_settings() if args.url is None else config.Settings(SQLDB_URL=args.url)
+    models.init_db(settings)
+    asyncio.run(run(args))
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+
+from digimon import models, config, onboarding
+
+
+def read_rows(path, format):
+    with open(path, newline="") as source:
+        if format == "csv":
+            # CSV has no nulls, an empty optional column means "not given"
+            for row in csv.DictReader(source):
+                yield {key: value for key, value in row.items() if value != ""}
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def run(args):
+    format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    created = 0
+    failed = 0
+    offset = 0
+    started = time.perf_counter()
+
+    for chunk in chunks(read_rows(args.path, format), args.chunk_size):
+        async with models.sessionmanager.session() as session:
+            result = await onboarding.onboard(session, chunk)
+
+        created += result.created
+        failed += len(result.errors)
+        for error in result.errors:
+            # 1-based data row, the CSV header is not counted
+            print(
+                f"row {offset + error.row + 1}: {error.username}: {error.detail}",
+                file=sys.stderr,
+            )
+        offset += len(chunk)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"rows={offset} created={created} failed={failed} elapsed={elapsed:.2f}s "
+        f"rows/sec={offset / elapsed:.0f}"
+    )
+
+    onboarding.close_onboarding()
+    await models.close_session()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Onboard merchant and customer accounts from CSV or NDJSON. "
+        "Columns: username, email, first_name, last_name, password, role, name, "
+        "description, tax_id, balance."
+    )
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--url", help="defaults to SQLDB_URL from the settings")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=0, help="hashing processes")
+    args = parser.parse_args()
+
+    settings = config.get_settings() if args.url is None else config.Settings(SQLDB_URL=args.url)
+    settings.ONBOARDING_HASH_WORKERS = args.workers
+    models.init_db(settings)
+    onboarding.init_onboarding(settings)
+    asyncio.run(run(args))
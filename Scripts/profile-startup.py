@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Every measurement runs in a fresh interpreter, so module caches and the page
+# cache of an earlier run in the same process cannot make the numbers look
+# better than a newly started worker would see.
+
+PHASES = ["import", "create_app", "startup", "first_request"]
+
+
+async def get(app, path):
+    # a bare ASGI call, an HTTP client would add its own imports to the numbers
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    path, _, query = path.partition("?")
+    await app(
+        {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        },
+        receive,
+        send,
+    )
+    return messages[0]["status"]
+
+
+def child(path):
+    timings = {}
+    started = time.perf_counter()
+
+    from digimon import main
+
+    timings["import"] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    app = main.create_app()
+    timings["create_app"] = time.perf_counter() - mark
+
+    async def serve():
+        mark = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            timings["startup"] = time.perf_counter() - mark
+
+            mark = time.perf_counter()
+            status = await get(app, path)
+            timings["first_request"] = time.perf_counter() - mark
+        return status
+
+    status = asyncio.run(serve())
+    print(json.dumps(dict(timings, status=status)))
+
+
+def run_child(args, env):
+    result = subprocess.run(
+        shlex.split(args.python) + [__file__, "--child", "--path", args.path],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_times(args, env):
+    # the same as python -X importtime, but also works through wrappers
+    result = subprocess.run(
+        shlex.split(args.python) + ["-c", "import digimon.main"],
+        env=dict(env, PYTHONPROFILEIMPORTTIME="1"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def report(args, runs, modules):
+    medians = {
+        phase: statistics.median(run[phase] for run in runs) * 1000 for phase in PHASES
+    }
+    total = sum(medians.values())
+
+    print(f"median of {len(runs)} cold starts, GET {args.path} -> {runs[0]['status']}")
+    for phase in PHASES:
+        print(f"  {phase:<15} {medians[phase]:>8.1f} ms")
+    print(f"  {'total':<15} {total:>8.1f} ms")
+
+    print("\nslowest modules by cumulative import time (ms)")
+    print(f"  {'cumulative':>10} {'self':>8}  module")
+    for name, self_ms, cumulative_ms in sorted(modules, key=lambda m: -m[2])[: args.top]:
+        print(f"  {cumulative_ms:>10.1f} {self_ms:>8.1f}  {name}")
+
+    packages = {}
+    for name, self_ms, _ in modules:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + self_ms
+    print("\nimport time by top-level package (self ms)")
+    for package, self_ms in sorted(packages.items(), key=lambda p: -p[1])[: args.top]:
+        print(f"  {self_ms:>10.1f}  {package}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(
+                dict(
+                    phases_ms=medians,
+                    total_ms=total,
+                    runs=runs,
+                    modules=[
+                        dict(module=name, self_ms=self_ms, cumulative_ms=cumulative_ms)
+                        for name, self_ms, cumulative_ms in modules
+                    ],
+                ),
+                output,
+                indent=2,
+            )
+
+    if args.budget_ms and total > args.budget_ms:
+        print(f"\nover budget: {total:.1f} ms > {args.budget_ms} ms")
+        return 1
+    if args.budget_ms:
+        print(f"\nwithin budget: {total:.1f} ms <= {args.budget_ms} ms")
+    return 0
+
+
+def main(args):
+    env = dict(os.environ)
+    if args.url:
+        env["SQLDB_URL"] = args.url
+
+    runs = [run_child(args, env) for _ in range(args.repeat)]
+    modules = import_times(args, env)
+    return report(args, runs, modules)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure how long a fresh worker takes to import the app, "
+        "build it, run its startup and answer a first request, with a per-module "
+        "import time breakdown."
+    )
+    parser.add_argument("--url", help="defaults to SQLDB_URL from the settings")
+    parser.add_argument("--path", default="/merchants", help="first request")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="modules and packages to list")
+    parser.add_argument("--budget-ms", type=float, help="exit with 1 when the total is over")
+    parser.add_argument("--output", help="write the measurements as JSON")
+    parser.add_argument("--python", default=sys.executable, help="command that starts Python")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.path)
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,48 @@
+import argparse
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+
+# A stand-in for replication when trying SQLDB_REPLICA_URLS locally: copies the
+# primary SQLite file onto the replica file every --interval seconds, so the
+# replica lags the primary by up to that long, like a real one would.
+
+
+def database_path(url):
+    path = make_url(url).database
+    if not path or path == ":memory:":
+        raise SystemExit(f"{url} is not a SQLite file")
+    return path
+
+
+def copy(primary_path, replica_path):
+    source = sqlite3.connect(primary_path)
+    target = sqlite3.connect(replica_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Keep a SQLite replica file an --interval behind its primary."
+    )
+    parser.add_argument("primary", help="SQLDB_URL or path of the primary")
+    parser.add_argument("replica", help="replica URL or path, overwritten")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args()
+
+    primary = database_path(args.primary) if "://" in args.primary else args.primary
+    replica = database_path(args.replica) if "://" in args.replica else args.replica
+    while True:
+        started = time.perf_counter()
+        copy(primary, replica)
+        print(f"copied {primary} -> {replica} in {time.perf_counter() - started:.3f}s")
+        if args.once:
+            break
+        time.sleep(args.interval)
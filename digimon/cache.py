@@ -0,0 +1,58 @@
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self.data.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.data[key]
+
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: float | None = None):
+        if self.maxsize <= 0:
+            return
+
+        if ttl is None:
+            ttl = self.ttl
+        self.data[key] = (time.monotonic() + ttl, value)
+        self.data.move_to_end(key)
+
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self.data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self) -> dict:
+        return dict(
+            size=len(self.data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
@@ -0,0 +1,81 @@
+import hashlib
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from . import cache
+from . import singleflight
+
+# Item responses are cached per process already serialized, together with
+# their ETag, so a hit needs neither a query nor a model dump and a matching
+# If-None-Match needs neither a body. Item mutations write through to the item
+# cache and drop every cached list page; other workers catch up once their
+# entries expire. Both stay disabled until init_catalog.
+#
+# With read replicas a read right after a change may still see the old row, so
+# changed items and the list pages are not refilled from reads for the
+# read-your-writes window; otherwise a stale replica answer would be served
+# from the cache for a whole TTL.
+item_cache = cache.TTLCache(0, 0)
+page_cache = cache.TTLCache(0, 0)
+held = cache.TTLCache(0, 0)
+
+PAGES = "pages"
+
+
+def init_catalog(settings):
+    global item_cache, page_cache, held
+
+    item_cache = cache.TTLCache(settings.ITEM_CACHE_SIZE, settings.ITEM_CACHE_TTL)
+    page_cache = cache.TTLCache(settings.ITEM_CACHE_SIZE, settings.ITEM_CACHE_TTL)
+    held = cache.TTLCache(
+        settings.ITEM_CACHE_SIZE if settings.SQLDB_REPLICA_URLS else 0,
+        settings.READ_YOUR_WRITES_WINDOW,
+    )
+
+
+def can_fill(key) -> bool:
+    return held.get(key) is None
+
+
+def make_entry(model: BaseModel) -> tuple[bytes, str]:
+    body = model.model_dump_json().encode("utf-8")
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    return body, etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
+
+
+def respond(request: Request, entry: tuple[bytes, str]) -> Response:
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def store_item(item_id: int, item: BaseModel) -> tuple[bytes, str]:
+    entry = make_entry(item)
+    item_cache.set(item_id, entry)
+    singleflight.items.forget(item_id)
+    invalidate_pages()
+    return entry
+
+
+def invalidate_item(item_id: int):
+    item_cache.pop(item_id)
+    held.set(item_id, True)
+    singleflight.items.forget(item_id)
+    invalidate_pages()
+
+
+def invalidate_pages():
+    page_cache.clear()
+    held.set(PAGES, True)
@@ -3,15 +3,100 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     SQLDB_URL: str
+    SQLDB_REPLICA_URLS: list[str] = []  # read-only copies for GET routes, JSON in env
+    READ_YOUR_WRITES_WINDOW: float = 5  # seconds a writer's reads stay on the primary
     SECRET_KEY: str = "secret"
 
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 5 * 60  # 5 minutes
     REFRESH_TOKEN_EXPIRE_MINUTES: int = 7 * 24 * 60  # 7 days
 
+    PRINCIPAL_CACHE_SIZE: int = 10_000
+    PRINCIPAL_CACHE_TTL: int = 60  # seconds
+
+    ITEM_CACHE_SIZE: int = 10_000
+    ITEM_CACHE_TTL: int = 60  # seconds
+
+    # Off by default: without a token a caller is its client address, and
+    # behind a proxy that is the proxy's, shared by everyone.
+    RATE_LIMIT_ENABLED: bool = False
+    RATE_LIMIT_AUTH: float = 1  # requests per second per caller, 0 for no limit
+    RATE_LIMIT_BUY: float = 10
+    RATE_LIMIT_LIST: float = 20
+    RATE_LIMIT_BURST_SECONDS: float = 5  # seconds of rate a caller may use at once
+    RATE_LIMIT_CALLERS: int = 100_000  # buckets kept per route class
+    CONCURRENCY_AUTH: int = 32  # requests running at once per worker, 0 for no cap
+    CONCURRENCY_BUY: int = 64
+    CONCURRENCY_LIST: int = 32
+    # e.g. X-Forwarded-For, only when a proxy in front of every worker sets it;
+    # the last address in it is the one that proxy saw
+    CLIENT_ADDRESS_HEADER: str | None = None
+
+    IDEMPOTENCY_ENABLED: bool = True  # False ignores Idempotency-Key
+    IDEMPOTENCY_TTL: int = 24 * 60 * 60  # seconds a key is remembered
+    IDEMPOTENCY_PURGE_INTERVAL: int = 60 * 60  # seconds between expired key purges
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 30 * 60  # 30 minutes
+    DB_POOL_TIMEOUT: float = 30  # seconds to wait for a pooled connection
+    DB_MAX_CONNECTIONS: int = 0  # shared by all server workers, 0 to use DB_POOL_SIZE
+
+    WEB_WORKERS: int = 0  # server processes, 0 for one per CPU
+    WEB_MAX_REQUESTS: int = 10_000  # requests before a worker is replaced
+    WEB_MAX_REQUESTS_JITTER: int = 1_000
+    WEB_GRACEFUL_TIMEOUT: int = 30  # seconds to finish in-flight requests
+    WEB_ACCESS_LOG: bool = False
+
+    SQL_ECHO: bool = False  # log every statement, for debugging only
+    N_PLUS_ONE_THRESHOLD: int = 10  # same statement this often in one request
+
+    SCHEMA_CHECK: bool = True  # warn at startup about missing indexes
+
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64  # waiting hashes before failing fast
+
+    BULK_ONBOARDING: bool = False  # enables POST /users/onboard
+    ONBOARDING_HASH_WORKERS: int = 0  # processes, 0 for one per CPU
+
+    LAST_LOGIN_FLUSH_INTERVAL: int = 5  # seconds
+    LAST_LOGIN_FLUSH_SIZE: int = 1000  # pending logins that force an early flush
+
+    WALLET_LEDGER: bool = False
+    LEDGER_COMPACT_INTERVAL: int = 60  # seconds
+
+    # each worker only sees its own creates and deletes, so with several
+    # workers page_count can be off by the others' changes for this long
+    COUNT_RESYNC_INTERVAL: int = 5 * 60  # seconds
+    COUNT_ESTIMATE: bool = False  # planner estimate instead of exact item counts
+
+    JOB_QUEUE_SIZE: int = 10_000  # queued jobs, the rest wait in the outbox
+    JOB_WORKERS: int = 2
+    JOB_BATCH_SIZE: int = 100
+    JOB_FLUSH_INTERVAL: float = 0.05  # seconds a worker waits to fill a batch
+    JOB_MAX_ATTEMPTS: int = 10
+    JOB_RETRY_BACKOFF: float = 1  # seconds, doubled on every attempt
+    JOB_RETRY_BACKOFF_MAX: float = 5 * 60  # seconds
+    JOB_SWEEP_INTERVAL: int = 5  # seconds between outbox sweeps
+
     model_config = SettingsConfigDict(
         env_file=".env", validate_assignment=True, extra="allow"
     )
 
 
-def get_settings():
-    return Settings()
\ No newline at end of file
+settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    # read the environment and .env once, not on every call
+    global settings
+
+    if settings is None:
+        settings = Settings()
+    return settings
+
+
+def set_settings(new_settings: Settings):
+    global settings
+
+    settings = new_settings
\ No newline at end of file
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import math
+
+from sqlalchemy import func, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import cache
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+# Row counts for page_count. A count is loaded with COUNT(*) the first time it
+# is asked for, then kept in memory and adjusted as rows are created and
+# deleted. Other workers and bulk loads make the cached values drift, so a
+# background task replaces them with exact counts every resync_interval. The
+# counts of the least recently read merchants are dropped beyond MAX_COUNTS,
+# and a merchant without items is not kept at all, so unknown merchant ids
+# never take up room. A row created or deleted while resync's COUNT queries
+# run may be missing from their result, so the deltas recorded since each
+# query started are added to it.
+
+MAX_COUNTS = 10_000
+
+resync_interval = 300
+estimate = False
+
+counts = cache.TTLCache(MAX_COUNTS, math.inf)
+# deltas recorded by adjust while resync runs
+resync_deltas: dict[tuple[str, int | None], int] | None = None
+
+
+def init_counts(settings):
+    global resync_interval, estimate
+
+    resync_interval = settings.COUNT_RESYNC_INTERVAL
+    estimate = settings.COUNT_ESTIMATE
+    counts.clear()
+
+
+def adjust(key: tuple[str, int | None], delta: int):
+    if resync_deltas is not None:
+        resync_deltas[key] = resync_deltas.get(key, 0) + delta
+    count = counts.pop(key)
+    if count is not None:
+        counts.set(key, count + delta)
+
+
+def item_created(merchant_id: int | None):
+    adjust(("items", None), 1)
+    if merchant_id is not None:
+        adjust(("items", merchant_id), 1)
+
+
+def item_deleted(merchant_id: int | None):
+    adjust(("items", None), -1)
+    if merchant_id is not None:
+        adjust(("items", merchant_id), -1)
+
+
+async def exact_item_count(session: AsyncSession, merchant_id: int | None = None) -> int:
+    statement = select(func.count(models.DBItem.id))
+    if merchant_id is not None:
+        statement = statement.where(models.DBItem.merchant_id == merchant_id)
+    return (await session.exec(statement)).one()
+
+
+async def estimated_item_count(session: AsyncSession) -> int:
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql":
+        result = await session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+            dict(table=models.DBItem.__tablename__),
+        )
+        count = result.scalar()
+        if count is not None and count >= 0:
+            return count
+
+    # no planner statistics; the largest id is an upper bound from the index
+    result = await session.exec(select(func.max(models.DBItem.id)))
+    return result.one() or 0
+
+
+async def item_count(session: AsyncSession, merchant_id: int | None = None) -> int:
+    if estimate and merchant_id is None:
+        return await estimated_item_count(session)
+
+    key = ("items", merchant_id)
+    count = counts.get(key)
+    if count is None:
+        count = await exact_item_count(session, merchant_id)
+        if count or merchant_id is None:
+            counts.set(key, count)
+    return count
+
+
+async def resync(session: AsyncSession):
+    global resync_deltas
+
+    keys = list(counts.data)
+    if not keys:
+        return
+
+    resync_deltas = {}
+    try:
+        total = await exact_item_count(session)
+        before_per_merchant = dict(resync_deltas)
+        result = await session.exec(
+            select(models.DBItem.merchant_id, func.count(models.DBItem.id)).group_by(
+                models.DBItem.merchant_id
+            )
+        )
+        per_merchant = dict(result.all())
+        deltas = resync_deltas
+    finally:
+        resync_deltas = None
+
+    for key in keys:
+        _, merchant_id = key
+        delta = deltas.get(key, 0)
+        if merchant_id is None:
+            counts.set(key, total + delta)
+            continue
+
+        count = per_merchant.get(merchant_id, 0) + delta - before_per_merchant.get(key, 0)
+        if count > 0:
+            counts.set(key, count)
+        else:
+            counts.pop(key)
+
+
+async def run_resync():
+    while True:
+        await asyncio.sleep(resync_interval)
+        try:
+            async with models.sessionmanager.session() as session:
+                await resync(session)
+        except Exception:
+            logger.exception("count resync failed")
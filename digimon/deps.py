@@ -1,6 +1,8 @@
 from fastapi import Depends, HTTPException, status, Path, Query
 from fastapi.security import OAuth2PasswordBearer
 
+import logging
+import time
 import typing
 import jwt
 
@@ -9,11 +11,91 @@ from pydantic import ValidationError
 from . import models
 from . import security
 from . import config
+from . import cache
 
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-settings = config.get_settings()
+# Decoded tokens and the users they belong to are cached per process, so an
+# authenticated request only touches the database on a miss. Routes that
+# change or delete a user call invalidate_user; other workers see the change
+# once their entry expires.
+# Both stay disabled until init_principal_cache.
+token_cache = cache.TTLCache(0, 0)
+principal_cache = cache.TTLCache(0, 0)
+
+
+def init_principal_cache(settings):
+    global token_cache, principal_cache
+
+    token_cache = cache.TTLCache(
+        settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL
+    )
+    principal_cache = cache.TTLCache(
+        settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL
+    )
+
+
+def invalidate_user(user_id: int):
+    principal_cache.pop(user_id)
+
+
+client_address_header: bytes | None = None
+
+
+def init_client_address(settings):
+    global client_address_header
+
+    header = settings.CLIENT_ADDRESS_HEADER
+    client_address_header = header.lower().encode("latin-1") if header else None
+
+
+def token_user_id(token: str) -> int | None:
+    user_id = token_cache.get(token)
+    if user_id is not None:
+        return user_id
+
+    try:
+        payload = jwt.decode(
+            token, config.get_settings().SECRET_KEY, algorithms=[security.ALGORITHM]
+        )
+    except jwt.PyJWTError as e:
+        logger.debug("invalid token: %s", e)
+        return None
+
+    user_id = payload.get("sub")
+    if user_id is None:
+        return None
+
+    # never cache a token past its own expiry
+    ttl = token_cache.ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    token_cache.set(token, user_id, ttl=ttl)
+    return user_id
+
+
+def caller(scope) -> tuple:
+    # who an ASGI request is from, without touching the database: the user of
+    # a valid bearer token, or else the client address, as the trusted proxy
+    # reported it when CLIENT_ADDRESS_HEADER is set
+    forwarded = None
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                user_id = token_user_id(token)
+                if user_id is not None:
+                    return ("user", user_id)
+        elif name == client_address_header:
+            forwarded = value.decode("latin-1").split(",")[-1].strip()
+
+    if forwarded:
+        return ("client", forwarded)
+    client = scope.get("client")
+    return ("client", client[0] if client else None)
 
 
 async def get_current_user(
@@ -25,23 +107,21 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
-        )
-        user_id: int = payload.get("sub")
-
-        if user_id is None:
-            raise credentials_exception
 
-    except jwt.JWTError as e:
-        print(e)
+    user_id = token_user_id(token)
+    if user_id is None:
         raise credentials_exception
 
-    user = await session.get(models.DBUser, user_id)
-    if user is None:
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+
+    dbuser = await session.get(models.DBUser, user_id)
+    if dbuser is None:
         raise credentials_exception
 
+    user = models.User.model_validate(dbuser)
+    principal_cache.set(user_id, user)
     return user
 
 
@@ -56,9 +136,10 @@ async def get_current_active_user(
 async def get_current_active_superuser(
     current_user: typing.Annotated[models.User, Depends(get_current_user)],
 ) -> models.User:
-    if "admin" not in current_user.roles:
+    if current_user.role != models.UserRole.admin:
         raise HTTPException(
-            status_code=400, detail="The user doesn't have enough privileges"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges",
         )
     return current_user
 
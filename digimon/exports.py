@@ -0,0 +1,111 @@
+import csv
+import datetime
+import io
+import json
+import typing
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+CHUNK_SIZE = 5_000
+
+COLUMNS = [
+    "id",
+    "item_id",
+    "price",
+    "merchant_id",
+    "customer_id",
+    "description",
+    "created_at",
+]
+
+# Exports read the table in keyset chunks of plain rows (`WHERE id > :last
+# ORDER BY id LIMIT :chunk`), so no ORM objects pile up in the identity map,
+# each query is a short index range scan, and memory stays bounded by one
+# chunk whatever the size of the export.
+
+
+def export_statement(
+    merchant_id: int | None = None,
+    customer_id: int | None = None,
+    min_id: int | None = None,
+    max_id: int | None = None,
+):
+    columns = [getattr(models.DBTransection, column) for column in COLUMNS]
+    statement = select(*columns)
+    if merchant_id is not None:
+        statement = statement.where(models.DBTransection.merchant_id == merchant_id)
+    if customer_id is not None:
+        statement = statement.where(models.DBTransection.customer_id == customer_id)
+    if min_id is not None:
+        statement = statement.where(models.DBTransection.id >= min_id)
+    if max_id is not None:
+        statement = statement.where(models.DBTransection.id <= max_id)
+    return statement
+
+
+async def iter_chunks(
+    session: AsyncSession, statement, chunk_size: int = CHUNK_SIZE
+) -> typing.AsyncIterator[list]:
+    last_id = None
+    while True:
+        chunk_statement = statement
+        if last_id is not None:
+            chunk_statement = chunk_statement.where(models.DBTransection.id > last_id)
+
+        result = await session.exec(
+            chunk_statement.order_by(models.DBTransection.id).limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            return
+
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1][0]
+
+
+def plain(row) -> list:
+    # timestamps in ISO 8601 whatever the format
+    return [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in row
+    ]
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(COLUMNS, plain(row))), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(plain(row) for row in rows)
+    return buffer.getvalue()
+
+
+async def stream(
+    format: str, chunk_size: int | None = None, manager=None, **filters
+) -> typing.AsyncIterator[str]:
+    chunk_size = chunk_size or CHUNK_SIZE
+    manager = manager or models.sessionmanager
+    # the request's own session is closed once the handler returns, so the
+    # generator opens one for the lifetime of the response
+    async with manager.session() as session:
+        statement = export_statement(**filters)
+        if format == "csv":
+            yield encode_csv([], header=True)
+        async for rows in iter_chunks(session, statement, chunk_size):
+            if format == "csv":
+                yield encode_csv(rows)
+            else:
+                yield encode_ndjson(rows)
@@ -0,0 +1,217 @@
+import asyncio
+import datetime
+import logging
+import typing
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+# Routes that move money take an optional Idempotency-Key header. The first
+# request with a key runs; its response, or the HTTPException it raised, is
+# stored in idempotency_keys for ttl seconds and a retry with the same key gets
+# it back without running again, marked with Idempotent-Replayed: true. The
+# response is saved by the route's own code, with save, in the transaction that
+# moves the money, so the two are committed together or not at all. Keys are
+# per user and route, and the row's primary key lets only one request per key
+# commit, whichever worker it reached: the others are rolled back and answer
+# with the stored response. Within a process, a duplicate that arrives while
+# the first one is still running waits for it instead of running in parallel.
+# Reusing a key for a different request body is refused. If the first request
+# fails any other way nothing is kept, and the next request with that key runs
+# normally.
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = "Idempotent-Replayed"
+# where run leaves the key for save, on the session the route writes with
+PENDING = "idempotency_key"
+
+enabled = True
+ttl = 24 * 60 * 60
+purge_interval = 60 * 60
+in_flight: dict[tuple, tuple[str, asyncio.Future]] = {}
+
+replays = 0
+coalesced = 0
+conflicts = 0
+
+
+def init_idempotency(settings):
+    global enabled, ttl, purge_interval
+
+    enabled = settings.IDEMPOTENCY_ENABLED
+    ttl = settings.IDEMPOTENCY_TTL
+    purge_interval = settings.IDEMPOTENCY_PURGE_INTERVAL
+    in_flight.clear()
+
+
+def check_fingerprint(stored: str, fingerprint: str):
+    global conflicts
+
+    if stored != fingerprint:
+        conflicts += 1
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+
+
+def replay(stored: models.DBIdempotencyKey, response: Response):
+    global replays
+
+    replays += 1
+    if stored.status_code >= 400:
+        raise HTTPException(
+            status_code=stored.status_code,
+            detail=stored.response,
+            headers={REPLAYED_HEADER: "true"},
+        )
+    response.headers[REPLAYED_HEADER] = "true"
+    return stored.response
+
+
+async def lookup(session: AsyncSession, store_key: tuple) -> models.DBIdempotencyKey | None:
+    stored = await session.get(models.DBIdempotencyKey, store_key)
+    if stored is not None and stored.created_date < expiry():
+        await session.execute(
+            delete(models.DBIdempotencyKey).where(
+                models.DBIdempotencyKey.user_id == stored.user_id,
+                models.DBIdempotencyKey.route == stored.route,
+                models.DBIdempotencyKey.key == stored.key,
+                models.DBIdempotencyKey.created_date < expiry(),
+            )
+        )
+        await session.commit()
+        return None
+
+    # ends the read, so the request starts from a fresh snapshot, and keeps
+    # the row readable after that
+    if stored is not None:
+        session.expunge(stored)
+    await session.rollback()
+    return stored
+
+
+def save(session: AsyncSession, result, status_code: int = 200):
+    # adds the response to the caller's transaction, when run left a key
+    pending = session.info.pop(PENDING, None)
+    if pending is None:
+        return
+
+    (user_id, route, key), fingerprint = pending
+    session.add(
+        models.DBIdempotencyKey(
+            user_id=user_id,
+            route=route,
+            key=key,
+            fingerprint=fingerprint,
+            status_code=status_code,
+            response=jsonable_encoder(result),
+        )
+    )
+
+
+async def save_error(session: AsyncSession, store_key: tuple, fingerprint: str, error: HTTPException):
+    session.info[PENDING] = (store_key, fingerprint)
+    save(session, error.detail, error.status_code)
+    try:
+        await session.commit()
+    except IntegrityError:
+        # another worker stored its outcome first
+        await session.rollback()
+
+
+async def run(
+    key: str | None,
+    scope: tuple,
+    fingerprint: str,
+    response: Response,
+    session: AsyncSession,
+    call: typing.Callable[[], typing.Awaitable],
+):
+    global coalesced
+
+    if key is None or not enabled:
+        return await call()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters",
+        )
+
+    store_key = scope + (key,)
+    while True:
+        stored = await lookup(session, store_key)
+        if stored is not None:
+            check_fingerprint(stored.fingerprint, fingerprint)
+            return replay(stored, response)
+
+        pending = in_flight.get(store_key)
+        if pending is None:
+            break
+        check_fingerprint(pending[0], fingerprint)
+        coalesced += 1
+        # the first request may be cancelled with its client, this one is not
+        await asyncio.shield(pending[1])
+
+    done = asyncio.get_running_loop().create_future()
+    in_flight[store_key] = (fingerprint, done)
+    session.info[PENDING] = (store_key, fingerprint)
+    try:
+        return await call()
+    except HTTPException as error:
+        await session.rollback()
+        await save_error(session, store_key, fingerprint, error)
+        raise
+    except IntegrityError:
+        # another worker committed this key first, this request's changes
+        # were rolled back with the key
+        await session.rollback()
+        stored = await lookup(session, store_key)
+        if stored is None:
+            raise
+        check_fingerprint(stored.fingerprint, fingerprint)
+        return replay(stored, response)
+    finally:
+        session.info.pop(PENDING, None)
+        del in_flight[store_key]
+        done.set_result(None)
+
+
+def expiry() -> datetime.datetime:
+    return datetime.datetime.now() - datetime.timedelta(seconds=ttl)
+
+
+async def purge(session: AsyncSession) -> int:
+    result = await session.execute(
+        delete(models.DBIdempotencyKey).where(models.DBIdempotencyKey.created_date < expiry())
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def run_purger():
+    while True:
+        await asyncio.sleep(purge_interval)
+        try:
+            async with models.sessionmanager.session() as session:
+                count = await purge(session)
+            logger.debug("purged %d expired idempotency keys", count)
+        except Exception:
+            logger.exception("idempotency key purge failed")
+
+
+def stats() -> dict:
+    return dict(
+        in_flight=len(in_flight),
+        replays=replays,
+        coalesced=coalesced,
+        conflicts=conflicts,
+    )
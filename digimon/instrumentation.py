@@ -0,0 +1,234 @@
+import bisect
+import contextvars
+import logging
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+
+logger = logging.getLogger(__name__)
+
+# Per-request database accounting. The middleware puts a RequestStats in a
+# contextvar, engine events add every statement's count and time to it and the
+# pool adds the time spent waiting for a connection. The totals go out as
+# X-DB-* response headers and are aggregated per route for /metrics. A request
+# that runs the same statement n_plus_one_threshold times or more is counted
+# and logged as a likely N+1.
+
+n_plus_one_threshold = 10
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.statements = Counter()
+
+    def repeated_statement(self) -> tuple[str, int] | None:
+        if not self.statements:
+            return None
+        statement, count = self.statements.most_common(1)[0]
+        if count < n_plus_one_threshold:
+            return None
+        return statement, count
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.requests = Counter()
+        self.buckets = [0] * len(BUCKETS)
+        self.seconds = 0.0
+        self.count = 0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.n_plus_one = 0
+
+
+current: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar(
+    "request_stats", default=None
+)
+routes: dict[tuple[str, str], RouteMetrics] = {}
+reported: set[tuple[str, str]] = set()
+
+
+def init_instrumentation(settings):
+    global n_plus_one_threshold
+
+    n_plus_one_threshold = settings.N_PLUS_ONE_THRESHOLD
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] += 1
+
+
+def install(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+def record_pool_wait(seconds: float):
+    stats = current.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+def record_request(method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    metrics = routes.get((method, route))
+    if metrics is None:
+        metrics = routes[(method, route)] = RouteMetrics()
+
+    metrics.requests[status] += 1
+    metrics.count += 1
+    metrics.seconds += seconds
+    index = bisect.bisect_left(BUCKETS, seconds)
+    if index < len(BUCKETS):
+        metrics.buckets[index] += 1
+    metrics.db_queries += stats.queries
+    metrics.db_seconds += stats.db_seconds
+    metrics.pool_wait_seconds += stats.pool_wait_seconds
+
+    repeated = stats.repeated_statement()
+    if repeated is not None:
+        metrics.n_plus_one += 1
+        statement, count = repeated
+        if (route, statement) not in reported:
+            reported.add((route, statement))
+            logger.warning(
+                "possible N+1 on %s %s: statement ran %d times: %s",
+                method,
+                route,
+                count,
+                " ".join(statement.split())[:200],
+            )
+
+
+class InstrumentationMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_headers(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Queries"] = str(stats.queries)
+                headers["X-DB-Time-Ms"] = f"{stats.db_seconds * 1000:.2f}"
+                headers["X-DB-Pool-Wait-Ms"] = f"{stats.pool_wait_seconds * 1000:.2f}"
+                repeated = stats.repeated_statement()
+                if repeated is not None:
+                    headers["X-DB-N-Plus-One"] = str(repeated[1])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current.reset(token)
+            route = scope.get("route")
+            record_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started,
+                stats,
+            )
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def sample(name: str, labels: dict, value) -> str:
+    if not labels:
+        return f"{name} {value}"
+    label_text = ",".join(f'{key}="{escape(v)}"' for key, v in labels.items())
+    return f"{name}{{{label_text}}} {value}"
+
+
+def render(extra: list[tuple[str, str, str, dict, float]] = ()) -> str:
+    lines = []
+    items = sorted(routes.items())
+
+    lines.append("# HELP http_requests_total HTTP requests by route and status.")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route), metrics in items:
+        for status, count in sorted(metrics.requests.items()):
+            lines.append(
+                sample(
+                    "http_requests_total",
+                    dict(method=method, route=route, status=status),
+                    count,
+                )
+            )
+
+    lines.append("# HELP http_request_duration_seconds Request latency by route.")
+    lines.append("# TYPE http_request_duration_seconds histogram")
+    for (method, route), metrics in items:
+        labels = dict(method=method, route=route)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, metrics.buckets):
+            cumulative += count
+            lines.append(
+                sample("http_request_duration_seconds_bucket", dict(labels, le=bound), cumulative)
+            )
+        lines.append(
+            sample("http_request_duration_seconds_bucket", dict(labels, le="+Inf"), metrics.count)
+        )
+        lines.append(sample("http_request_duration_seconds_sum", labels, metrics.seconds))
+        lines.append(sample("http_request_duration_seconds_count", labels, metrics.count))
+
+    for name, attribute, help_text in [
+        ("db_queries_total", "db_queries", "SQL statements executed by route."),
+        ("db_seconds_total", "db_seconds", "Time spent in SQL statements by route."),
+        (
+            "db_pool_wait_seconds_total",
+            "pool_wait_seconds",
+            "Time spent waiting for a pooled connection by route.",
+        ),
+        (
+            "db_n_plus_one_requests_total",
+            "n_plus_one",
+            "Requests that repeated one statement at least the N+1 threshold.",
+        ),
+    ]:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (method, route), metrics in items:
+            lines.append(
+                sample(name, dict(method=method, route=route), getattr(metrics, attribute))
+            )
+
+    described = set()
+    for name, kind, help_text, labels, value in sorted(extra, key=lambda e: e[0]):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+        lines.append(sample(name, labels, value))
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,258 @@
+import asyncio
+import datetime
+import logging
+import typing
+
+from sqlalchemy import delete, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+# Side effects of a request that the response does not have to wait for.
+# submit adds a job to job_outbox in the caller's transaction, so the job is
+# stored exactly when the request's own changes are, and after the commit
+# enqueue hands it to the workers through a bounded in-memory queue. Workers
+# take up to batch_size jobs at a time and run each kind's handler once for the
+# whole batch in a single transaction, which also deletes the jobs from the
+# outbox; deleting them first is what claims them, so a job is never applied
+# twice even when another process picked it up too. A failed job is retried
+# with exponential backoff until it runs out of attempts and stays in the
+# outbox for inspection. When the queue is full, enqueue leaves the job to the
+# outbox, and the sweeper queues jobs that have waited there longer than
+# sweep_interval, including the ones left over from before a restart.
+
+
+class Job(typing.NamedTuple):
+    id: int
+    kind: str
+    payload: dict
+    attempts: int
+
+
+Handler = typing.Callable[[AsyncSession, list[dict]], typing.Awaitable[None]]
+
+handlers: dict[str, Handler] = {}
+
+workers = 2
+batch_size = 100
+flush_interval = 0.05
+max_attempts = 10
+retry_backoff = 1.0
+retry_backoff_max = 300.0
+sweep_interval = 5
+
+queue: asyncio.Queue = asyncio.Queue(0)
+queued: set[int] = set()
+
+submitted = 0
+completed = 0
+retried = 0
+failed = 0
+deferred = 0
+
+
+def init_jobs(settings):
+    global workers, batch_size, flush_interval, max_attempts
+    global retry_backoff, retry_backoff_max, sweep_interval, queue
+
+    workers = settings.JOB_WORKERS
+    batch_size = settings.JOB_BATCH_SIZE
+    flush_interval = settings.JOB_FLUSH_INTERVAL
+    max_attempts = settings.JOB_MAX_ATTEMPTS
+    retry_backoff = settings.JOB_RETRY_BACKOFF
+    retry_backoff_max = settings.JOB_RETRY_BACKOFF_MAX
+    sweep_interval = settings.JOB_SWEEP_INTERVAL
+
+    queue = asyncio.Queue(settings.JOB_QUEUE_SIZE)
+    queued.clear()
+
+
+def handler(kind: str):
+    def register(function: Handler) -> Handler:
+        handlers[kind] = function
+        return function
+
+    return register
+
+
+def submit(session: AsyncSession, kind: str, payload: dict) -> models.DBJob:
+    global submitted
+
+    now = datetime.datetime.now()
+    job = models.DBJob(
+        kind=kind,
+        payload=payload,
+        run_after=now + datetime.timedelta(seconds=sweep_interval),
+        created_date=now,
+    )
+    session.add(job)
+    submitted += 1
+    return job
+
+
+def enqueue(jobs: list[models.DBJob]):
+    # never waits, whatever does not fit is picked up from the outbox later
+    global deferred
+
+    for job in jobs:
+        if job.id in queued:
+            continue
+        try:
+            queue.put_nowait(Job(job.id, job.kind, job.payload, job.attempts))
+        except asyncio.QueueFull:
+            deferred += 1
+            continue
+        queued.add(job.id)
+
+
+def backoff(attempts: int) -> float:
+    return min(retry_backoff * 2 ** (attempts - 1), retry_backoff_max)
+
+
+async def apply(batch: list[Job]):
+    async with models.sessionmanager.session() as session:
+        result = await session.execute(
+            delete(models.DBJob)
+            .where(models.DBJob.id.in_([job.id for job in batch]))
+            .returning(models.DBJob.id)
+        )
+        claimed = set(result.scalars())
+
+        payloads = {}
+        for job in batch:
+            if job.id in claimed:
+                payloads.setdefault(job.kind, []).append(job.payload)
+        for kind, kind_payloads in payloads.items():
+            await handlers[kind](session, kind_payloads)
+
+        await session.commit()
+    return len(claimed)
+
+
+async def reschedule(job: Job, error: Exception):
+    global retried, failed
+
+    attempts = job.attempts + 1
+    if attempts >= max_attempts:
+        run_after = None
+        failed += 1
+        logger.error("job %d (%s) failed for good: %r", job.id, job.kind, error)
+    else:
+        run_after = datetime.datetime.now() + datetime.timedelta(seconds=backoff(attempts))
+        retried += 1
+
+    async with models.sessionmanager.session() as session:
+        await session.execute(
+            update(models.DBJob)
+            .where(models.DBJob.id == job.id)
+            .values(attempts=attempts, run_after=run_after, last_error=repr(error)[:1000])
+        )
+        await session.commit()
+
+
+async def process(batch: list[Job]):
+    global completed
+
+    for job in batch:
+        queued.discard(job.id)
+
+    try:
+        count = await apply(batch)
+    except Exception as error:
+        if len(batch) == 1:
+            logger.warning("job %d (%s) failed: %r", batch[0].id, batch[0].kind, error)
+            await reschedule(batch[0], error)
+            return
+    else:
+        completed += count
+        return
+
+    # one bad job must not hold back the rest of its batch
+    for job in batch:
+        await process([job])
+
+
+async def take_batch() -> list[Job]:
+    batch = [await queue.get()]
+    deadline = asyncio.get_running_loop().time() + flush_interval
+    while len(batch) < batch_size:
+        if not queue.empty():
+            batch.append(queue.get_nowait())
+            continue
+        timeout = deadline - asyncio.get_running_loop().time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def run_worker():
+    while True:
+        batch = await take_batch()
+        try:
+            await process(batch)
+        except Exception:
+            logger.exception("job batch failed")
+
+
+async def sweep() -> int:
+    room = queue.maxsize - queue.qsize()
+    if room <= 0:
+        return 0
+
+    async with models.sessionmanager.session() as session:
+        result = await session.exec(
+            select(models.DBJob)
+            .where(models.DBJob.run_after <= datetime.datetime.now())
+            .order_by(models.DBJob.run_after)
+            .limit(room)
+        )
+        jobs = [job for job in result.all() if job.id not in queued]
+
+    enqueue(jobs)
+    return len(jobs)
+
+
+async def run_sweeper():
+    while True:
+        try:
+            count = await sweep()
+            if count:
+                logger.info("queued %d jobs from the outbox", count)
+        except Exception:
+            logger.exception("job outbox sweep failed")
+        await asyncio.sleep(sweep_interval)
+
+
+async def drain():
+    # runs what is still queued, on shutdown after the workers are stopped
+    while not queue.empty():
+        batch = []
+        while not queue.empty() and len(batch) < batch_size:
+            batch.append(queue.get_nowait())
+        await process(batch)
+
+
+def start() -> list[asyncio.Task]:
+    tasks = [asyncio.create_task(run_worker()) for _ in range(workers)]
+    tasks.append(asyncio.create_task(run_sweeper()))
+    return tasks
+
+
+def stats() -> dict:
+    return dict(
+        queued=queue.qsize(),
+        capacity=queue.maxsize,
+        submitted=submitted,
+        completed=completed,
+        retried=retried,
+        failed=failed,
+        deferred=deferred,
+    )
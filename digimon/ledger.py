@@ -0,0 +1,240 @@
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import func, insert, literal, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+from . import stripes
+
+
+logger = logging.getLogger(__name__)
+
+# In ledger mode wallet balances are never overwritten. Every debit and credit
+# appends a signed DBWalletEntry and the balance of a wallet is its latest
+# DBWalletSnapshot (or DBWallet.balance as the opening balance when there is
+# no snapshot yet) plus the entries appended after that snapshot.
+#
+# A snapshot must never cover an id that a transaction still running can
+# commit later. On PostgreSQL every transaction that appends entries holds
+# ENTRIES_LOCK shared from before its first insert, and the compactor takes it
+# exclusively just long enough to read the largest id: at that moment every
+# id up to it is committed, and later writers draw larger ones. SQLite runs
+# one write transaction at a time, so its ids are committed in order anyway.
+
+ENTRIES_LOCK = 7_201_001
+
+enabled = False
+compact_interval = 60
+
+
+def init_ledger(settings):
+    global enabled, compact_interval
+
+    enabled = settings.WALLET_LEDGER
+    compact_interval = settings.LEDGER_COMPACT_INTERVAL
+
+
+async def lock_entries(session: AsyncSession):
+    # before the first entry of a transaction, held until it ends
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql":
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock_shared(:key)"), dict(key=ENTRIES_LOCK)
+        )
+
+
+def latest_snapshot_id(wallet_id):
+    return (
+        select(models.DBWalletSnapshot.id)
+        .where(models.DBWalletSnapshot.wallet_id == wallet_id)
+        .order_by(models.DBWalletSnapshot.id.desc())
+        .limit(1)
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+
+
+def balance_expression(upto_entry_id=None):
+    # correlated against models.DBWallet, usable in any select over wallets
+    snapshot_id = latest_snapshot_id(models.DBWallet.id)
+    snapshot_balance = (
+        select(models.DBWalletSnapshot.balance)
+        .where(models.DBWalletSnapshot.id == snapshot_id)
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+    snapshot_entry_id = (
+        select(models.DBWalletSnapshot.last_entry_id)
+        .where(models.DBWalletSnapshot.id == snapshot_id)
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+
+    conditions = [
+        models.DBWalletEntry.wallet_id == models.DBWallet.id,
+        models.DBWalletEntry.id > func.coalesce(snapshot_entry_id, 0),
+    ]
+    if upto_entry_id is not None:
+        conditions.append(models.DBWalletEntry.id <= upto_entry_id)
+
+    entries = (
+        select(func.coalesce(func.sum(models.DBWalletEntry.amount), 0.0))
+        .where(*conditions)
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+
+    return func.coalesce(snapshot_balance, models.DBWallet.balance) + entries
+
+
+def append_entry(wallet_id: int, amount: float, transaction_id: int | None = None):
+    return insert(models.DBWalletEntry).values(
+        wallet_id=wallet_id,
+        amount=amount,
+        transaction_id=transaction_id,
+        created_date=datetime.datetime.now(),
+    )
+
+
+def lock_wallet(wallet_id: int):
+    return (
+        select(models.DBWallet.id)
+        .where(models.DBWallet.id == wallet_id)
+        .with_for_update()
+    )
+
+
+def append_debit(wallet_id: int, amount: float):
+    # Appends the entry only when the wallet can cover it. Run it after
+    # lock_wallet in the same transaction: the lock has to be taken by a
+    # statement of its own, so that on READ COMMITTED the balance check here
+    # reads a snapshot taken after any competing debit of the same customer
+    # has committed. Merchants only ever receive credits and are never locked.
+    funded = select(
+        models.DBWallet.id,
+        literal(-amount),
+        literal(datetime.datetime.now()),
+    ).where(models.DBWallet.id == wallet_id, balance_expression() >= amount)
+    return insert(models.DBWalletEntry).from_select(
+        ["wallet_id", "amount", "created_date"], funded
+    )
+
+
+def append_transaction_debits(wallet_id: int, transaction_ids: list[int], total: float):
+    # One debit entry per transaction, appended all or nothing when the wallet
+    # covers the total, after lock_wallet like append_debit.
+    funded = (
+        select(
+            models.DBWallet.id,
+            -models.DBTransection.price,
+            models.DBTransection.id,
+            literal(datetime.datetime.now()),
+        )
+        .select_from(models.DBWallet)
+        .join(models.DBTransection, models.DBTransection.id.in_(transaction_ids))
+        .where(models.DBWallet.id == wallet_id, balance_expression() >= total)
+    )
+    return insert(models.DBWalletEntry).from_select(
+        ["wallet_id", "amount", "transaction_id", "created_date"], funded
+    )
+
+
+async def append_entries(session: AsyncSession, entries: list[dict]):
+    created_date = datetime.datetime.now()
+    await session.execute(
+        insert(models.DBWalletEntry),
+        [dict(entry, created_date=created_date) for entry in entries],
+    )
+
+
+async def get_balances(session: AsyncSession, wallet_ids: list[int]) -> dict[int, float]:
+    if not wallet_ids:
+        return {}
+
+    result = await session.execute(
+        select(models.DBWallet.id, balance_expression()).where(
+            models.DBWallet.id.in_(wallet_ids)
+        )
+    )
+    return {wallet_id: balance for wallet_id, balance in result.all()}
+
+
+async def with_balances(
+    session: AsyncSession, dbwallets: list[models.DBWallet]
+) -> list[models.Wallet]:
+    wallets = [models.Wallet.from_orm(dbwallet) for dbwallet in dbwallets]
+    if enabled:
+        balances = await get_balances(session, [wallet.id for wallet in wallets])
+    else:
+        striped = [dbwallet.id for dbwallet in dbwallets if dbwallet.stripes]
+        balances = await stripes.get_balances(session, striped)
+
+    return [
+        wallet.model_copy(update=dict(balance=balances.get(wallet.id, wallet.balance)))
+        for wallet in wallets
+    ]
+
+
+async def settled_entry_id(session: AsyncSession) -> int:
+    connection = await session.connection()
+    if connection.dialect.name == "postgresql":
+        # waits for the writers that are running, and holds off new ones
+        # only until the commit below
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(:key)"), dict(key=ENTRIES_LOCK)
+        )
+    result = await session.execute(select(func.max(models.DBWalletEntry.id)))
+    settled = result.scalar() or 0
+    await session.commit()
+    return settled
+
+
+async def compact(session: AsyncSession) -> int:
+    settled = await settled_entry_id(session)
+
+    upto_entry_id = (
+        select(func.max(models.DBWalletEntry.id))
+        .where(
+            models.DBWalletEntry.wallet_id == models.DBWallet.id,
+            models.DBWalletEntry.id <= settled,
+        )
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+    snapshot_entry_id = (
+        select(models.DBWalletSnapshot.last_entry_id)
+        .where(
+            models.DBWalletSnapshot.id == latest_snapshot_id(models.DBWallet.id)
+        )
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+
+    pending = select(
+        models.DBWallet.id,
+        balance_expression(upto_entry_id),
+        upto_entry_id,
+        literal(datetime.datetime.now()),
+    ).where(upto_entry_id > func.coalesce(snapshot_entry_id, 0))
+
+    result = await session.execute(
+        insert(models.DBWalletSnapshot).from_select(
+            ["wallet_id", "balance", "last_entry_id", "created_date"], pending
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def run_compactor():
+    while True:
+        await asyncio.sleep(compact_interval)
+        try:
+            async with models.sessionmanager.session() as session:
+                count = await compact(session)
+            logger.debug("ledger compactor wrote %d snapshots", count)
+        except Exception:
+            logger.exception("ledger compaction failed")
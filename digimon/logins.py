@@ -0,0 +1,78 @@
+import asyncio
+import datetime
+import logging
+
+from sqlalchemy import bindparam, update
+
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+# last_login_date is written behind. /token only records the login time here;
+# run_flusher writes everything recorded with one bulk UPDATE every
+# flush_interval seconds, or as soon as flush_size logins are waiting, and
+# lifespan flushes what is left on shutdown.
+
+flush_interval = 5
+flush_size = 1000
+
+pending: dict[int, datetime.datetime] = {}
+flush_requested = asyncio.Event()
+
+
+def init_login_buffer(settings):
+    global flush_interval, flush_size
+
+    flush_interval = settings.LAST_LOGIN_FLUSH_INTERVAL
+    flush_size = settings.LAST_LOGIN_FLUSH_SIZE
+
+
+def record_login(user_id: int, login_date: datetime.datetime):
+    pending[user_id] = login_date
+    if len(pending) >= flush_size:
+        flush_requested.set()
+
+
+async def flush() -> int:
+    if not pending:
+        return 0
+
+    batch = dict(pending)
+    pending.clear()
+    try:
+        async with models.sessionmanager.session() as session:
+            # a core executemany, so rows deleted meanwhile are skipped
+            await session.execute(
+                update(models.DBUser.__table__)
+                .where(models.DBUser.__table__.c.id == bindparam("user_id"))
+                .values(last_login_date=bindparam("login_date")),
+                [
+                    dict(user_id=user_id, login_date=login_date)
+                    for user_id, login_date in batch.items()
+                ],
+            )
+            await session.commit()
+    except BaseException:
+        # keep the batch for the next flush unless a newer login replaced it,
+        # also when the flusher is cancelled at shutdown, so lifespan writes it
+        for user_id, login_date in batch.items():
+            pending.setdefault(user_id, login_date)
+        raise
+
+    return len(batch)
+
+
+async def run_flusher():
+    while True:
+        try:
+            await asyncio.wait_for(flush_requested.wait(), flush_interval)
+        except asyncio.TimeoutError:
+            pass
+        flush_requested.clear()
+
+        try:
+            count = await flush()
+            logger.debug("flushed %d last_login_date updates", count)
+        except Exception:
+            logger.exception("last_login_date flush failed")
@@ -1,31 +1,98 @@
-from gevent import monkey
-
-monkey.patch_all()
+import asyncio
+import logging
 
 from fastapi import FastAPI
 
 from contextlib import asynccontextmanager
 
+from . import catalog
 from . import config
+from . import counts
+from . import deps
+from . import idempotency
+from . import instrumentation
+from . import jobs
 from .routers import init_router
 from . import models
+from . import ledger
+from . import logins
+from . import migrations
+from . import onboarding
+from . import ratelimit
+from . import replicas
+from . import security
+
 
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if migrations.check_on_startup:
+        try:
+            await migrations.check_schema(models.engine)
+        except Exception:
+            logger.exception("schema check failed")
+
+    tasks = [asyncio.create_task(logins.run_flusher())]
+    tasks.extend(jobs.start())
+    if ledger.enabled:
+        tasks.append(asyncio.create_task(ledger.run_compactor()))
+    if counts.resync_interval > 0:
+        tasks.append(asyncio.create_task(counts.run_resync()))
+    if idempotency.enabled:
+        tasks.append(asyncio.create_task(idempotency.run_purger()))
+
     yield
-    if models.engine is not None:
-        await models.sesion_close()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        await logins.flush()
+    except Exception:
+        logger.exception("last_login_date flush failed")
+
+    try:
+        await jobs.drain()
+    except Exception:
+        logger.exception("draining the job queue failed")
+
+    security.close_password_hasher()
+    onboarding.close_onboarding()
+
+    await replicas.close_replicas()
+    if models.sessionmanager.settings is not None:
+        await models.close_session()
 
 
 def create_app(settings=None):
     if not settings:
         settings = config.get_settings()
+    config.set_settings(settings)
 
     app = FastAPI(lifespan=lifespan)
+    app.add_middleware(replicas.ReadYourWritesMiddleware)
+    app.add_middleware(instrumentation.InstrumentationMiddleware)
+    # outermost, a refused request skips everything else
+    app.add_middleware(ratelimit.RateLimitMiddleware)
 
+    instrumentation.init_instrumentation(settings)
+    ratelimit.init_rate_limits(settings)
     models.init_db(settings)
+    replicas.init_replicas(settings)
+    migrations.init_migrations(settings)
+    ledger.init_ledger(settings)
+    logins.init_login_buffer(settings)
+    counts.init_counts(settings)
+    security.init_password_hasher(settings)
+    onboarding.init_onboarding(settings)
+    deps.init_principal_cache(settings)
+    deps.init_client_address(settings)
+    catalog.init_catalog(settings)
+    idempotency.init_idempotency(settings)
+    jobs.init_jobs(settings)
 
     init_router(app)
-    return app
\ No newline at end of file
+    return app
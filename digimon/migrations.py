@@ -0,0 +1,231 @@
+import logging
+from typing import NamedTuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlmodel import SQLModel
+
+from . import models
+from . import sales
+
+
+logger = logging.getLogger(__name__)
+
+# Versioned schema changes for databases that already hold data, where
+# recreate_table is not an option. Migrations run in order, once each, and are
+# recorded in schema_migrations. They run on an autocommit connection and are
+# written to be safe to re-run, so an interrupted migration is simply applied
+# again. On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY, which
+# does not block writes while it runs.
+
+check_on_startup = True
+
+metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_date", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    table: str
+    columns: tuple[str, ...]
+    unique: bool = False
+
+
+HOT_LOOKUP_INDEXES = [
+    IndexSpec("ix_users_username", "users", ("username",), unique=True),
+    IndexSpec("ix_users_email", "users", ("email",)),
+    IndexSpec("ix_dbwallet_user_id", "dbwallet", ("user_id",)),
+    IndexSpec("ix_dbmerchant_user_id", "dbmerchant", ("user_id",)),
+    IndexSpec("ix_customers_user_id", "customers", ("user_id",)),
+    IndexSpec("ix_dbitem_merchant_id_id", "dbitem", ("merchant_id", "id")),
+    IndexSpec(
+        "ix_dbtransection_merchant_id_id", "dbtransection", ("merchant_id", "id")
+    ),
+    IndexSpec(
+        "ix_dbtransection_customer_id_id", "dbtransection", ("customer_id", "id")
+    ),
+]
+
+
+def init_migrations(settings):
+    global check_on_startup
+
+    check_on_startup = settings.SCHEMA_CHECK
+
+
+async def create_index(connection: AsyncConnection, index: IndexSpec):
+    concurrently = connection.dialect.name == "postgresql"
+    if concurrently:
+        result = await connection.execute(
+            text(
+                "SELECT i.indisvalid FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ),
+            dict(name=index.name),
+        )
+        if result.scalar() is False:
+            # left behind by an interrupted CREATE INDEX CONCURRENTLY
+            await connection.execute(text(f"DROP INDEX CONCURRENTLY {index.name}"))
+
+    await connection.execute(
+        text(
+            f"CREATE {'UNIQUE ' if index.unique else ''}INDEX "
+            f"{'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index.name} "
+            f"ON {index.table} ({', '.join(index.columns)})"
+        )
+    )
+
+
+async def create_tables(connection: AsyncConnection):
+    await connection.run_sync(SQLModel.metadata.create_all)
+
+
+async def add_wallet_stripes(connection: AsyncConnection):
+    columns = await connection.run_sync(
+        lambda sync_connection: [
+            column["name"] for column in inspect(sync_connection).get_columns("dbwallet")
+        ]
+    )
+    if "stripes" not in columns:
+        await connection.execute(
+            text("ALTER TABLE dbwallet ADD COLUMN stripes INTEGER NOT NULL DEFAULT 0")
+        )
+
+
+async def create_hot_lookup_indexes(connection: AsyncConnection):
+    for index in HOT_LOOKUP_INDEXES:
+        await create_index(connection, index)
+
+
+async def add_sales_rollups(connection: AsyncConnection):
+    columns = await connection.run_sync(
+        lambda sync_connection: [
+            column["name"]
+            for column in inspect(sync_connection).get_columns("dbtransection")
+        ]
+    )
+    if "created_at" not in columns:
+        column_type = models.DBTransection.__table__.c.created_at.type
+        await connection.execute(
+            text(
+                "ALTER TABLE dbtransection ADD COLUMN created_at "
+                + column_type.compile(dialect=connection.dialect)
+            )
+        )
+
+    await connection.run_sync(
+        lambda sync_connection: models.DBSalesRollup.__table__.create(
+            sync_connection, checkfirst=True
+        )
+    )
+    await sales.rebuild(connection)
+
+
+async def create_job_outbox(connection: AsyncConnection):
+    await connection.run_sync(
+        lambda sync_connection: models.DBJob.__table__.create(
+            sync_connection, checkfirst=True
+        )
+    )
+
+
+async def add_admin_role(connection: AsyncConnection):
+    # SQLite keeps the role as plain text, PostgreSQL as an enum type
+    if connection.dialect.name == "postgresql":
+        await connection.execute(text("ALTER TYPE userrole ADD VALUE IF NOT EXISTS 'admin'"))
+
+
+async def create_idempotency_keys(connection: AsyncConnection):
+    await connection.run_sync(
+        lambda sync_connection: models.DBIdempotencyKey.__table__.create(
+            sync_connection, checkfirst=True
+        )
+    )
+
+
+MIGRATIONS = [
+    (1, "create missing tables", create_tables),
+    (2, "add dbwallet.stripes", add_wallet_stripes),
+    (3, "hot lookup indexes", create_hot_lookup_indexes),
+    (4, "add dbtransection.created_at and sales rollups", add_sales_rollups),
+    (5, "job outbox", create_job_outbox),
+    (6, "admin user role", add_admin_role),
+    (7, "idempotency keys", create_idempotency_keys),
+]
+
+
+async def applied_versions(connection: AsyncConnection) -> set[int]:
+    has_table = await connection.run_sync(
+        lambda sync_connection: inspect(sync_connection).has_table(
+            schema_migrations.name
+        )
+    )
+    if not has_table:
+        return set()
+
+    result = await connection.execute(schema_migrations.select())
+    return {row.version for row in result}
+
+
+async def pending_migrations(connection: AsyncConnection) -> list[tuple]:
+    applied = await applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+
+async def migrate(engine: AsyncEngine) -> list[int]:
+    applied = []
+    async with engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        await connection.run_sync(metadata.create_all)
+
+        for version, name, migration in await pending_migrations(connection):
+            logger.info("applying migration %d: %s", version, name)
+            await migration(connection)
+            await connection.execute(
+                schema_migrations.insert().values(version=version, name=name)
+            )
+            applied.append(version)
+
+    return applied
+
+
+async def missing_indexes(connection: AsyncConnection) -> list[str]:
+    def inspect_indexes(sync_connection):
+        inspector = inspect(sync_connection)
+        tables = set(inspector.get_table_names())
+
+        missing = []
+        for table in SQLModel.metadata.sorted_tables:
+            if table.name not in tables:
+                missing.extend(f"{table.name}.{index.name}" for index in table.indexes)
+                continue
+            names = {index["name"] for index in inspector.get_indexes(table.name)}
+            missing.extend(
+                f"{table.name}.{index.name}"
+                for index in table.indexes
+                if index.name not in names
+            )
+        return missing
+
+    return await connection.run_sync(inspect_indexes)
+
+
+async def check_schema(engine: AsyncEngine) -> list[str]:
+    async with engine.connect() as connection:
+        missing = await missing_indexes(connection)
+        pending = await pending_migrations(connection)
+
+    for name in missing:
+        logger.warning("index %s is missing, lookups on it will scan", name)
+    if pending:
+        logger.warning(
+            "%d schema migrations pending, run Scripts/migrate.py", len(pending)
+        )
+    return missing
@@ -1,43 +1,44 @@
 from sqlmodel import SQLModel
 from typing import AsyncIterator
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine
 from .items import *
 from .merchants import *
 from .transactions import *
 from .wallets import *
 from .users import *
 from .customers import *
+from .ledgers import *
+from .sales import *
+from .jobs import *
+from .idempotency import *
+
+from .database import DatabaseSessionManager
 
 connect_args = {}
 
-engine = None
+sessionmanager = DatabaseSessionManager()
 
-def init_db(settings):
-    global engine
 
-    engine = create_async_engine(
-        settings.SQLDB_URL,
-        echo=True,
-        future=True,
-        connect_args=connect_args,
-    )
+def __getattr__(name):
+    # models.engine creates the engine on first access
+    if name == "engine":
+        return sessionmanager.engine
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def init_db(settings):
+    sessionmanager.init(settings, connect_args=connect_args)
 
 async def recreate_table():
-    async with engine.begin() as conn:
+    async with sessionmanager.engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.drop_all)
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
 async def get_session() -> AsyncIterator[AsyncSession]:
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    async with async_session() as session:
+    async with sessionmanager.session() as session:
         yield session
 
 
 async def close_session():
-    global engine
-    if engine is None:
-        raise Exception("DatabaseSessionManager is not initialized")
-    await engine.dispose()
\ No newline at end of file
+    await sessionmanager.close()
@@ -1,5 +1,6 @@
 from typing import Optional
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel,Relationship
 from .users import *
 from .wallets import *
@@ -23,6 +24,7 @@ class Customer(BaseCustomer):
     
 class DBCustomer(BaseCustomer, SQLModel, table=True):
     __tablename__ = "customers"
+    __table_args__ = (Index("ix_customers_user_id", "user_id"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     
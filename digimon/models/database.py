@@ -0,0 +1,154 @@
+import contextlib
+import time
+from typing import AsyncIterator
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import instrumentation
+
+
+class PoolStats:
+    def __init__(self):
+        self.waiters = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.acquire_seconds = 0.0
+        self.acquire_seconds_max = 0.0
+
+    def record(self, seconds):
+        self.acquired += 1
+        self.acquire_seconds += seconds
+        self.acquire_seconds_max = max(self.acquire_seconds_max, seconds)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    stats: PoolStats | None = None
+
+    def _do_get(self):
+        stats = self.stats
+        if stats is None:
+            return super()._do_get()
+
+        stats.waiters += 1
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiters -= 1
+
+        elapsed = time.perf_counter() - started
+        stats.record(elapsed)
+        instrumentation.record_pool_wait(elapsed)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class DatabaseSessionManager:
+    def __init__(self):
+        self.settings = None
+        self.connect_args = None
+        self._engine: AsyncEngine | None = None
+        self._sessionmaker: async_sessionmaker | None = None
+        self.stats = PoolStats()
+
+    def init(self, settings, connect_args=None):
+        # the engine, and with it the database driver, is only created on
+        # first use, so building the app stays cheap
+        self.settings = settings
+        self.connect_args = connect_args
+        self._engine = None
+        self._sessionmaker = None
+        self.stats = PoolStats()
+
+    @property
+    def started(self) -> bool:
+        return self._engine is not None
+
+    @property
+    def engine(self) -> AsyncEngine | None:
+        if self._engine is None and self.settings is not None:
+            self.start()
+        return self._engine
+
+    @property
+    def sessionmaker(self) -> async_sessionmaker | None:
+        if self._sessionmaker is None and self.settings is not None:
+            self.start()
+        return self._sessionmaker
+
+    def start(self):
+        settings = self.settings
+        url = make_url(settings.SQLDB_URL)
+        kwargs = dict(
+            echo=settings.SQL_ECHO,
+            future=True,
+            connect_args=self.connect_args or {},
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+        )
+
+        # in-memory SQLite keeps its single static connection
+        if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+            kwargs.update(
+                poolclass=InstrumentedQueuePool,
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+            )
+
+        engine = create_async_engine(url, **kwargs)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.stats = self.stats
+        instrumentation.install(engine)
+
+        self._engine = engine
+        self._sessionmaker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    async def close(self):
+        if self.settings is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+        if self._engine is not None:
+            await self._engine.dispose()
+        self.settings = None
+        self._engine = None
+        self._sessionmaker = None
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        if self.sessionmaker is None:
+            raise Exception("DatabaseSessionManager is not initialized")
+
+        async with self.sessionmaker() as session:
+            yield session
+
+    def pool_stats(self) -> dict:
+        pool = self._engine.pool if self._engine is not None else None
+        queued = isinstance(pool, AsyncAdaptedQueuePool)
+        stats = self.stats
+        return dict(
+            pool=type(pool).__name__ if pool is not None else None,
+            size=pool.size() if queued else 0,
+            checked_in=pool.checkedin() if queued else 0,
+            checked_out=pool.checkedout() if queued else 0,
+            overflow=pool.overflow() if queued else 0,
+            waiters=stats.waiters,
+            acquired=stats.acquired,
+            timeouts=stats.timeouts,
+            acquire_ms_avg=(
+                stats.acquire_seconds / stats.acquired * 1000 if stats.acquired else 0.0
+            ),
+            acquire_ms_max=stats.acquire_seconds_max * 1000,
+        )
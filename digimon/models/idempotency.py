@@ -0,0 +1,24 @@
+import datetime
+import typing
+from sqlalchemy import JSON, Column, Index
+from sqlmodel import Field, SQLModel
+
+
+class DBIdempotencyKey(SQLModel, table=True):
+    # the primary key is what makes a key unique per user and route
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_date", "created_date"),
+        {"extend_existing": True},
+    )
+
+    user_id: int = Field(primary_key=True)
+    route: str = Field(primary_key=True)
+    key: str = Field(primary_key=True, max_length=255)
+
+    fingerprint: str
+    status_code: int
+    # the response body, or the detail of the HTTPException
+    response: typing.Any = Field(default=None, sa_column=Column(JSON))
+
+    created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
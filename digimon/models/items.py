@@ -1,5 +1,6 @@
 from typing import Optional, List
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index
 from sqlmodel import Relationship, SQLModel, Field
 from . import merchants
 from .users import *
@@ -25,7 +26,10 @@ class Item(BaseItem):
     role: UserRole
 
 class DBItem(SQLModel, Item, table=True):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_dbitem_merchant_id_id", "merchant_id", "id"),
+        {"extend_existing": True},
+    )
     # Correctly define the primary key with default=None
     id: int = Field(default=None, primary_key=True)
     # Properly set foreign key reference
@@ -43,6 +47,7 @@ class ItemList(BaseModel):
     page_count: int
     
     size_per_page: int
+    next_cursor: str | None = None
     
 
 # Import the BaseMerchant module correctly
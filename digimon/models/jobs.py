@@ -0,0 +1,23 @@
+import datetime
+from typing import Optional
+from sqlalchemy import JSON, Column, Index
+from sqlmodel import Field, SQLModel
+
+
+class DBJob(SQLModel, table=True):
+    __tablename__ = "job_outbox"
+    __table_args__ = (
+        Index("ix_job_outbox_run_after", "run_after"),
+        # a queued job is matched to its row by id, ids must never be reused
+        {"extend_existing": True, "sqlite_autoincrement": True},
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    kind: str
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    attempts: int = 0
+    # when the sweeper may pick the job up, None once it has run out of attempts
+    run_after: datetime.datetime | None = None
+    last_error: str | None = None
+
+    created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -0,0 +1,48 @@
+import datetime
+from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel
+
+
+class BaseWalletEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    wallet_id: int
+    amount: float
+    transaction_id: int | None = None
+
+
+class WalletEntry(BaseWalletEntry):
+    id: int
+    created_date: datetime.datetime
+
+
+class DBWalletEntry(BaseWalletEntry, SQLModel, table=True):
+    __tablename__ = "wallet_entries"
+    __table_args__ = (
+        Index("ix_wallet_entries_wallet_id_id", "wallet_id", "id"),
+        {"extend_existing": True},
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    wallet_id: int = Field(foreign_key="dbwallet.id")
+    transaction_id: int | None = Field(default=None, foreign_key="dbtransection.id")
+
+    created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
+
+
+class DBWalletSnapshot(SQLModel, table=True):
+    __tablename__ = "wallet_snapshots"
+    __table_args__ = (
+        Index("ix_wallet_snapshots_wallet_id_id", "wallet_id", "id"),
+        {"extend_existing": True},
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    wallet_id: int = Field(foreign_key="dbwallet.id")
+    balance: float
+    # entries with an id up to and including this one are folded into balance
+    last_entry_id: int
+
+    created_date: datetime.datetime = Field(default_factory=datetime.datetime.now)
@@ -1,6 +1,7 @@
 # Merchant
 from typing import Optional , List
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from . import users
@@ -28,7 +29,10 @@ class Merchant(BaseMerchant):
     
 
 class DBMerchant(BaseMerchant, SQLModel, table=True):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_dbmerchant_user_id", "user_id"),
+        {"extend_existing": True},
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     items: list["DBItem"] = Relationship(back_populates="merchant", cascade_delete=True)
     #wallets: list["wallets.DBWallet"] = Relationship(back_populates="merchant", cascade_delete=True)
@@ -40,4 +44,5 @@ class MerchantList(BaseModel):
     merchants: list[Merchant]
     page: int
     page_size: int
-    size_per_page: int
\ No newline at end of file
+    size_per_page: int
+    next_cursor: str | None = None
\ No newline at end of file
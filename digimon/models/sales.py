@@ -0,0 +1,42 @@
+import datetime
+from pydantic import BaseModel, ConfigDict
+from sqlmodel import Field, SQLModel
+
+
+class DailySales(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    day: datetime.date
+    quantity: int
+    revenue: float
+
+
+class ItemSales(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    item_id: int
+    quantity: int
+    revenue: float
+
+
+class MerchantSales(BaseModel):
+    merchant_id: int
+    start: datetime.date
+    end: datetime.date
+    quantity: int
+    revenue: float
+    days: list[DailySales]
+    items: list[ItemSales]
+
+
+class DBSalesRollup(SQLModel, table=True):
+    # the primary key doubles as the index for a merchant's date range
+    __tablename__ = "sales_rollups"
+    __table_args__ = ({"extend_existing": True},)
+
+    merchant_id: int = Field(primary_key=True)
+    day: datetime.date = Field(primary_key=True)
+    item_id: int = Field(primary_key=True)
+
+    quantity: int = 0
+    revenue: float = 0.0
@@ -1,8 +1,10 @@
 # Trasection
 from typing import Optional
+import pydantic
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
-from datetime import datetime
+import datetime
 from .users import *
 
 class BaseTransaction(BaseModel):
@@ -18,14 +20,41 @@ class CreatedTransaction(BaseTransaction):
 class UpdatedTransaction(BaseTransaction):
     pass
 
+# every unit bought becomes a transaction row, so carts are bounded before
+# any of them is built
+MAX_CART_ITEMS = 100
+MAX_CART_QUANTITY = 100
+MAX_CART_UNITS = 1000
+
+class CartItem(BaseModel):
+    item_id: int
+    quantity: int = pydantic.Field(default=1, ge=1, le=MAX_CART_QUANTITY)
+
+class CreatedCart(BaseModel):
+    items: list[CartItem] = pydantic.Field(min_length=1, max_length=MAX_CART_ITEMS)
+
+    description: str | None = None
+
+    @pydantic.field_validator("items")
+    @classmethod
+    def limit_units(cls, items: list[CartItem]) -> list[CartItem]:
+        if sum(item.quantity for item in items) > MAX_CART_UNITS:
+            raise ValueError(f"A cart holds at most {MAX_CART_UNITS} units")
+        return items
+
 class Transaction(BaseTransaction):
     id: int
     price: float
     merchant_id: int
     customer_id: int
+    created_at: datetime.datetime | None = None
 
 class DBTransection(BaseTransaction, SQLModel , table=True):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_dbtransection_merchant_id_id", "merchant_id", "id"),
+        Index("ix_dbtransection_customer_id_id", "customer_id", "id"),
+        {"extend_existing": True},
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     price: float = Field(default=None)
     
@@ -33,10 +62,13 @@ class DBTransection(BaseTransaction, SQLModel , table=True):
     
     customer_id: int = Field(default=None)
 
+    created_at: datetime.datetime | None = Field(default_factory=datetime.datetime.now)
+
 class TransactionList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
     transactions: list[Transaction]
     page: int
     page_size: int
-    size_per_page: int
\ No newline at end of file
+    size_per_page: int
+    next_cursor: str | None = None
\ No newline at end of file
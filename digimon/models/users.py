@@ -2,6 +2,7 @@ import datetime
 from typing import TYPE_CHECKING, List
 import pydantic
 from pydantic import BaseModel, EmailStr, ConfigDict
+from sqlalchemy import Index
 from sqlmodel import Relationship, SQLModel, Field
 
 #from passlib.context import CryptContext
@@ -14,11 +15,12 @@ if TYPE_CHECKING:
     
 from enum import Enum
 #pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-import bcrypt
+from .. import security
 
 class UserRole(str, Enum):
     merchant = "merchant"
     customer = "customer"
+    admin = "admin"
 
 class BaseUser(BaseModel):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
@@ -68,6 +70,43 @@ class RegisteredUser(BaseUser):
     password: str = pydantic.Field(json_schema_extra=dict(example="password"))
 
 
+MAX_OPENING_BALANCE = 1_000_000.0
+
+
+class OnboardedUser(RegisteredUser):
+    role: UserRole
+
+    # merchant or customer profile
+    name: str
+    description: str | None = None
+    tax_id: str | None = None
+
+    balance: float = pydantic.Field(default=0.0, ge=0, le=MAX_OPENING_BALANCE)
+
+    @pydantic.field_validator("role")
+    @classmethod
+    def check_role(cls, role: UserRole) -> UserRole:
+        if role not in (UserRole.merchant, UserRole.customer):
+            raise ValueError("only merchants and customers can be onboarded")
+        return role
+
+
+class OnboardingBatch(BaseModel):
+    # rows are validated one by one so a bad row is reported, not fatal
+    users: list[dict] = pydantic.Field(min_length=1, max_length=10_000)
+
+
+class OnboardingError(BaseModel):
+    row: int
+    username: str | None = None
+    detail: str
+
+
+class OnboardingResult(BaseModel):
+    created: int
+    errors: list[OnboardingError]
+
+
 class UpdatedUser(BaseUser):
     roles: list[str]
 
@@ -94,6 +133,10 @@ class ChangedPasswordUser(BaseModel):
 
 class DBUser(BaseUser, SQLModel, table=True):
     __tablename__ = "users"
+    __table_args__ = (
+        Index("ix_users_username", "username", unique=True),
+        Index("ix_users_email", "email"),
+    )
     id: int | None = Field(default=None, primary_key=True)
 
     password: str
@@ -115,13 +158,9 @@ class DBUser(BaseUser, SQLModel, table=True):
                 return True
         return False
     async def get_encrypted_password(self, plain_password):
-        return bcrypt.hashpw(
-            plain_password.encode("utf-8"), salt=bcrypt.gensalt()
-        ).decode("utf-8")
+        return await security.hash_password(plain_password)
     async def set_password(self, plain_password):
         self.password = await self.get_encrypted_password(plain_password)
 
     async def verify_password(self, plain_password):
-        return bcrypt.checkpw(
-            plain_password.encode("utf-8"), self.password.encode("utf-8")
-        )
\ No newline at end of file
+        return await security.verify_password(plain_password, self.password)
\ No newline at end of file
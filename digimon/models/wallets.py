@@ -1,5 +1,7 @@
 from typing import TYPE_CHECKING, Optional
+import pydantic
 from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 from .customers import DBCustomer
 from .users import *
@@ -17,6 +19,13 @@ class CreatedWallet(BaseWallet):
 class UpdatedWallet(BaseWallet):
     pass
 
+class WalletAmount(BaseModel):
+    # what a top-up or withdrawal moves, never zero or negative
+    balance: float = pydantic.Field(gt=0, allow_inf_nan=False)
+
+class UpdatedWalletStripes(BaseModel):
+    stripes: int = pydantic.Field(ge=0, le=64)
+
 class Wallet(BaseWallet):
     id: int
     balance: float
@@ -24,7 +33,10 @@ class Wallet(BaseWallet):
     role: UserRole
     
 class DBWallet(Wallet, SQLModel, table=True):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index("ix_dbwallet_user_id", "user_id"),
+        {"extend_existing": True},
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     
     
@@ -34,10 +46,26 @@ class DBWallet(Wallet, SQLModel, table=True):
     #customer: Optional["DBCustomer"] = Relationship(back_populates="wallets")
     
     role: UserRole = Field(default=None)
+
+    # number of DBWalletStripe rows credits are spread over, 0 when not striped
+    stripes: int = Field(default=0)
+
+class DBWalletStripe(SQLModel, table=True):
+    __tablename__ = "wallet_stripes"
+    __table_args__ = (
+        UniqueConstraint("wallet_id", "stripe"),
+        {"extend_existing": True},
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    wallet_id: int = Field(foreign_key="dbwallet.id")
+    stripe: int
+    balance: float = Field(default=0.0)
     
 class WalletList(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     wallets: list[Wallet]
     page: int
     page_size: int
-    size_per_page: int
\ No newline at end of file
+    size_per_page: int
+    next_cursor: str | None = None
\ No newline at end of file
@@ -0,0 +1,217 @@
+import asyncio
+import datetime
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+from . import security
+
+
+# Bulk account onboarding. A batch is far more bcrypt work than the request
+# path thread pool is sized for, so passwords are hashed on a process pool
+# across every core, and users, profiles and wallets are written with one
+# multi-row INSERT per table for each BATCH_SIZE rows. Bad rows are reported
+# back by their index and never abort the rest of the batch.
+
+BATCH_SIZE = 1_000
+
+enabled = False
+workers = os.cpu_count() or 1
+
+process_pool = None
+
+
+def init_onboarding(settings):
+    global enabled, workers
+
+    enabled = settings.BULK_ONBOARDING
+    workers = settings.ONBOARDING_HASH_WORKERS or os.cpu_count() or 1
+
+
+def get_process_pool():
+    global process_pool
+
+    if process_pool is None:
+        # imported here, most processes never onboard anyone
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # spawn rather than fork, the parent runs event loop and driver threads
+        process_pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return process_pool
+
+
+def close_onboarding():
+    global process_pool
+
+    if process_pool is not None:
+        process_pool.shutdown(wait=False, cancel_futures=True)
+        process_pool = None
+
+
+async def hash_passwords(plain_passwords: list[str]) -> list[str]:
+    if not plain_passwords:
+        return []
+
+    loop = asyncio.get_running_loop()
+    size = -(-len(plain_passwords) // (workers * 4))
+    chunks = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                get_process_pool(),
+                security._hash_passwords,
+                plain_passwords[start : start + size],
+            )
+            for start in range(0, len(plain_passwords), size)
+        ]
+    )
+    return [hashed for chunk in chunks for hashed in chunk]
+
+
+def validation_detail(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+async def existing_usernames(session: AsyncSession, usernames: list[str]) -> set[str]:
+    found = set()
+    for start in range(0, len(usernames), BATCH_SIZE):
+        result = await session.exec(
+            select(models.DBUser.username).where(
+                models.DBUser.username.in_(usernames[start : start + BATCH_SIZE])
+            )
+        )
+        found.update(result.all())
+    return found
+
+
+async def insert_rows(session: AsyncSession, rows: list[tuple]):
+    now = datetime.datetime.now()
+    result = await session.execute(
+        insert(models.DBUser).returning(models.DBUser.id, models.DBUser.username),
+        [
+            dict(
+                username=user.username,
+                email=user.email,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                password=hashed_password,
+                role=user.role,
+                register_date=now,
+                updated_date=now,
+            )
+            for _, user, hashed_password in rows
+        ],
+    )
+    user_ids = {username: user_id for user_id, username in result.all()}
+
+    profiles = {models.UserRole.merchant: [], models.UserRole.customer: []}
+    for _, user, _ in rows:
+        profiles[user.role].append(
+            dict(
+                name=user.name,
+                description=user.description,
+                tax_id=user.tax_id,
+                user_id=user_ids[user.username],
+            )
+        )
+    if profiles[models.UserRole.merchant]:
+        await session.execute(
+            insert(models.DBMerchant), profiles[models.UserRole.merchant]
+        )
+    if profiles[models.UserRole.customer]:
+        await session.execute(
+            insert(models.DBCustomer), profiles[models.UserRole.customer]
+        )
+
+    await session.execute(
+        insert(models.DBWallet),
+        [
+            dict(balance=user.balance, user_id=user_ids[user.username], role=user.role)
+            for _, user, _ in rows
+        ],
+    )
+
+
+async def onboard(session: AsyncSession, rows: list[dict]) -> models.OnboardingResult:
+    errors = []
+    accepted = []
+    seen = set()
+    for index, row in enumerate(rows):
+        username = row.get("username") if isinstance(row, dict) else None
+        try:
+            user = models.OnboardedUser.model_validate(row)
+        except ValidationError as e:
+            errors.append(
+                models.OnboardingError(
+                    row=index, username=username, detail=validation_detail(e)
+                )
+            )
+            continue
+
+        if user.username in seen:
+            errors.append(
+                models.OnboardingError(
+                    row=index,
+                    username=user.username,
+                    detail="Duplicate username in this batch.",
+                )
+            )
+            continue
+
+        seen.add(user.username)
+        accepted.append((index, user))
+
+    existing = await existing_usernames(session, [user.username for _, user in accepted])
+    for index, user in accepted:
+        if user.username in existing:
+            errors.append(
+                models.OnboardingError(
+                    row=index,
+                    username=user.username,
+                    detail="This username already exists.",
+                )
+            )
+    accepted = [(index, user) for index, user in accepted if user.username not in existing]
+
+    hashed_passwords = await hash_passwords([user.password for _, user in accepted])
+    pending = [
+        (index, user, hashed_password)
+        for (index, user), hashed_password in zip(accepted, hashed_passwords)
+    ]
+
+    created = 0
+    for start in range(0, len(pending), BATCH_SIZE):
+        batch = pending[start : start + BATCH_SIZE]
+        try:
+            await insert_rows(session, batch)
+            await session.commit()
+            created += len(batch)
+            continue
+        except IntegrityError:
+            await session.rollback()
+
+        # something was written concurrently; retry row by row to isolate it
+        for row in batch:
+            try:
+                await insert_rows(session, [row])
+                await session.commit()
+                created += 1
+            except IntegrityError as e:
+                await session.rollback()
+                errors.append(
+                    models.OnboardingError(
+                        row=row[0], username=row[1].username, detail=str(e.orig)
+                    )
+                )
+
+    errors.sort(key=lambda error: error.row)
+    return models.OnboardingResult(created=created, errors=errors)
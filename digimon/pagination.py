@@ -0,0 +1,56 @@
+import base64
+import binascii
+import json
+
+from fastapi import HTTPException, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+
+SIZE_PER_PAGE = 50
+MAX_SIZE_PER_PAGE = 500
+
+
+# Cursors are opaque to clients: base64 encoded JSON holding the sort key of
+# the last row of the previous page. A page is always `WHERE key > :last ORDER
+# BY key LIMIT :size`, so a deep page costs the same index seek as the first.
+
+
+def encode_cursor(value) -> str:
+    data = json.dumps(dict(after=value), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        after = json.loads(data)["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        after = None
+
+    # every page is keyed by an integer id; bool is an int to Python only
+    if not isinstance(after, int) or isinstance(after, bool):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return after
+
+
+async def paginate(
+    session: AsyncSession,
+    statement,
+    column,
+    cursor: str | None = None,
+    size: int = SIZE_PER_PAGE,
+) -> tuple[list, str | None]:
+    if cursor:
+        statement = statement.where(column > decode_cursor(cursor))
+
+    result = await session.exec(statement.order_by(column).limit(size + 1))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(getattr(rows[-1], column.key))
+
+    return rows, next_cursor
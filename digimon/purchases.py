@@ -0,0 +1,206 @@
+import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import idempotency
+from . import jobs
+from . import ledger
+from . import models
+from . import sales
+from . import stripes
+
+
+# Every purchase runs the same fixed sequence of statements inside one short
+# transaction: one lookup, a conditional debit, one credit per merchant, the
+# insert of the transaction rows and of one job for their sales rollups, which
+# runs after the response has been sent, and of the response itself when the
+# request has an Idempotency-Key. Wallet rows are always locked customer
+# first, then merchants in wallet id order, so concurrent purchases never
+# deadlock and purchases for different merchants never wait on each other. In
+# ledger mode the customer wallet is locked first and the debit and credits
+# are appended as wallet entries instead of updating the wallet rows, and
+# striped merchant wallets are credited through one of their stripes.
+
+MerchantWallet = aliased(models.DBWallet)
+CustomerWallet = aliased(models.DBWallet)
+
+
+def purchase_lookup(item_ids: list[int], customer_user_id: int):
+    return (
+        select(
+            models.DBItem.id,
+            models.DBItem.price,
+            models.DBItem.merchant_id,
+            MerchantWallet.id,
+            MerchantWallet.stripes,
+            models.DBCustomer.id,
+            CustomerWallet.id,
+        )
+        .select_from(models.DBItem)
+        .outerjoin(MerchantWallet, MerchantWallet.user_id == models.DBItem.user_id)
+        .outerjoin(models.DBCustomer, models.DBCustomer.user_id == customer_user_id)
+        .outerjoin(CustomerWallet, CustomerWallet.user_id == customer_user_id)
+        .where(models.DBItem.id.in_(item_ids))
+    )
+
+
+def debit_wallet(wallet_id: int, amount: float):
+    return (
+        update(models.DBWallet)
+        .where(models.DBWallet.id == wallet_id, models.DBWallet.balance >= amount)
+        .values(balance=models.DBWallet.balance - amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def credit_wallet(wallet_id: int, amount: float):
+    return (
+        update(models.DBWallet)
+        .where(models.DBWallet.id == wallet_id)
+        .values(balance=models.DBWallet.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def purchase_item(
+    session: AsyncSession,
+    customer_user_id: int,
+    transaction: models.CreatedTransaction,
+) -> models.Transaction:
+    cart = models.CreatedCart(
+        items=[models.CartItem(item_id=transaction.item_id)],
+        description=transaction.description,
+    )
+    transactions, job = await record_purchase(session, customer_user_id, cart)
+    return await commit_purchase(session, transactions[0], job)
+
+
+async def purchase_cart(
+    session: AsyncSession,
+    customer_user_id: int,
+    cart: models.CreatedCart,
+) -> list[models.Transaction]:
+    transactions, job = await record_purchase(session, customer_user_id, cart)
+    return await commit_purchase(session, transactions, job)
+
+
+async def commit_purchase(session: AsyncSession, result, job: models.DBJob | None):
+    idempotency.save(session, result)
+    await session.commit()
+    if job is not None:
+        jobs.enqueue([job])
+    return result
+
+
+async def record_purchase(
+    session: AsyncSession,
+    customer_user_id: int,
+    cart: models.CreatedCart,
+) -> tuple[list[models.Transaction], models.DBJob | None]:
+    item_ids = list(dict.fromkeys(cart_item.item_id for cart_item in cart.items))
+
+    result = await session.execute(purchase_lookup(item_ids, customer_user_id))
+    rows = {row[0]: row for row in result.all()}
+
+    missing = [item_id for item_id in item_ids if item_id not in rows]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Item not found: {', '.join(map(str, missing))}",
+        )
+
+    customer_id, customer_wallet_id = rows[item_ids[0]][5:]
+    if customer_id is None or customer_wallet_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Customer wallet not found"
+        )
+
+    now = datetime.datetime.now()
+    total = 0.0
+    credits = {}
+    merchant_wallets = {}
+    dbtransactions = []
+    for cart_item in cart.items:
+        item_id, price, merchant_id, merchant_wallet_id, merchant_wallet_stripes = rows[
+            cart_item.item_id
+        ][:5]
+        if merchant_wallet_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Merchant wallet not found",
+            )
+
+        amount = price * cart_item.quantity
+        total += amount
+        credits[merchant_wallet_id] = credits.get(merchant_wallet_id, 0.0) + amount
+        merchant_wallets[merchant_wallet_id] = merchant_wallet_stripes
+
+        dbtransactions.extend(
+            models.DBTransection(
+                item_id=item_id,
+                description=cart.description,
+                price=price,
+                merchant_id=merchant_id,
+                customer_id=customer_id,
+                created_at=now,
+            )
+            for _ in range(cart_item.quantity)
+        )
+
+    if ledger.enabled:
+        session.add_all(dbtransactions)
+        await session.flush()
+
+        await ledger.lock_entries(session)
+        await session.execute(ledger.lock_wallet(customer_wallet_id))
+        result = await session.execute(
+            ledger.append_transaction_debits(
+                customer_wallet_id, [t.id for t in dbtransactions], total
+            )
+        )
+        if result.rowcount != len(dbtransactions):
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance"
+            )
+
+        await ledger.append_entries(
+            session,
+            [
+                dict(
+                    wallet_id=rows[t.item_id][3],
+                    amount=t.price,
+                    transaction_id=t.id,
+                )
+                for t in dbtransactions
+            ],
+        )
+    else:
+        result = await session.execute(debit_wallet(customer_wallet_id, total))
+        if result.rowcount != 1:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance"
+            )
+
+        for wallet_id, amount in sorted(credits.items()):
+            wallet_stripes = merchant_wallets[wallet_id]
+            if wallet_stripes:
+                result = await session.execute(
+                    stripes.credit_stripe(wallet_id, wallet_stripes, amount)
+                )
+                if result.rowcount == 1:
+                    continue
+                # the stripes were removed since the lookup, the wallet row
+                # takes the credit instead
+            await session.execute(credit_wallet(wallet_id, amount))
+
+        session.add_all(dbtransactions)
+        await session.flush()
+
+    transactions = [models.Transaction.model_validate(t) for t in dbtransactions]
+    return transactions, sales.record_sales(session, dbtransactions)
@@ -0,0 +1,156 @@
+import math
+import re
+import time
+
+from fastapi.responses import JSONResponse
+
+from . import cache
+from . import deps
+
+
+# Admission control for the routes one client can overload the service with:
+# logins and registrations (bcrypt), purchases (wallet locks) and the list
+# routes (large reads). Each route class gives every caller, the token's user
+# or else the client address, a token bucket refilled at rate requests per
+# second and holding burst_seconds worth of them, and caps how many of its
+# requests run at once in this process. The middleware checks both before
+# routing, so a refused request costs no database or bcrypt work: 429 when
+# the caller is over its rate, 503 when the route class is full.
+
+ROUTE_CLASSES = {
+    "auth": (
+        {"POST"},
+        re.compile(r"^/(token|users/register_merchant|users/register_customer)$"),
+    ),
+    "buy": ({"POST"}, re.compile(r"^/buy(/batch)?$")),
+    "list": (
+        {"GET"},
+        re.compile(
+            r"^/(items/?|items/\d+/|merchants/?|merchants/\d+/sales"
+            r"|transections/transections|transections/export|wallets/?)$"
+        ),
+    ),
+}
+
+
+class RouteLimit:
+    def __init__(self, name: str, rate: float, burst: float, concurrency: int, callers: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        # an idle caller's bucket is full again after burst / rate seconds,
+        # the same as having none, so buckets expire then
+        self.buckets = cache.TTLCache(callers, burst / rate if rate > 0 else 0)
+
+        self.in_flight = 0
+        self.allowed = 0
+        self.rate_limited = 0
+        self.concurrency_limited = 0
+
+    def take(self, key) -> float:
+        # seconds until the caller may try again, 0 when a token was taken
+        if self.rate <= 0:
+            return 0
+
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens, updated = bucket
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens < 1:
+            self.buckets.set(key, (tokens, now))
+            return (1 - tokens) / self.rate
+
+        self.buckets.set(key, (tokens - 1, now))
+        return 0
+
+    def stats(self) -> dict:
+        return dict(
+            rate=self.rate,
+            burst=self.burst,
+            concurrency=self.concurrency,
+            in_flight=self.in_flight,
+            callers=len(self.buckets),
+            allowed=self.allowed,
+            rate_limited=self.rate_limited,
+            concurrency_limited=self.concurrency_limited,
+        )
+
+
+enabled = False
+limits: dict[str, RouteLimit] = {}
+
+
+def init_rate_limits(settings):
+    global enabled, limits
+
+    enabled = settings.RATE_LIMIT_ENABLED
+    rates = dict(
+        auth=(settings.RATE_LIMIT_AUTH, settings.CONCURRENCY_AUTH),
+        buy=(settings.RATE_LIMIT_BUY, settings.CONCURRENCY_BUY),
+        list=(settings.RATE_LIMIT_LIST, settings.CONCURRENCY_LIST),
+    )
+    limits = {
+        name: RouteLimit(
+            name,
+            rate,
+            max(1.0, rate * settings.RATE_LIMIT_BURST_SECONDS),
+            concurrency,
+            settings.RATE_LIMIT_CALLERS,
+        )
+        for name, (rate, concurrency) in rates.items()
+    }
+
+
+def route_limit(method: str, path: str) -> RouteLimit | None:
+    for name, (methods, pattern) in ROUTE_CLASSES.items():
+        if method in methods and pattern.match(path):
+            return limits.get(name)
+    return None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            return await self.app(scope, receive, send)
+
+        limit = route_limit(scope["method"], scope["path"])
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = limit.take(deps.caller(scope))
+        if retry_after:
+            limit.rate_limited += 1
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            return await response(scope, receive, send)
+
+        if limit.concurrency and limit.in_flight >= limit.concurrency:
+            limit.concurrency_limited += 1
+            response = JSONResponse(
+                {"detail": "Too many requests in progress"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            return await response(scope, receive, send)
+
+        limit.allowed += 1
+        limit.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.in_flight -= 1
+
+
+def stats() -> dict:
+    return {name: limit.stats() for name, limit in limits.items()}
@@ -0,0 +1,145 @@
+import hashlib
+import hmac
+import itertools
+import math
+import time
+import typing
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.requests import cookie_parser
+
+from . import cache
+from . import deps
+from . import models
+
+
+# Read-only routes take their session from get_read_session, which hands out
+# the replicas in turn. Anything but GET, HEAD and OPTIONS goes to the primary
+# and marks its caller, the token's user or else the client address, as a
+# recent writer; for the next window seconds that caller's reads go to the
+# primary too, so nobody reads a replica that has not caught up with their own
+# write yet. The time of the write travels with the client in a cookie signed
+# for that caller, so the worker that serves the next read need not be the one
+# that took the write; the same worker also remembers its recent writers, for
+# clients that drop cookies. Workers compare the cookie against their own
+# clock, which has to agree across hosts to well within the window. Without
+# SQLDB_REPLICA_URLS every session comes from the primary.
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+RECENT_WRITERS_SIZE = 100_000
+COOKIE = "last_write"
+
+managers: list[models.DatabaseSessionManager] = []
+window = 5.0
+recent_writers = cache.TTLCache(0, 0)
+secret = b""
+turn = itertools.count()
+
+
+def init_replicas(settings):
+    global managers, window, recent_writers, secret
+
+    managers = []
+    for url in settings.SQLDB_REPLICA_URLS:
+        manager = models.DatabaseSessionManager()
+        manager.init(
+            settings.model_copy(update=dict(SQLDB_URL=url)),
+            connect_args=models.connect_args,
+        )
+        managers.append(manager)
+
+    window = settings.READ_YOUR_WRITES_WINDOW
+    recent_writers = cache.TTLCache(RECENT_WRITERS_SIZE, window)
+    secret = settings.SECRET_KEY.encode()
+
+
+async def close_replicas():
+    for manager in managers:
+        if manager.settings is not None:
+            await manager.close()
+
+
+def sign(caller: tuple, written: str) -> str:
+    message = f"{caller}:{written}".encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def write_cookie(caller: tuple) -> bytes:
+    written = f"{time.time():.3f}"
+    return (
+        f"{COOKIE}={written}:{sign(caller, written)}; Max-Age={math.ceil(window)}; "
+        "Path=/; HttpOnly; SameSite=Lax"
+    ).encode("latin-1")
+
+
+def read_cookie(scope) -> str:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            found = cookie_parser(value.decode("latin-1")).get(COOKIE)
+            if found:
+                return found
+    return ""
+
+
+def wrote_recently(scope) -> bool:
+    caller = deps.caller(scope)
+    if recent_writers.get(caller) is not None:
+        return True
+
+    written, _, signature = read_cookie(scope).partition(":")
+    if not signature or not hmac.compare_digest(signature, sign(caller, written)):
+        return False
+    try:
+        return time.time() - float(written) < window
+    except ValueError:
+        return False
+
+
+def read_manager(scope=None) -> models.DatabaseSessionManager:
+    if not managers:
+        return models.sessionmanager
+    if scope is not None and wrote_recently(scope):
+        return models.sessionmanager
+    return managers[next(turn) % len(managers)]
+
+
+async def get_read_session(request: Request) -> typing.AsyncIterator[AsyncSession]:
+    async with read_manager(request.scope).session() as session:
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not managers or scope["method"] in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        caller = deps.caller(scope)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", write_cookie(caller)))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            # counted from when the write finished, not from when it started
+            recent_writers.set(caller, True)
+
+
+def stats() -> list[dict]:
+    return [
+        dict(
+            url=make_url(manager.settings.SQLDB_URL).render_as_string(hide_password=True),
+            **manager.pool_stats(),
+        )
+        for manager in managers
+        if manager.settings is not None
+    ]
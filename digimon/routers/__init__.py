@@ -5,6 +5,8 @@ from . import wallets
 from . import users
 from . import authentications
 from . import buyitems
+from . import stats
+from . import metrics
 
 def init_router(app):
     app.include_router(users.router)
@@ -13,4 +15,6 @@ def init_router(app):
     app.include_router(merchants.router)
     app.include_router(transactions.router)
     app.include_router(wallets.router)
-    app.include_router(buyitems.router)
\ No newline at end of file
+    app.include_router(buyitems.router)
+    app.include_router(stats.router)
+    app.include_router(metrics.router)
\ No newline at end of file
@@ -6,17 +6,17 @@ from fastapi.security import (
     OAuth2PasswordRequestForm,
 )
 
+from sqlalchemy import case, or_
 from sqlmodel import select
 from typing import Annotated
 import datetime
 from .. import config
+from .. import logins
 from .. import models
 from .. import security
 
 router = APIRouter(tags=["authentication"])
 
-settings = config.get_settings()
-
 
 @router.post(
     "/token",
@@ -26,17 +26,19 @@ async def authentication(
     session: Annotated[models.AsyncSession, Depends(models.get_session)],
 ) -> models.Token:
 
+    # one lookup for both; a username match wins over an email match
     result = await session.exec(
-        select(models.DBUser).where(models.DBUser.username == form_data.username)
-    )
-
-    user = result.one_or_none()
-
-    if not user:
-        result = await session.exec(
-            select(models.DBUser).where(models.DBUser.email == form_data.username)
+        select(models.DBUser)
+        .where(
+            or_(
+                models.DBUser.username == form_data.username,
+                models.DBUser.email == form_data.username,
+            )
         )
-        user = result.one_or_none()
+        .order_by(case((models.DBUser.username == form_data.username, 0), else_=1))
+        .limit(1)
+    )
+    user = result.first()
 
     
     if not user:
@@ -52,12 +54,10 @@ async def authentication(
             detail="Incorrect username or password",
         )
 
-    user.last_login_date = datetime.datetime.now()
-
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    login_date = datetime.datetime.now()
+    logins.record_login(user.id, login_date)
 
+    settings = config.get_settings()
     access_token_expires = datetime.timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
@@ -74,6 +74,6 @@ async def authentication(
         scope="",
         expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
         expires_at=datetime.datetime.now() + access_token_expires,
-        issued_at=user.last_login_date,
+        issued_at=login_date,
         user_id=user.id,
     )
\ No newline at end of file
@@ -1,66 +1,94 @@
 import math
-from fastapi import APIRouter, HTTPException, Depends , status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from typing import Optional, List, Annotated
-from sqlalchemy import func
 from sqlmodel import Field, SQLModel, select
 from .. import models
+from .. import catalog
+from .. import counts
 from .. import deps
+from .. import pagination
+from .. import replicas
+from .. import singleflight
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter(prefix="/items")
 
 
-SIZE_PER_PAGE = 50
+SIZE_PER_PAGE = pagination.SIZE_PER_PAGE
 
 
-@router.get("")
-async def read_items(
-    session: Annotated[AsyncSession, Depends(models.get_session)],
-    page: int = 1,
+async def list_items(
+    request: Request,
+    session: AsyncSession,
+    page: int,
+    cursor: str | None,
+    page_size: int,
+    merchant_id: int | None = None,
 ) -> models.ItemList:
+    page_size = max(1, min(page_size, pagination.MAX_SIZE_PER_PAGE))
+    key = (page, cursor, page_size, merchant_id)
+    entry = catalog.page_cache.get(key)
+    if entry is not None:
+        return catalog.respond(request, entry)
+
+    statement = select(models.DBItem)
+    if merchant_id is not None:
+        statement = statement.where(models.DBItem.merchant_id == merchant_id)
+
+    if cursor is None and page > 1:
+        # legacy offset paging, kept for old clients; next_cursor lets them
+        # switch to keyset paging from here on
+        statement = statement.where(
+            models.DBItem.id
+            > statement.with_only_columns(models.DBItem.id)
+            .order_by(models.DBItem.id)
+            .offset((page - 1) * page_size - 1)
+            .limit(1)
+            .scalar_subquery()
+        )
 
-    result = await session.exec(
-        select(models.DBItem).offset((page - 1) * SIZE_PER_PAGE).limit(SIZE_PER_PAGE)
+    items, next_cursor = await pagination.paginate(
+        session, statement, models.DBItem.id, cursor, page_size
     )
-    items = result.all()
 
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBItem.id)))).first()
-            / SIZE_PER_PAGE
+    item_count = await counts.item_count(session, merchant_id)
+    page_count = int(math.ceil(item_count / page_size))
+
+    item_list = models.ItemList.from_orm(
+        dict(
+            items=items,
+            page_count=page_count,
+            page=page,
+            size_per_page=page_size,
+            next_cursor=next_cursor,
         )
     )
+    entry = catalog.make_entry(item_list)
+    if catalog.can_fill(catalog.PAGES):
+        catalog.page_cache.set(key, entry)
+    return catalog.respond(request, entry)
 
-    print("page_count", page_count)
-    print("items", items)
-    return models.ItemList.from_orm(
-        dict(items=items, page_count=page_count, page=page, size_per_page=SIZE_PER_PAGE)
-    )
+
+@router.get("")
+async def read_items(
+    request: Request,
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
+    page: int = 1,
+    cursor: str | None = None,
+    merchant_id: int | None = None,
+) -> models.ItemList:
+    return await list_items(request, session, page, cursor, SIZE_PER_PAGE, merchant_id)
 
 @router.get("/{page_size}/")
 async def read_items(
     page_size : int,
-    session: Annotated[AsyncSession, Depends(models.get_session)],
+    request: Request,
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
     page: int = 1,
+    cursor: str | None = None,
+    merchant_id: int | None = None,
 ) -> models.ItemList:
-
-    result = await session.exec(
-        select(models.DBItem).offset((page - 1) * page_size).limit(page_size)
-    )
-    items = result.all()
-
-    page_count = int(
-        math.ceil(
-            (await session.exec(select(func.count(models.DBItem.id)))).first()
-            / page_size
-        )
-    )
-
-    print("page_count", page_count)
-    print("items", items)
-    return models.ItemList.from_orm(
-        dict(items=items, page_count=page_count, page=page, size_per_page=SIZE_PER_PAGE,page_size=page_size)
-    )
+    return await list_items(request, session, page, cursor, page_size, merchant_id)
 
 
 
@@ -87,21 +115,35 @@ async def create_item(
     dbitem = models.DBItem.from_orm(item)
     dbitem.role = current_user.role
     
-    dbitem.user = current_user
+    dbitem.user_id = current_user.id
     dbitem.merchant_id = dbmerchant.id
     session.add(dbitem)
     await session.commit()
     await session.refresh(dbitem)
+    counts.item_created(dbitem.merchant_id)
+    catalog.invalidate_pages()
 
     return models.Item.from_orm(dbitem)
 
 
 @router.get("/{item_id}")
-async def read_item(item_id: int, session: Annotated[AsyncSession, Depends(models.get_session)]) -> models.Item:
+async def read_item(item_id: int, request: Request, session: Annotated[AsyncSession, Depends(replicas.get_read_session)]) -> models.Item:
+    entry = catalog.item_cache.get(item_id)
+    if entry is None:
+        entry = await singleflight.items.do(
+            item_id, lambda: load_item(session, item_id), source=session.bind
+        )
+    return catalog.respond(request, entry)
+
+
+async def load_item(session: AsyncSession, item_id: int) -> tuple[bytes, str]:
     db_item = await session.get(models.DBItem, item_id)
-    if db_item:
-        return models.Item.from_orm(db_item)
-    raise HTTPException(status_code=404, detail="Item not found")
+    if not db_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    entry = catalog.make_entry(models.Item.from_orm(db_item))
+    if catalog.can_fill(item_id):
+        catalog.item_cache.set(item_id, entry)
+    return entry
 
 @router.put("/{item_id}")
 async def update_item(item_id: int, item: Annotated[models.UpdatedItem, Depends()], session: Annotated[AsyncSession, Depends(models.get_session)]) -> models.Item:
@@ -115,13 +157,18 @@ async def update_item(item_id: int, item: Annotated[models.UpdatedItem, Depends(
     session.add(db_item)
     await session.commit()
     await session.refresh(db_item)
-    return models.Item.from_orm(db_item)
+    updated_item = models.Item.from_orm(db_item)
+    catalog.store_item(item_id, updated_item)
+    return updated_item
 
 @router.delete("/{item_id}")
 async def delete_item(item_id: int, session: Annotated[AsyncSession, Depends(models.get_session)]) -> dict:
     db_item = await session.get(models.DBItem, item_id)
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
+    merchant_id = db_item.merchant_id
     await session.delete(db_item)
     await session.commit()
+    counts.item_deleted(merchant_id)
+    catalog.invalidate_item(item_id)
     return {"message": "Item deleted successfully"}
\ No newline at end of file
@@ -1,15 +1,16 @@
+import datetime
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Optional, Annotated
 from sqlmodel import Field, SQLModel, create_engine, Session, select
 from sqlmodel.ext.asyncio.session import AsyncSession
-from ..models.users import User
+from ..models.users import User, UserRole
 from ..models import (
     Merchant,
     CreatedMerchant,
     UpdatedMerchant,
     MerchantList,
     DBMerchant,
-    engine,
+    MerchantSales,
     get_session,
 )
 
@@ -17,6 +18,10 @@ router = APIRouter(prefix="/merchants")
 
 
 from .. import deps
+from .. import pagination
+from .. import replicas
+from .. import sales
+from .. import singleflight
 
 # @router.post("")
 # async def create_merchant(
@@ -38,26 +43,71 @@ from .. import deps
 
 @router.get("")
 async def read_merchants(
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
+    cursor: str | None = None,
+    page_size: int = pagination.SIZE_PER_PAGE,
 ) -> MerchantList:
-    result = await session.exec(select(DBMerchant))
-    merchants = result.all()
+    page_size = max(1, min(page_size, pagination.MAX_SIZE_PER_PAGE))
+    merchants, next_cursor = await pagination.paginate(
+        session, select(DBMerchant), DBMerchant.id, cursor, page_size
+    )
 
     return MerchantList.from_orm(
-        dict(merchants=merchants, page_size=0, page=0, size_per_page=0)
+        dict(
+            merchants=merchants,
+            page_size=page_size,
+            page=0,
+            size_per_page=page_size,
+            next_cursor=next_cursor,
+        )
     )
 
 
 @router.get("/{merchant_id}")
 async def read_merchant(
-    merchant_id: int, session: Annotated[AsyncSession, Depends(get_session)]
+    merchant_id: int,
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
 ) -> Merchant:
+    return await singleflight.merchants.do(
+        merchant_id, lambda: load_merchant(session, merchant_id), source=session.bind
+    )
+
+
+async def load_merchant(session: AsyncSession, merchant_id: int) -> Merchant:
     db_merchant = await session.get(DBMerchant, merchant_id)
     if db_merchant:
         return Merchant.from_orm(db_merchant)
     raise HTTPException(status_code=404, detail="Merchant not found")
 
 
+@router.get("/{merchant_id}/sales")
+async def read_merchant_sales(
+    merchant_id: int,
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
+    start: datetime.date | None = None,
+    end: datetime.date | None = None,
+    current_user: User = Depends(deps.get_current_user),
+) -> MerchantSales:
+    dbmerchant = await session.get(DBMerchant, merchant_id)
+    if dbmerchant is None:
+        raise HTTPException(status_code=404, detail="Merchant not found")
+    if dbmerchant.user_id != current_user.id and current_user.role != UserRole.admin:
+        raise HTTPException(
+            status_code=403, detail="Only the merchant can read its sales."
+        )
+
+    end = end or datetime.date.today()
+    start = start or end - datetime.timedelta(days=sales.DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start is after end")
+    if (end - start).days >= sales.MAX_DAYS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {sales.MAX_DAYS} days per report"
+        )
+
+    return await sales.merchant_sales(session, merchant_id, start, end)
+
+
 @router.put("/{merchant_id}")
 async def update_merchant(
     merchant_id: int,
@@ -70,5 +120,6 @@ async def update_merchant(
     session.add(db_merchant)
     await session.commit()
     await session.refresh(db_merchant)
+    singleflight.merchants.forget(merchant_id)
 
     return Merchant.from_orm(db_merchant)
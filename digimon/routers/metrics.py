@@ -0,0 +1,76 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from .. import catalog
+from .. import deps
+from .. import idempotency
+from .. import instrumentation
+from .. import jobs
+from .. import models
+from .. import ratelimit
+from .. import singleflight
+
+
+router = APIRouter(tags=["stats"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics() -> PlainTextResponse:
+    pool = models.sessionmanager.pool_stats()
+    extra = [
+        ("db_pool_size", "gauge", "Configured pool size.", {}, pool["size"]),
+        ("db_pool_checked_out", "gauge", "Connections in use.", {}, pool["checked_out"]),
+        ("db_pool_overflow", "gauge", "Connections above pool size.", {}, pool["overflow"]),
+        ("db_pool_waiters", "gauge", "Requests waiting for a connection.", {}, pool["waiters"]),
+        ("db_pool_timeouts_total", "counter", "Pool checkout timeouts.", {}, pool["timeouts"]),
+    ]
+    for name, cache in [
+        ("items", catalog.item_cache),
+        ("item_pages", catalog.page_cache),
+        ("tokens", deps.token_cache),
+        ("principals", deps.principal_cache),
+    ]:
+        stats = cache.stats()
+        extra.append(("cache_size", "gauge", "Entries per cache.", dict(cache=name), stats["size"]))
+        extra.append(("cache_hits_total", "counter", "Hits per cache.", dict(cache=name), stats["hits"]))
+        extra.append(("cache_misses_total", "counter", "Misses per cache.", dict(cache=name), stats["misses"]))
+
+    stats = idempotency.stats()
+    extra += [
+        ("idempotency_in_flight", "gauge", "Keyed requests running.", {}, stats["in_flight"]),
+        ("idempotency_replays_total", "counter", "Keyed requests answered from the store.", {}, stats["replays"]),
+        ("idempotency_coalesced_total", "counter", "Duplicates that waited for the first request.", {}, stats["coalesced"]),
+        ("idempotency_conflicts_total", "counter", "Keys reused for a different request.", {}, stats["conflicts"]),
+    ]
+
+    for name, stats in ratelimit.stats().items():
+        labels = dict(route_class=name)
+        extra += [
+            ("rate_limit_in_flight", "gauge", "Requests running per route class.", labels, stats["in_flight"]),
+            ("rate_limit_callers", "gauge", "Callers with a token bucket.", labels, stats["callers"]),
+            ("rate_limit_allowed_total", "counter", "Requests admitted.", labels, stats["allowed"]),
+            ("rate_limit_rate_limited_total", "counter", "Requests refused with 429.", labels, stats["rate_limited"]),
+            ("rate_limit_concurrency_limited_total", "counter", "Requests refused with 503.", labels, stats["concurrency_limited"]),
+        ]
+
+    for name, stats in singleflight.stats().items():
+        labels = dict(group=name)
+        extra += [
+            ("singleflight_in_flight", "gauge", "Lookups running that others can join.", labels, stats["in_flight"]),
+            ("singleflight_calls_total", "counter", "Lookups that ran a query.", labels, stats["calls"]),
+            ("singleflight_coalesced_total", "counter", "Requests served by another request's lookup.", labels, stats["coalesced"]),
+        ]
+
+    stats = jobs.stats()
+    extra += [
+        ("jobs_queued", "gauge", "Jobs waiting for a worker.", {}, stats["queued"]),
+        ("jobs_submitted_total", "counter", "Jobs written to the outbox.", {}, stats["submitted"]),
+        ("jobs_completed_total", "counter", "Jobs applied.", {}, stats["completed"]),
+        ("jobs_retried_total", "counter", "Failed job attempts that will be retried.", {}, stats["retried"]),
+        ("jobs_failed_total", "counter", "Jobs that ran out of attempts.", {}, stats["failed"]),
+        ("jobs_deferred_total", "counter", "Jobs left to the outbox sweep by a full queue.", {}, stats["deferred"]),
+    ]
+
+    return PlainTextResponse(
+        instrumentation.render(extra), media_type="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,52 @@
+from fastapi import APIRouter
+from .. import catalog
+from .. import deps
+from .. import models
+from .. import ratelimit
+from .. import replicas
+from .. import security
+from .. import singleflight
+
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/pool")
+async def read_pool_stats() -> dict:
+    return models.sessionmanager.pool_stats()
+
+
+@router.get("/replicas")
+async def read_replica_stats() -> list[dict]:
+    return replicas.stats()
+
+
+@router.get("/rate_limits")
+async def read_rate_limit_stats() -> dict:
+    return ratelimit.stats()
+
+
+@router.get("/singleflight")
+async def read_singleflight_stats() -> dict:
+    return singleflight.stats()
+
+
+@router.get("/password_hasher")
+async def read_password_hasher_stats() -> dict:
+    return security.get_password_hasher().stats()
+
+
+@router.get("/principal_cache")
+async def read_principal_cache_stats() -> dict:
+    return dict(
+        tokens=deps.token_cache.stats(),
+        principals=deps.principal_cache.stats(),
+    )
+
+
+@router.get("/item_cache")
+async def read_item_cache_stats() -> dict:
+    return dict(
+        items=catalog.item_cache.stats(),
+        pages=catalog.page_cache.stats(),
+    )
@@ -1,20 +1,20 @@
-from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Annotated, Literal
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from .. import exports
+from .. import models
+from .. import pagination
+from .. import replicas
 from ..models.transactions import BaseTransaction, DBTransection, TransactionList
-from ..models import engine
 
 router = APIRouter(prefix="/transections")
 
-async def get_session():
-    async with AsyncSession(engine) as session:
-        yield session
-
 @router.post("/transection")
 async def create_transection(
     transection: Annotated[BaseTransaction, Depends()],
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)]
 ):
     db_transection = DBTransection(**transection.dict())
     session.add(db_transection)
@@ -24,16 +24,53 @@ async def create_transection(
 
 @router.get("/transections")
 async def read_transections(
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
+    cursor: str | None = None,
+    page_size: int = pagination.SIZE_PER_PAGE,
 ) -> TransactionList:
-    result = await session.exec(select(DBTransection))
-    transections = result.all()
-    return TransactionList.from_orm(dict(transactions=transections, page_size=0, page=0, size_per_page=0))
+    page_size = max(1, min(page_size, pagination.MAX_SIZE_PER_PAGE))
+    transections, next_cursor = await pagination.paginate(
+        session, select(DBTransection), DBTransection.id, cursor, page_size
+    )
+    return TransactionList.from_orm(
+        dict(
+            transactions=transections,
+            page_size=page_size,
+            page=0,
+            size_per_page=page_size,
+            next_cursor=next_cursor,
+        )
+    )
+
+@router.get("/export")
+async def export_transections(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    merchant_id: int | None = None,
+    customer_id: int | None = None,
+    min_id: int | None = None,
+    max_id: int | None = None,
+) -> StreamingResponse:
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        exports.stream(
+            format,
+            manager=replicas.read_manager(request.scope),
+            merchant_id=merchant_id,
+            customer_id=customer_id,
+            min_id=min_id,
+            max_id=max_id,
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="transections.{format}"'
+        },
+    )
 
 @router.get("/transection/{transection_id}")
 async def read_transection(
     transection_id: int,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)]
 ):
     transection = await session.get(DBTransection, transection_id)
     if transection:
@@ -44,7 +81,7 @@ async def read_transection(
 async def update_transection(
     transection_id: int,
     transection: Annotated[BaseTransaction, Depends()],
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> DBTransection:
     print("update_transection", transection)
     data = transection.dict()
@@ -61,7 +98,7 @@ async def update_transection(
 @router.delete("/transection/{transection_id}")
 async def delete_transection(
     transection_id: int,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> dict:
     db_transection = await session.get(DBTransection, transection_id)
     await session.delete(db_transection)
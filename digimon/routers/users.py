@@ -4,6 +4,8 @@ from sqlmodel import select
 from typing import Annotated
 from .. import deps
 from .. import models
+from .. import onboarding
+from .. import replicas
 
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -17,7 +19,7 @@ def get_me(current_user: models.User = Depends(deps.get_current_user)) -> models
 @router.get("/{user_id}")
 async def get(
     user_id: str,
-    session: Annotated[AsyncSession, Depends(models.get_session)],
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
     current_user: models.User = Depends(deps.get_current_user),
 ) -> models.User:
 
@@ -146,6 +148,21 @@ async def register_customer(
 
 
 
+@router.post("/onboard")
+async def onboard_users(
+    batch: models.OnboardingBatch,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> models.OnboardingResult:
+    if not onboarding.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Bulk onboarding is disabled",
+        )
+
+    return await onboarding.onboard(session, batch.users)
+
+
 @router.put("/{user_id}/change_password")
 async def change_password(
     user_id: int,
@@ -167,15 +184,16 @@ async def change_password(
             detail="Not authorized to change this user's password",
         )
 
-    if not user.verify_password(password_update.current_password):
+    if not await user.verify_password(password_update.current_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
         )
     
-    user.set_password(password_update.new_password)
+    await user.set_password(password_update.new_password)
     session.add(user)
     await session.commit()
+    deps.invalidate_user(user.id)
 
     return {"message": "Password changed successfully"}
 
@@ -192,13 +210,13 @@ async def update(
 
     user = await session.get(models.DBUser, user_id)
 
-    if user != current_user:
+    if not user or user.id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Not found this user",
         )
 
-    if not user.verify_password(user_update.current_password):
+    if not await user.verify_password(user_update.current_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
@@ -210,6 +228,7 @@ async def update(
     session.add(user)
     await session.commit()
     await session.refresh(user)
+    deps.invalidate_user(user.id)
 
     return user
 
@@ -223,6 +242,7 @@ async def delete_user(
     if db_user:
         await session.delete(db_user)
         await session.commit()
+        deps.invalidate_user(user_id)
 
 
         return dict(message="delete success")
@@ -1,20 +1,21 @@
 from typing import Annotated
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Response
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from ..models.wallets import BaseWallet, DBWallet, UpdatedWallet, Wallet, WalletList
-from ..models import engine
+from ..models.wallets import BaseWallet, DBWallet, UpdatedWallet, Wallet, WalletAmount, WalletList
 from .. import models
 from .. import deps
+from .. import idempotency
+from .. import ledger
+from .. import pagination
+from .. import purchases
+from .. import replicas
+from .. import stripes
 
 
 router = APIRouter(prefix="/wallets")
 
 
-async def get_session():
-    async with AsyncSession(engine) as session:
-        yield session
-
 # @router.post("")
 # async def create_wallet(
 #     wallet: models.CreatedWallet,
@@ -29,34 +30,137 @@ async def get_session():
 #     return models.Item.from_orm(dbwallet)
 @router.get("")
 async def read_wallets(
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)],
+    cursor: str | None = None,
+    page_size: int = pagination.SIZE_PER_PAGE,
 ) -> WalletList:
-    result = await session.exec(select(DBWallet))
-    wallets = result.all()
-    return WalletList.from_orm(dict(wallets=wallets, page_size=0, page=0, size_per_page=0))
+    page_size = max(1, min(page_size, pagination.MAX_SIZE_PER_PAGE))
+    dbwallets, next_cursor = await pagination.paginate(
+        session, select(DBWallet), DBWallet.id, cursor, page_size
+    )
+    wallets = await ledger.with_balances(session, dbwallets)
+    return WalletList.from_orm(
+        dict(
+            wallets=wallets,
+            page_size=page_size,
+            page=0,
+            size_per_page=page_size,
+            next_cursor=next_cursor,
+        )
+    )
+
+@router.put("/add")
+async def add_balance(
+    balance: WalletAmount,
+    
+    
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    response: Response,
+    current_user: models.User = Depends(deps.get_current_user),
+    idempotency_key: Annotated[str | None, Header()] = None,
+) -> Wallet :
+    return await idempotency.run(
+        idempotency_key,
+        (current_user.id, "wallets/add"),
+        balance.model_dump_json(),
+        response,
+        session,
+        lambda: credit_balance(session, current_user, balance),
+    )
+
+
+async def credit_balance(
+    session: AsyncSession, current_user: models.User, balance: WalletAmount
+) -> Wallet:
+    statement = select(DBWallet).where(DBWallet.user_id == current_user.id)
+    result = await session.exec(statement)
+    dbwallet = result.one_or_none()
+
+    if not dbwallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    if ledger.enabled:
+        await ledger.lock_entries(session)
+        await session.execute(ledger.append_entry(dbwallet.id, balance.balance))
+    else:
+        await session.execute(purchases.credit_wallet(dbwallet.id, balance.balance))
+        await session.refresh(dbwallet)
+    wallet = (await ledger.with_balances(session, [dbwallet]))[0]
+
+    idempotency.save(session, wallet)
+    await session.commit()
+    return wallet
+
+@router.put("/withdraw")
+async def withdraw_balance(
+    balance: WalletAmount,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: models.User = Depends(deps.get_current_user)
+) -> Wallet :
+    statement = select(DBWallet).where(DBWallet.user_id == current_user.id)
+    result = await session.exec(statement)
+    dbwallet = result.one_or_none()
+
+    if not dbwallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    if ledger.enabled:
+        await ledger.lock_entries(session)
+        await session.execute(ledger.lock_wallet(dbwallet.id))
+        result = await session.execute(ledger.append_debit(dbwallet.id, balance.balance))
+        if result.rowcount != 1:
+            await session.rollback()
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+        await session.commit()
+        return (await ledger.with_balances(session, [dbwallet]))[0]
+
+    dbwallet = await stripes.withdraw(session, dbwallet.id, balance.balance)
+    return Wallet.from_orm(dbwallet)
+
+@router.put("/stripes")
+async def update_wallet_stripes(
+    wallet_stripes: models.UpdatedWalletStripes,
+    session: Annotated[AsyncSession, Depends(models.get_session)],
+    current_user: models.User = Depends(deps.get_current_user)
+) -> Wallet :
+    if current_user.role != "merchant":
+        raise HTTPException(status_code=403, detail="Only merchants can stripe their wallet.")
+    if ledger.enabled:
+        # striping folds balances into DBWallet.balance, the opening balance here
+        raise HTTPException(status_code=400, detail="Ledger wallets cannot be striped.")
+
+    statement = select(DBWallet).where(DBWallet.user_id == current_user.id)
+    result = await session.exec(statement)
+    dbwallet = result.one_or_none()
+
+    if not dbwallet:
+        raise HTTPException(status_code=404, detail="Wallet not found")
+
+    dbwallet = await stripes.set_stripes(session, dbwallet.id, wallet_stripes.stripes)
+    return (await ledger.with_balances(session, [dbwallet]))[0]
 
 @router.get("/{customer_id}")
 
 async def get_wallet_by_customer_id(
     customer_id: int,
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)]
 ) -> models.Wallet:
     result = await session.exec(select(DBWallet).where(DBWallet.user_id == customer_id))
     wallet = result.first()
     if wallet:
-        return Wallet.from_orm(wallet)
+        return (await ledger.with_balances(session, [wallet]))[0]
     raise HTTPException(status_code=404, detail="Wallet not found")
 
 @router.get("/{merchant_id}")
 
 async def get_wallet_by_merchant_id(
     merchant_id: int,
-    session: Annotated[AsyncSession, Depends(models.get_session)]
+    session: Annotated[AsyncSession, Depends(replicas.get_read_session)]
 ) -> models.Wallet:
     result = await session.exec(select(DBWallet).where(DBWallet.user_id == merchant_id))
     wallet = result.first()
     if wallet:
-        return Wallet.from_orm(wallet)
+        return (await ledger.with_balances(session, [wallet]))[0]
     raise HTTPException(status_code=404, detail="Wallet not found")
 
 
@@ -64,7 +168,7 @@ async def get_wallet_by_merchant_id(
 async def update_wallet(
     wallet_id: int,
     wallet: Annotated[UpdatedWallet, Depends()],
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> Wallet :
     print("update_wallet", wallet)
     data = wallet.dict()
@@ -77,34 +181,10 @@ async def update_wallet(
 @router.delete("/{wallet_id}")
 async def delete_wallet(
     wallet_id: int,
-    session: Annotated[AsyncSession, Depends(get_session)]
+    session: Annotated[AsyncSession, Depends(models.get_session)]
 ) -> dict:
     db_wallet = await session.get(DBWallet, wallet_id)
     await session.delete(db_wallet)
     await session.commit()
     return dict(message="delete success")
 
-
-@router.put("add")
-async def add_balance(
-    balance: UpdatedWallet,
-    
-    
-    session: Annotated[AsyncSession, Depends(models.get_session)],
-    current_user: models.User = Depends(deps.get_current_user)
-) -> Wallet :
-    statement = select(DBWallet).where(DBWallet.user_id == current_user.id)
-    result = await session.exec(statement)
-    dbwallet = result.one_or_none()
-    
-    dbwallet.balance += balance.balance
-
-    
-    
-    if dbwallet:
-        dbwallet.sqlmodel_update(dbwallet)
-        session.add(dbwallet)
-        await session.commit()
-        await session.refresh(dbwallet)
-        return Wallet.from_orm(dbwallet)
-    raise HTTPException(status_code=404, detail="Wallet not found")
\ No newline at end of file
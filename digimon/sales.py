@@ -0,0 +1,163 @@
+import datetime
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import jobs
+from . import models
+
+
+# Sales reports read sales_rollups, one row per merchant, day and item, so a
+# report costs the same whatever the size of dbtransection. Each purchase
+# submits its rollup rows as a job in the transaction that records the sale,
+# and a job worker adds whole batches of purchases to sales_rollups with one
+# upsert, in key order, the same order for every batch, so two batches
+# touching the same rows wait on each other instead of deadlocking. Reports
+# trail purchases by the time the job takes to run.
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+JOB = "sales_rollup"
+
+
+def merge_rows(rows) -> list[dict]:
+    totals = {}
+    for row in rows:
+        key = (row["merchant_id"], row["day"], row["item_id"])
+        quantity, revenue = totals.get(key, (0, 0.0))
+        totals[key] = (quantity + row["quantity"], revenue + row["revenue"])
+
+    return [
+        dict(
+            merchant_id=merchant_id,
+            day=day,
+            item_id=item_id,
+            quantity=quantity,
+            revenue=revenue,
+        )
+        for (merchant_id, day, item_id), (quantity, revenue) in sorted(totals.items())
+    ]
+
+
+def rollup_rows(transactions) -> list[dict]:
+    return merge_rows(
+        dict(
+            merchant_id=transaction.merchant_id,
+            day=transaction.created_at.date(),
+            item_id=transaction.item_id,
+            quantity=1,
+            revenue=transaction.price,
+        )
+        for transaction in transactions
+    )
+
+
+def upsert_statement(dialect_name: str, rows: list[dict]):
+    table = models.DBSalesRollup.__table__
+    if dialect_name == "postgresql":
+        statement = postgresql.insert(table)
+    else:
+        statement = sqlite.insert(table)
+
+    statement = statement.values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.merchant_id, table.c.day, table.c.item_id],
+        set_=dict(
+            quantity=table.c.quantity + statement.excluded.quantity,
+            revenue=table.c.revenue + statement.excluded.revenue,
+        ),
+    )
+
+
+def record_sales(session: AsyncSession, transactions) -> models.DBJob | None:
+    rows = rollup_rows(transactions)
+    if not rows:
+        return None
+    for row in rows:
+        row["day"] = row["day"].isoformat()
+    return jobs.submit(session, JOB, dict(rows=rows))
+
+
+@jobs.handler(JOB)
+async def apply_sales(session: AsyncSession, payloads: list[dict]):
+    rows = merge_rows(
+        dict(row, day=datetime.date.fromisoformat(row["day"]))
+        for payload in payloads
+        for row in payload["rows"]
+    )
+    await session.execute(upsert_statement(session.bind.dialect.name, rows))
+
+
+async def merchant_sales(
+    session: AsyncSession,
+    merchant_id: int,
+    start: datetime.date,
+    end: datetime.date,
+) -> models.MerchantSales:
+    rollup = models.DBSalesRollup
+    conditions = (
+        rollup.merchant_id == merchant_id,
+        rollup.day >= start,
+        rollup.day <= end,
+    )
+    quantity = func.sum(rollup.quantity)
+    revenue = func.sum(rollup.revenue)
+
+    result = await session.exec(
+        select(rollup.day, quantity, revenue)
+        .where(*conditions)
+        .group_by(rollup.day)
+        .order_by(rollup.day)
+    )
+    days = [
+        models.DailySales(day=day, quantity=day_quantity, revenue=day_revenue)
+        for day, day_quantity, day_revenue in result.all()
+    ]
+
+    result = await session.exec(
+        select(rollup.item_id, quantity, revenue)
+        .where(*conditions)
+        .group_by(rollup.item_id)
+        .order_by(revenue.desc(), rollup.item_id)
+    )
+    items = [
+        models.ItemSales(item_id=item_id, quantity=item_quantity, revenue=item_revenue)
+        for item_id, item_quantity, item_revenue in result.all()
+    ]
+
+    return models.MerchantSales(
+        merchant_id=merchant_id,
+        start=start,
+        end=end,
+        quantity=sum(day.quantity for day in days),
+        revenue=sum(day.revenue for day in days),
+        days=days,
+        items=items,
+    )
+
+
+async def rebuild(connection: AsyncConnection):
+    # recomputes every rollup from dbtransection; transactions recorded
+    # before created_at existed have no day and are left out
+    transaction = models.DBTransection
+    day = func.date(transaction.created_at)
+    table = models.DBSalesRollup.__table__
+
+    await connection.execute(delete(table))
+    await connection.execute(
+        insert(table).from_select(
+            ["merchant_id", "day", "item_id", "quantity", "revenue"],
+            select(
+                transaction.merchant_id,
+                day,
+                transaction.item_id,
+                func.count(),
+                func.sum(transaction.price),
+            )
+            .where(transaction.created_at.is_not(None))
+            .group_by(transaction.merchant_id, day, transaction.item_id),
+        )
+    )
@@ -1,7 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Any, Union
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
 import jwt
+from fastapi import HTTPException, status
 
 from . import config
 
@@ -9,8 +14,6 @@ import datetime
 
 ALGORITHM = "HS256"
 
-settings = config.get_settings()
-
 
 def create_access_token(data: dict, expires_delta: datetime.timedelta | None = None):
     to_encode = data.copy()
@@ -18,11 +21,13 @@ def create_access_token(data: dict, expires_delta: datetime.timedelta | None = N
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + expires_delta
     else:
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+            minutes=config.get_settings().ACCESS_TOKEN_EXPIRE_MINUTES
         )
     to_encode.update({"exp": expire})
 
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(
+        to_encode, config.get_settings().SECRET_KEY, algorithm=ALGORITHM
+    )
     return encoded_jwt
 
 
@@ -32,8 +37,106 @@ def create_refresh_token(data: dict, expires_delta: timedelta | None = None) ->
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + expires_delta
     else:
         expire = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(
-            minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
+            minutes=config.get_settings().REFRESH_TOKEN_EXPIRE_MINUTES
         )
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    encoded_jwt = jwt.encode(
+        to_encode, config.get_settings().SECRET_KEY, algorithm=ALGORITHM
+    )
+    return encoded_jwt
+
+
+# bcrypt releases the GIL, so hashing on a small thread pool keeps the event
+# loop free while using as many cores as there are workers. Callers beyond
+# the workers plus the queue limit are turned away instead of piling up.
+class PasswordHasher:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hasher"
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, func, *args):
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return dict(
+            workers=self.workers,
+            queue_limit=self.queue_limit,
+            pending=self.pending,
+            completed=self.completed,
+            rejected=self.rejected,
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = None
+
+
+def init_password_hasher(settings):
+    global password_hasher
+
+    if password_hasher is not None:
+        password_hasher.close()
+    password_hasher = PasswordHasher(
+        settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT
+    )
+
+
+def get_password_hasher() -> PasswordHasher:
+    if password_hasher is None:
+        init_password_hasher(config.get_settings())
+    return password_hasher
+
+
+def close_password_hasher():
+    global password_hasher
+
+    if password_hasher is not None:
+        password_hasher.close()
+        password_hasher = None
+
+
+def _hash_password(plain_password: str) -> str:
+    return bcrypt.hashpw(plain_password.encode("utf-8"), salt=bcrypt.gensalt()).decode(
+        "utf-8"
+    )
+
+
+def _hash_passwords(plain_passwords: list[str]) -> list[str]:
+    return [_hash_password(plain_password) for plain_password in plain_passwords]
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+
+
+async def hash_password(plain_password: str) -> str:
+    return await get_password_hasher().run(_hash_password, plain_password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await get_password_hasher().run(
+        _verify_password, plain_password, hashed_password
+    )
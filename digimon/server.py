@@ -0,0 +1,206 @@
+import argparse
+import importlib.util
+import logging
+import os
+import random
+import signal
+import socket
+import time
+
+import uvicorn
+
+from . import config
+from . import main
+from . import models
+
+
+logger = logging.getLogger(__name__)
+
+# Production launcher. The parent process imports everything, builds the app
+# once and binds the listening socket, then forks the workers, so each worker
+# starts with the app already in memory and shares the socket with the others.
+# Every worker runs uvicorn on its own event loop (uvloop when installed) and
+# exits after max_requests plus some jitter; the parent replaces workers that
+# exit, and SIGHUP replaces all of them one at a time.
+
+BOOT_BACKOFF = 1.0  # seconds before replacing a worker that died while booting
+
+
+def worker_count(settings) -> int:
+    return settings.WEB_WORKERS or os.cpu_count() or 1
+
+
+def size_pool(settings, workers: int):
+    # DB_MAX_CONNECTIONS is what the database allows for the whole deployment,
+    # not per process, so every worker gets an equal slice of it
+    if settings.DB_MAX_CONNECTIONS:
+        settings.DB_POOL_SIZE = max(1, settings.DB_MAX_CONNECTIONS // workers)
+        settings.DB_MAX_OVERFLOW = 0
+
+
+def bind(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def event_loop_name() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def serve(app, settings, sock: socket.socket, max_requests: int | None):
+    server = uvicorn.Server(
+        uvicorn.Config(
+            app,
+            loop="auto",
+            http="auto",
+            lifespan="on",
+            limit_max_requests=max_requests,
+            timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT,
+            access_log=settings.WEB_ACCESS_LOG,
+        )
+    )
+    server.run(sockets=[sock])
+
+
+class Arbiter:
+    def __init__(self, app, settings, sock: socket.socket, workers: int):
+        self.app = app
+        self.settings = settings
+        self.sock = sock
+        self.workers = workers
+        self.children: dict[int, float] = {}
+        self.stopping = False
+        self.reloading: list[int] = []
+
+    def max_requests(self) -> int | None:
+        if not self.settings.WEB_MAX_REQUESTS:
+            return None
+        # spread the restarts so the workers do not recycle all at once
+        return self.settings.WEB_MAX_REQUESTS + random.randint(
+            0, self.settings.WEB_MAX_REQUESTS_JITTER
+        )
+
+    def spawn(self):
+        max_requests = self.max_requests()
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+
+        status = 0
+        try:
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+                signal.signal(signum, signal.SIG_DFL)
+            # connections must never be shared across a fork
+            if models.sessionmanager.started:
+                models.engine.sync_engine.dispose(close=False)
+            serve(self.app, self.settings, self.sock, max_requests)
+        except BaseException:
+            logger.exception("worker %d failed", os.getpid())
+            status = 1
+        finally:
+            os._exit(status)
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reloading = list(self.children)
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            started = self.children.pop(pid, None)
+            code = os.waitstatus_to_exitcode(status)
+            if code and not self.stopping:
+                logger.warning("worker %d exited with %d", pid, code)
+                if started is not None and time.monotonic() - started < BOOT_BACKOFF:
+                    time.sleep(BOOT_BACKOFF)
+
+    def stop(self):
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.settings.WEB_GRACEFUL_TIMEOUT + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+        self.reap()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        logger.info(
+            "starting %d workers on %s with %s, DB pool %d+%d per worker",
+            self.workers,
+            self.sock.getsockname(),
+            event_loop_name(),
+            self.settings.DB_POOL_SIZE,
+            self.settings.DB_MAX_OVERFLOW,
+        )
+        while not self.stopping:
+            self.reap()
+            while len(self.children) < self.workers and not self.stopping:
+                self.spawn()
+
+            # rolling restart: start a replacement, then stop one old
+            # worker, and wait for it to go before taking the next one
+            if self.reloading and len(self.children) == self.workers:
+                pid = self.reloading.pop()
+                if pid in self.children:
+                    self.spawn()
+                    os.kill(pid, signal.SIGTERM)
+
+            time.sleep(0.1)
+
+        self.stop()
+
+
+def run(settings, host: str, port: int):
+    workers = worker_count(settings)
+    size_pool(settings, workers)
+
+    app = main.create_app(settings)
+    sock = bind(host, port)
+
+    if not hasattr(os, "fork") or workers == 1:
+        logger.info("single worker on %s with %s", sock.getsockname(), event_loop_name())
+        serve(app, settings, sock, None)
+        return
+
+    Arbiter(app, settings, sock, workers).run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve the API with several worker processes. Send SIGHUP "
+        "to replace the workers one at a time."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="defaults to WEB_WORKERS, 0 for one per CPU")
+    parser.add_argument("--max-requests", type=int, help="defaults to WEB_MAX_REQUESTS, 0 to never recycle")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    settings = config.get_settings()
+    if args.workers is not None:
+        settings.WEB_WORKERS = args.workers
+    if args.max_requests is not None:
+        settings.WEB_MAX_REQUESTS = args.max_requests
+    run(settings, args.host, args.port)
@@ -0,0 +1,69 @@
+import asyncio
+import typing
+
+
+# Identical lookups that arrive while one is already running wait for it and
+# share its result, or its HTTPException, instead of each running the same
+# query. Lookups are told apart by key and by the database they read from, so
+# a caller that has to read the primary never gets an answer from a replica.
+# Writers call forget for what they changed, and lookups that start after that
+# run a query of their own rather than join one that began before the write.
+# If the lookup being shared is cancelled with its request, the callers
+# waiting on it run the lookup themselves.
+
+
+class Group:
+    def __init__(self, name: str):
+        self.name = name
+        self.flights: dict[tuple, asyncio.Future] = {}
+
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, call: typing.Callable[[], typing.Awaitable], source=None):
+        flight_key = (key, source)
+        while True:
+            flight = self.flights.get(flight_key)
+            if flight is None:
+                break
+            # shielded, the flight belongs to another request
+            outcome = await asyncio.shield(flight)
+            if outcome is not None:
+                self.coalesced += 1
+                ok, value = outcome
+                if ok:
+                    return value
+                raise value
+
+        flight = asyncio.get_running_loop().create_future()
+        self.flights[flight_key] = flight
+        self.calls += 1
+        outcome = None
+        try:
+            value = await call()
+            outcome = (True, value)
+            return value
+        except Exception as error:
+            outcome = (False, error)
+            raise
+        finally:
+            if self.flights.get(flight_key) is flight:
+                del self.flights[flight_key]
+            flight.set_result(outcome)
+
+    def forget(self, key):
+        for flight_key in [flight_key for flight_key in self.flights if flight_key[0] == key]:
+            del self.flights[flight_key]
+
+    def stats(self) -> dict:
+        return dict(in_flight=len(self.flights), calls=self.calls, coalesced=self.coalesced)
+
+
+items = Group("items")
+merchants = Group("merchants")
+
+groups = [items, merchants]
+
+
+def stats() -> dict:
+    return {group.name: group.stats() for group in groups}
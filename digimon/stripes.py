@@ -0,0 +1,116 @@
+import random
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import models
+
+
+# A striped wallet keeps its balance split between DBWallet.balance and
+# DBWalletStripe rows. Credits update one randomly chosen stripe, so
+# concurrent purchases from one hot merchant spread their row locks over
+# `stripes` rows instead of queueing on the single wallet row. Reads add the
+# stripes to the wallet balance, withdrawals fold them back into the wallet row
+# first. Striping only applies to the update-in-place mode, ledger wallets
+# never contend on a row in the first place.
+
+
+def stripes_sum(wallet_id):
+    return (
+        select(func.coalesce(func.sum(models.DBWalletStripe.balance), 0.0))
+        .where(models.DBWalletStripe.wallet_id == wallet_id)
+        .correlate(models.DBWallet)
+        .scalar_subquery()
+    )
+
+
+def credit_stripe(wallet_id: int, stripes: int, amount: float, stripe: int | None = None):
+    if stripe is None:
+        stripe = random.randrange(stripes)
+
+    return (
+        update(models.DBWalletStripe)
+        .where(
+            models.DBWalletStripe.wallet_id == wallet_id,
+            models.DBWalletStripe.stripe == stripe % stripes,
+        )
+        .values(balance=models.DBWalletStripe.balance + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_balances(session: AsyncSession, wallet_ids: list[int]) -> dict[int, float]:
+    if not wallet_ids:
+        return {}
+
+    result = await session.execute(
+        select(
+            models.DBWallet.id, models.DBWallet.balance + stripes_sum(models.DBWallet.id)
+        ).where(models.DBWallet.id.in_(wallet_ids))
+    )
+    return {wallet_id: balance for wallet_id, balance in result.all()}
+
+
+async def collapse(session: AsyncSession, wallet_id: int) -> models.DBWallet:
+    # Locks the wallet row and then every stripe in stripe order and folds the
+    # stripes into the wallet balance. Credits only ever lock a single stripe,
+    # so this cannot deadlock with them. The caller commits.
+    result = await session.exec(
+        select(models.DBWallet)
+        .where(models.DBWallet.id == wallet_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    dbwallet = result.one()
+
+    result = await session.exec(
+        select(models.DBWalletStripe)
+        .where(models.DBWalletStripe.wallet_id == wallet_id)
+        .order_by(models.DBWalletStripe.stripe)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    for dbstripe in result.all():
+        dbwallet.balance += dbstripe.balance
+        dbstripe.balance = 0.0
+        session.add(dbstripe)
+
+    session.add(dbwallet)
+    return dbwallet
+
+
+async def withdraw(session: AsyncSession, wallet_id: int, amount: float) -> models.DBWallet:
+    dbwallet = await collapse(session, wallet_id)
+    if dbwallet.balance < amount:
+        await session.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient balance"
+        )
+
+    dbwallet.balance -= amount
+    session.add(dbwallet)
+    await session.commit()
+    await session.refresh(dbwallet)
+    return dbwallet
+
+
+async def set_stripes(session: AsyncSession, wallet_id: int, stripes: int) -> models.DBWallet:
+    dbwallet = await collapse(session, wallet_id)
+    await session.flush()
+
+    await session.execute(
+        delete(models.DBWalletStripe).where(models.DBWalletStripe.wallet_id == wallet_id)
+    )
+    if stripes:
+        await session.execute(
+            insert(models.DBWalletStripe),
+            [dict(wallet_id=wallet_id, stripe=stripe, balance=0.0) for stripe in range(stripes)],
+        )
+
+    dbwallet.stripes = stripes
+    session.add(dbwallet)
+    await session.commit()
+    await session.refresh(dbwallet)
+    return dbwallet
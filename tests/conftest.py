@@ -13,6 +13,8 @@ from fastapi.testclient import TestClient
 from httpx import AsyncClient, ASGITransport
 from typing import Any, Dict, Optional
 from pydantic_settings import SettingsConfigDict
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import select
 from wallet_app import models, config, main, security
 
 SettingsTesting = config.Settings
@@ -49,7 +51,7 @@ async def get_session() -> models.AsyncIterator[models.AsyncSession]:
     settings = SettingsTesting()
     models.init_db(settings)
 
-    async_session = models.sessionmaker(
+    async_session = sessionmaker(
         models.engine, class_=models.AsyncSession, expire_on_commit=False
     )
     async with async_session() as session:
@@ -63,7 +65,7 @@ async def example_user1(session: models.AsyncSession) -> models.DBUser:
     role = "merchant"
 
     query = await session.exec(
-        models.select(models.DBUser).where(models.DBUser.username == username).limit(1)
+        select(models.DBUser).where(models.DBUser.username == username).limit(1)
     )
     user = query.one_or_none()
     if user:
@@ -118,7 +120,7 @@ async def example_merchant_user1(
     name = "merchant1"
 
     query = await session.exec(
-        models.select(models.DBMerchant)
+        select(models.DBMerchant)
         .where(models.DBMerchant.name == name, models.DBMerchant.user_id == user1.id)
         .limit(1)
     )
@@ -133,4 +135,112 @@ async def example_merchant_user1(
     session.add(merchant)
     await session.commit()
     await session.refresh(merchant)
-    return merchant
\ No newline at end of file
+    return merchant
+
+@pytest_asyncio.fixture(name="merchant_wallet1")
+async def example_merchant_wallet1(
+    session: models.AsyncSession, user1: models.DBUser
+) -> models.DBWallet:
+    query = await session.exec(
+        select(models.DBWallet).where(models.DBWallet.user_id == user1.id).limit(1)
+    )
+    wallet = query.one_or_none()
+    if wallet:
+        return wallet
+
+    wallet = models.DBWallet(balance=0.0, user_id=user1.id, role=models.UserRole.merchant)
+
+    session.add(wallet)
+    await session.commit()
+    await session.refresh(wallet)
+    return wallet
+
+
+@pytest_asyncio.fixture(name="item1")
+async def example_item1(
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    merchant_user1: models.DBMerchant,
+    merchant_wallet1: models.DBWallet,
+) -> models.DBItem:
+    name = "item1"
+
+    query = await session.exec(
+        select(models.DBItem)
+        .where(models.DBItem.name == name, models.DBItem.merchant_id == merchant_user1.id)
+        .limit(1)
+    )
+    item = query.one_or_none()
+    if item:
+        return item
+
+    item = models.DBItem(
+        name=name,
+        price=10.0,
+        user_id=user1.id,
+        merchant_id=merchant_user1.id,
+        role=models.UserRole.merchant,
+    )
+
+    session.add(item)
+    await session.commit()
+    await session.refresh(item)
+    return item
+
+
+@pytest_asyncio.fixture(name="customer_user1")
+async def example_customer_user1(session: models.AsyncSession) -> models.DBUser:
+    password = "123456"
+    username = "customer1"
+
+    query = await session.exec(
+        select(models.DBUser).where(models.DBUser.username == username).limit(1)
+    )
+    user = query.one_or_none()
+    if user:
+        return user
+
+    user = models.DBUser(
+        username=username,
+        password=password,
+        role=models.UserRole.customer,
+        email="customer@test.com",
+        first_name="Firstname",
+        last_name="lastname",
+    )
+    await user.set_password(password)
+
+    customer = models.DBCustomer(name="customer1", user=user)
+    wallet = models.DBWallet(balance=100.0, user=user, role=models.UserRole.customer)
+
+    session.add(user)
+    session.add(customer)
+    session.add(wallet)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@pytest_asyncio.fixture(name="token_customer_user1")
+async def oauth_token_customer_user1(customer_user1: models.DBUser) -> models.Token:
+    settings = SettingsTesting()
+    access_token_expires = datetime.timedelta(
+        minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+    user = customer_user1
+    return models.Token(
+        access_token=security.create_access_token(
+            data={"sub": user.id},
+            expires_delta=access_token_expires,
+        ),
+        refresh_token=security.create_refresh_token(
+            data={"sub": user.id},
+            expires_delta=access_token_expires,
+        ),
+        token_type="Bearer",
+        scope="",
+        expires_in=settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+        expires_at=datetime.datetime.now() + access_token_expires,
+        issued_at=datetime.datetime.now(),
+        user_id=user.id,
+    )
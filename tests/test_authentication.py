@@ -0,0 +1,66 @@
+import asyncio
+import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from digimon import logins, models
+
+
+@pytest.mark.asyncio
+async def test_login_writes_last_login_behind(
+    client: AsyncClient, session: models.AsyncSession, user1: models.DBUser
+):
+    await logins.flush()
+    last_login_date = user1.last_login_date
+
+    response = await client.post(
+        "/token", data=dict(username=user1.username, password="123456")
+    )
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+
+    response = await client.post(
+        "/token", data=dict(username=user1.email, password="123456")
+    )
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+    assert user1.id in logins.pending
+
+    await session.refresh(user1)
+    assert user1.last_login_date == last_login_date
+
+    logins.record_login(987654, logins.pending[user1.id])
+    assert await logins.flush() == 2
+    assert not logins.pending
+
+    await session.refresh(user1)
+    assert user1.last_login_date != last_login_date
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_keeps_logins(
+    session: models.AsyncSession, user1: models.DBUser
+):
+    await logins.flush()
+    login_date = datetime.datetime.now()
+    logins.record_login(user1.id, login_date)
+
+    task = asyncio.create_task(logins.flush())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert logins.pending[user1.id] == login_date
+
+    assert await logins.flush() == 1
+    await session.refresh(user1)
+    assert user1.last_login_date == login_date
+
+
+@pytest.mark.asyncio
+async def test_login_wrong_password(client: AsyncClient, user1: models.DBUser):
+    response = await client.post(
+        "/token", data=dict(username=user1.username, password="wrong")
+    )
+    assert response.status_code == 401
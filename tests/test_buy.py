@@ -0,0 +1,141 @@
+from httpx import AsyncClient
+from digimon import models
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_buy_item(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    merchant_balance = merchant_wallet1.balance
+
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["item_id"] == item1.id
+    assert data["price"] == item1.price
+    assert data["merchant_id"] == item1.merchant_id
+
+    await session.refresh(merchant_wallet1)
+    assert merchant_wallet1.balance == merchant_balance + item1.price
+
+
+@pytest.mark.asyncio
+async def test_buy_item_insufficient_balance(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    merchant_user1: models.DBMerchant,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    item = models.DBItem(
+        name="expensive item",
+        price=1_000_000.0,
+        user_id=user1.id,
+        merchant_id=merchant_user1.id,
+        role=models.UserRole.merchant,
+    )
+    session.add(item)
+    await session.commit()
+    await session.refresh(item)
+    merchant_balance = merchant_wallet1.balance
+
+    response = await client.post("/buy", json={"item_id": item.id}, headers=headers)
+
+    assert response.status_code == 400
+    await session.refresh(merchant_wallet1)
+    assert merchant_wallet1.balance == merchant_balance
+
+
+@pytest.mark.asyncio
+async def test_buy_unknown_item(client: AsyncClient, token_customer_user1: models.Token):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    response = await client.post("/buy", json={"item_id": 999999}, headers=headers)
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_buy_batch(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    merchant_user1: models.DBMerchant,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    item2 = models.DBItem(
+        name="batch item",
+        price=2.5,
+        user_id=user1.id,
+        merchant_id=merchant_user1.id,
+        role=models.UserRole.merchant,
+    )
+    session.add(item2)
+    await session.commit()
+    await session.refresh(item2)
+    merchant_balance = merchant_wallet1.balance
+
+    payload = {
+        "items": [
+            {"item_id": item1.id, "quantity": 2},
+            {"item_id": item2.id},
+        ],
+        "description": "cart",
+    }
+    response = await client.post("/buy/batch", json=payload, headers=headers)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [t["item_id"] for t in data] == [item1.id, item1.id, item2.id]
+    assert len({t["id"] for t in data}) == 3
+
+    await session.refresh(merchant_wallet1)
+    assert merchant_wallet1.balance == merchant_balance + 2 * item1.price + item2.price
+
+
+@pytest.mark.asyncio
+async def test_buy_batch_unknown_item(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    merchant_balance = merchant_wallet1.balance
+
+    payload = {"items": [{"item_id": item1.id}, {"item_id": 999999}]}
+    response = await client.post("/buy/batch", json=payload, headers=headers)
+
+    assert response.status_code == 404
+    await session.refresh(merchant_wallet1)
+    assert merchant_wallet1.balance == merchant_balance
+
+
+@pytest.mark.asyncio
+async def test_buy_batch_oversized_cart(
+    client: AsyncClient,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+
+    payloads = [
+        {"items": [{"item_id": item1.id, "quantity": models.MAX_CART_QUANTITY + 1}]},
+        {"items": [{"item_id": item1.id}] * (models.MAX_CART_ITEMS + 1)},
+        {"items": [{"item_id": item1.id, "quantity": models.MAX_CART_QUANTITY}] * 11},
+    ]
+    for payload in payloads:
+        response = await client.post("/buy/batch", json=payload, headers=headers)
+        assert response.status_code == 422
@@ -0,0 +1,26 @@
+from wallet_app import config, models
+
+
+def test_get_settings_is_cached(monkeypatch):
+    monkeypatch.setattr(config, "settings", None)
+    monkeypatch.setenv("SQLDB_URL", "sqlite+aiosqlite://")
+
+    assert config.get_settings() is config.get_settings()
+
+
+def test_set_settings(monkeypatch):
+    monkeypatch.setattr(config, "settings", None)
+    settings = config.Settings(SQLDB_URL="sqlite+aiosqlite://", SECRET_KEY="other")
+
+    config.set_settings(settings)
+
+    assert config.get_settings() is settings
+
+
+def test_engine_is_created_on_first_use():
+    manager = models.DatabaseSessionManager()
+    manager.init(config.Settings(SQLDB_URL="sqlite+aiosqlite://"))
+
+    assert not manager.started
+    assert manager.engine is not None
+    assert manager.started
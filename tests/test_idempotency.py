@@ -0,0 +1,201 @@
+import asyncio
+
+from httpx import AsyncClient
+import pytest
+from sqlmodel import select
+
+from wallet_app import idempotency, models
+
+
+async def customer_balance(session: models.AsyncSession, user: models.DBUser) -> float:
+    wallet = (
+        await session.exec(
+            select(models.DBWallet).where(models.DBWallet.user_id == user.id)
+        )
+    ).one()
+    await session.refresh(wallet)
+    return wallet.balance
+
+
+@pytest.mark.asyncio
+async def test_top_up_replay_credits_once(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "top-up-1",
+    }
+    balance = await customer_balance(session, customer_user1)
+
+    first = await client.put("/wallets/add", json={"balance": 50.0}, headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    second = await client.put("/wallets/add", json={"balance": 50.0}, headers=headers)
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.json() == first.json()
+
+    assert await customer_balance(session, customer_user1) == balance + 50.0
+
+    response = await client.put("/wallets/add", json={"balance": 60.0}, headers=headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_concurrent_buys_with_same_key_charge_once(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "buy-1",
+    }
+    balance = await customer_balance(session, customer_user1)
+    coalesced = idempotency.coalesced
+
+    responses = await asyncio.gather(
+        *[
+            client.post("/buy", json={"item_id": item1.id}, headers=headers)
+            for _ in range(5)
+        ]
+    )
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert idempotency.coalesced > coalesced
+    assert await customer_balance(session, customer_user1) == balance - item1.price
+
+
+@pytest.mark.asyncio
+async def test_buy_error_is_replayed(
+    client: AsyncClient, token_customer_user1: models.Token
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "buy-missing",
+    }
+    response = await client.post("/buy", json={"item_id": 999999}, headers=headers)
+    assert response.status_code == 404
+
+    response = await client.post("/buy", json={"item_id": 999999}, headers=headers)
+    assert response.status_code == 404
+    assert response.headers["Idempotent-Replayed"] == "true"
+
+
+@pytest.mark.asyncio
+async def test_key_is_stored_with_the_top_up(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "top-up-stored",
+    }
+
+    response = await client.put("/wallets/add", json={"balance": 5.0}, headers=headers)
+    assert response.status_code == 200
+
+    stored = await session.get(
+        models.DBIdempotencyKey, (customer_user1.id, "wallets/add", "top-up-stored")
+    )
+    assert stored.status_code == 200
+    assert stored.response["balance"] == response.json()["balance"]
+
+
+@pytest.mark.asyncio
+async def test_key_stored_by_another_worker_is_replayed(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "buy-elsewhere",
+    }
+    payload = models.CreatedTransaction(item_id=item1.id)
+    body = dict(
+        item_id=item1.id,
+        description=None,
+        id=123456,
+        price=item1.price,
+        merchant_id=item1.merchant_id,
+        customer_id=1,
+        created_at=None,
+    )
+    session.add(
+        models.DBIdempotencyKey(
+            user_id=customer_user1.id,
+            route="buy",
+            key="buy-elsewhere",
+            fingerprint=payload.model_dump_json(),
+            status_code=200,
+            response=body,
+        )
+    )
+    await session.commit()
+    balance = await customer_balance(session, customer_user1)
+
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json() == body
+    assert await customer_balance(session, customer_user1) == balance
+
+
+@pytest.mark.asyncio
+async def test_key_committed_by_another_worker_rolls_back_the_top_up(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+    monkeypatch,
+):
+    headers = {
+        "Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}",
+        "Idempotency-Key": "top-up-race",
+    }
+    balance = await customer_balance(session, customer_user1)
+    session.add(
+        models.DBIdempotencyKey(
+            user_id=customer_user1.id,
+            route="wallets/add",
+            key="top-up-race",
+            fingerprint=models.WalletAmount(balance=7.0).model_dump_json(),
+            status_code=200,
+            response=dict(id=1, user_id=customer_user1.id, balance=balance + 7.0, role="customer"),
+        )
+    )
+    await session.commit()
+
+    # the other worker commits after this request looked the key up
+    lookup = idempotency.lookup
+    lookups = []
+
+    async def late_lookup(session, store_key):
+        lookups.append(store_key)
+        if len(lookups) == 1:
+            return None
+        return await lookup(session, store_key)
+
+    monkeypatch.setattr(idempotency, "lookup", late_lookup)
+
+    response = await client.put("/wallets/add", json={"balance": 7.0}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert response.json()["balance"] == balance + 7.0
+    assert len(lookups) == 2
+    assert await customer_balance(session, customer_user1) == balance
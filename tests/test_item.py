@@ -1,6 +1,7 @@
 import pytest
 from httpx import AsyncClient
-from digimon import models
+from digimon import counts, models, pagination
+
 
 @pytest.mark.asyncio
 async def test_read_items(client: AsyncClient, session: models.AsyncSession):
@@ -10,6 +11,7 @@ async def test_read_items(client: AsyncClient, session: models.AsyncSession):
     assert "items" in data
     assert isinstance(data["items"], list)
 
+
 @pytest.mark.asyncio
 async def test_create_item(client: AsyncClient, token_user1: models.Token, session: models.AsyncSession):
     headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
@@ -27,6 +29,7 @@ async def test_create_item(client: AsyncClient, token_user1: models.Token, sessi
     assert data["price"] == payload["price"]
     assert data["id"] > 0
 
+
 @pytest.mark.asyncio
 async def test_read_item(client: AsyncClient, session: models.AsyncSession, created_item: models.DBItem):
     response = await client.get(f"/items/{created_item.id}")
@@ -35,6 +38,7 @@ async def test_read_item(client: AsyncClient, session: models.AsyncSession, crea
     assert data["id"] == created_item.id
     assert data["name"] == created_item.name
 
+
 @pytest.mark.asyncio
 async def test_update_item(client: AsyncClient, token_user1: models.Token, created_item: models.DBItem):
     headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
@@ -45,6 +49,7 @@ async def test_update_item(client: AsyncClient, token_user1: models.Token, creat
     assert data["id"] == created_item.id
     assert data["name"] == payload["name"]
 
+
 @pytest.mark.asyncio
 async def test_delete_item(client: AsyncClient, token_user1: models.Token, created_item: models.DBItem):
     headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
@@ -52,4 +57,135 @@ async def test_delete_item(client: AsyncClient, token_user1: models.Token, creat
     response = await client.delete(f"/items/{created_item.id}", headers=headers)
     assert response.status_code == 200
     data = response.json()
-    assert data["message"] == "Item deleted successfully"
\ No newline at end of file
+    assert data["message"] == "Item deleted successfully"
+
+
+@pytest.mark.asyncio
+async def test_read_items_cursor(client: AsyncClient, token_user1: models.Token):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    for i in range(5):
+        payload = {"name": f"Cursor Item {i}", "description": "", "price": 1.0}
+        response = await client.post("/items", json=payload, headers=headers)
+        assert response.status_code == 200
+
+    ids = []
+    response = await client.get("/items/2/")
+    while True:
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["items"]) <= 2
+        ids.extend(item["id"] for item in data["items"])
+        if data["next_cursor"] is None:
+            break
+        response = await client.get(
+            "/items/2/", params={"cursor": data["next_cursor"]}
+        )
+
+    assert ids == sorted(set(ids))
+    assert len(ids) >= 5
+
+    response = await client.get("/items/2/", params={"page": 2})
+    assert [item["id"] for item in response.json()["items"]] == ids[2:4]
+
+    response = await client.get("/items", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+    for after in ["1", 1.5, True, None, [1], {"id": 1}]:
+        cursor = pagination.encode_cursor(after)
+        response = await client.get("/items", params={"cursor": cursor})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_item_counts(client: AsyncClient, token_user1: models.Token, session: models.AsyncSession):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.get("/items/1/")
+    total = response.json()["page_count"]
+
+    payload = {"name": "Counted Item", "description": "", "price": 1.0}
+    response = await client.post("/items", json=payload, headers=headers)
+    item = response.json()
+    merchant_id = (await session.get(models.DBItem, item["id"])).merchant_id
+
+    response = await client.get("/items/1/")
+    assert response.json()["page_count"] == total + 1
+
+    response = await client.get("/items/1/", params={"merchant_id": merchant_id})
+    data = response.json()
+    merchant_total = data["page_count"]
+
+    response = await client.delete(f"/items/{item['id']}")
+    assert response.status_code == 200
+    response = await client.get("/items/1/", params={"merchant_id": merchant_id})
+    assert response.json()["page_count"] == merchant_total - 1
+
+    counts.counts.set(("items", None), -1)
+    await counts.resync(session)
+    assert counts.counts.get(("items", None)) == await counts.exact_item_count(session)
+
+    response = await client.get("/items/1/", params={"merchant_id": 999999})
+    assert response.json()["page_count"] == 0
+    assert counts.counts.get(("items", 999999)) is None
+
+
+@pytest.mark.asyncio
+async def test_item_counts_resync_keeps_concurrent_changes(
+    client: AsyncClient, token_user1: models.Token, session: models.AsyncSession, monkeypatch
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {"name": "Resynced Item", "description": "", "price": 1.0}
+    response = await client.post("/items", json=payload, headers=headers)
+    merchant_id = (await session.get(models.DBItem, response.json()["id"])).merchant_id
+    await client.get("/items/1/")
+    await client.get("/items/1/", params={"merchant_id": merchant_id})
+
+    exact_item_count = counts.exact_item_count
+
+    async def create_during_count(session, merchant_id=None):
+        count = await exact_item_count(session, merchant_id)
+        await client.post("/items", json=payload, headers=headers)
+        return count
+
+    monkeypatch.setattr(counts, "exact_item_count", create_during_count)
+    await counts.resync(session)
+    monkeypatch.undo()
+
+    assert counts.counts.get(("items", None)) == await counts.exact_item_count(session)
+    assert counts.counts.get(("items", merchant_id)) == await counts.exact_item_count(
+        session, merchant_id
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_item_etag(client: AsyncClient, token_user1: models.Token):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    payload = {"name": "Cached Item", "description": "", "price": 5.0}
+    response = await client.post("/items", json=payload, headers=headers)
+    item_id = response.json()["id"]
+
+    response = await client.get(f"/items/{item_id}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = await client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.get("/items/1/")
+    page_etag = response.headers["etag"]
+    response = await client.get("/items/1/", headers={"If-None-Match": page_etag})
+    assert response.status_code == 304
+
+    response = await client.put(
+        f"/items/{item_id}", params={"name": "Cached Item", "price": 6.0}
+    )
+    assert response.status_code == 200
+
+    response = await client.get(f"/items/{item_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["price"] == 6.0
+    assert response.headers["etag"] != etag
+
+    response = await client.delete(f"/items/{item_id}")
+    response = await client.get(f"/items/{item_id}")
+    assert response.status_code == 404
@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete
+from sqlmodel import select
+
+from wallet_app import jobs, models
+
+
+@pytest_asyncio.fixture(name="outbox")
+async def outbox_fixture(session: models.AsyncSession, monkeypatch):
+    await jobs.drain()
+    await session.execute(delete(models.DBJob))
+    await session.commit()
+
+    applied = []
+
+    async def record(session, payloads):
+        applied.append(payloads)
+
+    async def fail(session, payloads):
+        raise RuntimeError("handler failed")
+
+    monkeypatch.setitem(jobs.handlers, "record", record)
+    monkeypatch.setitem(jobs.handlers, "fail", fail)
+    yield applied
+
+    await session.execute(delete(models.DBJob))
+    await session.commit()
+
+
+async def outbox_rows(session: models.AsyncSession) -> list[models.DBJob]:
+    session.expire_all()
+    return (await session.exec(select(models.DBJob))).all()
+
+
+@pytest.mark.asyncio
+async def test_jobs_run_in_one_batch_and_leave_the_outbox(
+    session: models.AsyncSession, outbox: list
+):
+    submitted = [jobs.submit(session, "record", dict(n=n)) for n in range(3)]
+    await session.commit()
+    jobs.enqueue(submitted)
+
+    await jobs.drain()
+
+    assert outbox == [[dict(n=0), dict(n=1), dict(n=2)]]
+    assert await outbox_rows(session) == []
+
+
+@pytest.mark.asyncio
+async def test_sweep_picks_up_jobs_left_in_the_outbox(
+    session: models.AsyncSession, outbox: list
+):
+    # left over from a process that stopped before running it
+    session.add(
+        models.DBJob(
+            kind="record",
+            payload=dict(n=1),
+            run_after=datetime.datetime.now() - datetime.timedelta(seconds=1),
+        )
+    )
+    await session.commit()
+
+    assert await jobs.sweep() == 1
+    await jobs.drain()
+
+    assert outbox == [[dict(n=1)]]
+    assert await outbox_rows(session) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_with_backoff(
+    session: models.AsyncSession, outbox: list, monkeypatch
+):
+    monkeypatch.setattr(jobs, "max_attempts", 2)
+    good = jobs.submit(session, "record", dict(n=1))
+    bad = jobs.submit(session, "fail", dict(n=2))
+    await session.commit()
+    jobs.enqueue([good, bad])
+
+    await jobs.drain()
+
+    # the batch was rolled back and its jobs run one at a time
+    assert outbox[-1] == [dict(n=1)]
+    [row] = await outbox_rows(session)
+    assert row.id == bad.id
+    assert row.attempts == 1
+    assert row.run_after > datetime.datetime.now()
+    assert "handler failed" in row.last_error
+
+    jobs.enqueue([row])
+    await jobs.drain()
+
+    [row] = await outbox_rows(session)
+    assert row.attempts == 2
+    assert row.run_after is None
+
+
+@pytest.mark.asyncio
+async def test_full_queue_defers_to_the_outbox(
+    session: models.AsyncSession, outbox: list, monkeypatch
+):
+    monkeypatch.setattr(jobs, "queue", asyncio.Queue(1))
+    monkeypatch.setattr(jobs, "queued", set())
+    submitted = [jobs.submit(session, "record", dict(n=n)) for n in range(2)]
+    await session.commit()
+    deferred = jobs.deferred
+
+    jobs.enqueue(submitted)
+
+    assert jobs.queue.qsize() == 1
+    assert jobs.deferred == deferred + 1
+    await jobs.drain()
+    assert [row.id for row in await outbox_rows(session)] == [submitted[1].id]
@@ -0,0 +1,98 @@
+from httpx import AsyncClient
+from sqlmodel import select
+from digimon import models, ledger
+import pytest
+
+
+@pytest.fixture
+def ledger_mode(monkeypatch):
+    monkeypatch.setattr(ledger, "enabled", True)
+
+
+@pytest.mark.asyncio
+async def test_ledger_add_balance_and_buy(
+    ledger_mode,
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    customer_user1: models.DBUser,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    customer_wallet = (
+        await session.exec(
+            select(models.DBWallet).where(models.DBWallet.user_id == customer_user1.id)
+        )
+    ).one()
+    balances = await ledger.get_balances(session, [customer_wallet.id, merchant_wallet1.id])
+
+    response = await client.put("/wallets/add", json={"balance": 50.0}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == balances[customer_wallet.id] + 50.0
+
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=headers)
+    assert response.status_code == 200
+    transaction_id = response.json()["id"]
+
+    entries = (
+        await session.exec(
+            select(models.DBWalletEntry).where(
+                models.DBWalletEntry.transaction_id == transaction_id
+            )
+        )
+    ).all()
+    assert sorted(entry.amount for entry in entries) == [-item1.price, item1.price]
+
+    # wallet rows are left untouched in ledger mode
+    await session.refresh(customer_wallet)
+    await session.refresh(merchant_wallet1)
+    expected = await ledger.get_balances(session, [customer_wallet.id, merchant_wallet1.id])
+    assert expected[customer_wallet.id] == balances[customer_wallet.id] + 50.0 - item1.price
+    assert expected[merchant_wallet1.id] == balances[merchant_wallet1.id] + item1.price
+
+    assert await ledger.compact(session) >= 2
+    assert await ledger.get_balances(session, [customer_wallet.id, merchant_wallet1.id]) == expected
+    assert await ledger.compact(session) == 0
+
+
+@pytest.mark.asyncio
+async def test_ledger_insufficient_balance(
+    ledger_mode,
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    merchant_user1: models.DBMerchant,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    item = models.DBItem(
+        name="ledger expensive item",
+        price=1_000_000.0,
+        user_id=user1.id,
+        merchant_id=merchant_user1.id,
+        role=models.UserRole.merchant,
+    )
+    session.add(item)
+    await session.commit()
+    await session.refresh(item)
+
+    response = await client.post("/buy", json={"item_id": item.id}, headers=headers)
+    assert response.status_code == 400
+
+    transactions = (
+        await session.exec(
+            select(models.DBTransection).where(models.DBTransection.item_id == item.id)
+        )
+    ).all()
+    assert transactions == []
+
+
+@pytest.mark.asyncio
+async def test_ledger_wallet_cannot_be_striped(
+    ledger_mode, client: AsyncClient, token_user1: models.Token, merchant_wallet1: models.DBWallet
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.put("/wallets/stripes", json={"stripes": 4}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+from httpx import AsyncClient
+import pytest
+
+from wallet_app import instrumentation
+
+
+@pytest.mark.asyncio
+async def test_db_headers(client: AsyncClient):
+    response = await client.get("/merchants")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Queries"]) >= 1
+    assert float(response.headers["X-DB-Time-Ms"]) >= 0
+    assert float(response.headers["X-DB-Pool-Wait-Ms"]) >= 0
+    assert "X-DB-N-Plus-One" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_n_plus_one_detection(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(instrumentation, "n_plus_one_threshold", 1)
+
+    response = await client.get("/merchants")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-N-Plus-One"]) >= 1
+    assert instrumentation.routes[("GET", "/merchants")].n_plus_one >= 1
+
+
+@pytest.mark.asyncio
+async def test_read_metrics(client: AsyncClient):
+    response = await client.get("/merchants")
+    assert response.status_code == 200
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/merchants",status="200"}' in body
+    assert 'db_queries_total{method="GET",route="/merchants"}' in body
+    assert "http_request_duration_seconds_bucket" in body
+    assert 'cache_hits_total{cache="items"}' in body
@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from digimon import migrations, models
+
+
+@pytest.mark.asyncio
+async def test_migrate_adds_missing_indexes(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/migrate.db")
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(models.SQLModel.metadata.create_all)
+            await connection.execute(text("DROP INDEX ix_dbtransection_merchant_id_id"))
+            await connection.execute(text("DROP INDEX ix_users_username"))
+
+        missing = await migrations.check_schema(engine)
+        assert "dbtransection.ix_dbtransection_merchant_id_id" in missing
+        assert "users.ix_users_username" in missing
+
+        applied = await migrations.migrate(engine)
+        assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+        assert await migrations.check_schema(engine) == []
+        assert await migrations.migrate(engine) == []
+    finally:
+        await engine.dispose()
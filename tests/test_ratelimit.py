@@ -0,0 +1,67 @@
+from httpx import AsyncClient
+import pytest
+
+from wallet_app import deps, models, ratelimit
+
+
+@pytest.mark.asyncio
+async def test_caller_over_its_rate_is_refused(
+    client: AsyncClient,
+    token_user1: models.Token,
+    token_customer_user1: models.Token,
+    monkeypatch,
+):
+    monkeypatch.setattr(ratelimit, "enabled", True)
+    monkeypatch.setitem(ratelimit.limits, "buy", ratelimit.RouteLimit("buy", 0.1, 2, 0, 100))
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+
+    for _ in range(2):
+        response = await client.post("/buy", json={"item_id": 999999}, headers=headers)
+        assert response.status_code != 429
+
+    response = await client.post("/buy", json={"item_id": 999999}, headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # refused before the route, so not a single statement ran
+    assert "X-DB-Queries" not in response.headers
+
+    other = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    response = await client.post("/buy", json={"item_id": 999999}, headers=other)
+    assert response.status_code == 404
+
+    stats = (await client.get("/stats/rate_limits")).json()["buy"]
+    assert stats["rate_limited"] == 1
+    assert stats["callers"] == 2
+
+
+@pytest.mark.asyncio
+async def test_full_route_class_is_refused(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(ratelimit, "enabled", True)
+    limit = ratelimit.RouteLimit("list", 0, 1, 1, 100)
+    limit.in_flight = 1
+    monkeypatch.setitem(ratelimit.limits, "list", limit)
+
+    response = await client.get("/merchants")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    response = await client.get("/merchants/1")
+    assert response.status_code != 503
+
+
+@pytest.mark.asyncio
+async def test_anonymous_callers_are_told_apart_by_forwarded_address(
+    client: AsyncClient, monkeypatch
+):
+    monkeypatch.setattr(ratelimit, "enabled", True)
+    monkeypatch.setitem(ratelimit.limits, "list", ratelimit.RouteLimit("list", 0.1, 1, 0, 100))
+    monkeypatch.setattr(deps, "client_address_header", b"x-forwarded-for")
+
+    headers = {"X-Forwarded-For": "203.0.113.7, 10.0.0.1"}
+    response = await client.get("/merchants", headers=headers)
+    assert response.status_code == 200
+    response = await client.get("/merchants", headers=headers)
+    assert response.status_code == 429
+
+    response = await client.get("/merchants", headers={"X-Forwarded-For": "10.0.0.2"})
+    assert response.status_code == 200
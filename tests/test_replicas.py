@@ -0,0 +1,80 @@
+from httpx import AsyncClient
+import pytest
+import pytest_asyncio
+
+from wallet_app import cache, config, models, replicas
+
+
+@pytest_asyncio.fixture(name="replica")
+async def replica_fixture(client: AsyncClient, monkeypatch):
+    manager = models.DatabaseSessionManager()
+    manager.init(config.Settings(SQLDB_URL="sqlite+aiosqlite:///./test-data/replica.db"))
+    async with manager.engine.begin() as conn:
+        await conn.run_sync(models.SQLModel.metadata.drop_all)
+        await conn.run_sync(models.SQLModel.metadata.create_all)
+
+    # a merchant only the replica has, so the answer shows where a read went
+    async with manager.session() as session:
+        session.add(models.DBMerchant(id=4242, name="replica only", user_id=1))
+        await session.commit()
+
+    monkeypatch.setattr(replicas, "managers", [manager])
+    monkeypatch.setattr(replicas, "recent_writers", cache.TTLCache(100, 5))
+    client.cookies.clear()
+    yield manager
+    client.cookies.clear()
+    await manager.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_until_client_writes(client: AsyncClient, replica):
+    response = await client.get("/merchants/4242")
+    assert response.status_code == 200
+    assert response.json()["name"] == "replica only"
+
+    await client.put("/items/999999", params={"name": "missing", "price": 1.0})
+
+    response = await client.get("/merchants/4242")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_is_per_user(
+    client: AsyncClient, replica, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    await client.put(
+        "/items/999999", params={"name": "missing", "price": 1.0}, headers=headers
+    )
+
+    response = await client.get("/merchants/4242", headers=headers)
+    assert response.status_code == 404
+
+    response = await client.get("/merchants/4242")
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_read_your_writes_across_workers(
+    client: AsyncClient, replica, token_user1: models.Token, monkeypatch
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    response = await client.put(
+        "/items/999999", params={"name": "missing", "price": 1.0}, headers=headers
+    )
+    cookie = response.cookies[replicas.COOKIE]
+
+    # the next read reaches a worker that did not see the write
+    monkeypatch.setattr(replicas, "recent_writers", cache.TTLCache(100, 5))
+
+    response = await client.get("/merchants/4242", headers=headers)
+    assert response.status_code == 404
+
+    # the cookie is signed for the user who wrote
+    response = await client.get("/merchants/4242")
+    assert response.status_code == 200
+
+    written, _, signature = cookie.partition(":")
+    client.cookies.set(replicas.COOKIE, f"{float(written) + 60}:{signature}")
+    response = await client.get("/merchants/4242", headers=headers)
+    assert response.status_code == 200
@@ -0,0 +1,75 @@
+import datetime
+
+from httpx import AsyncClient
+import pytest
+
+from wallet_app import jobs, models
+
+
+@pytest.mark.asyncio
+async def test_buy_updates_merchant_sales(
+    client: AsyncClient,
+    token_user1: models.Token,
+    token_customer_user1: models.Token,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    merchant_headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    url = f"/merchants/{item1.merchant_id}/sales"
+    before = (await client.get(url, headers=merchant_headers)).json()
+
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=headers)
+    assert response.status_code == 200
+    await jobs.drain()
+
+    response = await client.get(url, headers=merchant_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["quantity"] == before["quantity"] + 1
+    assert data["revenue"] == pytest.approx(before["revenue"] + item1.price)
+    assert data["days"][-1]["day"] == datetime.date.today().isoformat()
+    assert item1.id in [item["item_id"] for item in data["items"]]
+
+
+@pytest.mark.asyncio
+async def test_merchant_sales_range(
+    client: AsyncClient, merchant_user1: models.DBMerchant, token_user1: models.Token
+):
+    headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    url = f"/merchants/{merchant_user1.id}/sales"
+
+    response = await client.get(
+        url, params={"start": "2024-02-01", "end": "2024-01-01"}, headers=headers
+    )
+    assert response.status_code == 400
+
+    response = await client.get(
+        url, params={"start": "2020-01-01", "end": "2024-01-01"}, headers=headers
+    )
+    assert response.status_code == 400
+
+    response = await client.get(
+        url, params={"start": "2024-01-01", "end": "2024-01-31"}, headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json()["start"] == "2024-01-01"
+
+
+@pytest.mark.asyncio
+async def test_merchant_sales_are_private(
+    client: AsyncClient,
+    merchant_user1: models.DBMerchant,
+    token_customer_user1: models.Token,
+):
+    url = f"/merchants/{merchant_user1.id}/sales"
+
+    response = await client.get(url)
+    assert response.status_code == 401
+
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    response = await client.get(url, headers=headers)
+    assert response.status_code == 403
+
+    response = await client.get("/merchants/999999/sales", headers=headers)
+    assert response.status_code == 404
@@ -0,0 +1,32 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from digimon import security
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_password():
+    hashed = await security.hash_password("123456")
+
+    assert await security.verify_password("123456", hashed)
+    assert not await security.verify_password("654321", hashed)
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_fails_fast_when_queue_is_full():
+    hasher = security.PasswordHasher(workers=1, queue_limit=0)
+    try:
+        slow = asyncio.create_task(hasher.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException) as e:
+            await hasher.run(time.sleep, 0)
+
+        assert e.value.status_code == 503
+        await slow
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.close()
@@ -0,0 +1,19 @@
+from wallet_app import config, server
+
+
+def test_size_pool_splits_connections_between_workers():
+    settings = config.Settings(SQLDB_URL="sqlite+aiosqlite://", DB_MAX_CONNECTIONS=20)
+
+    server.size_pool(settings, 4)
+
+    assert settings.DB_POOL_SIZE == 5
+    assert settings.DB_MAX_OVERFLOW == 0
+
+
+def test_size_pool_keeps_pool_settings_without_budget():
+    settings = config.Settings(SQLDB_URL="sqlite+aiosqlite://", DB_POOL_SIZE=7)
+
+    server.size_pool(settings, 4)
+
+    assert settings.DB_POOL_SIZE == 7
+    assert server.worker_count(settings) >= 1
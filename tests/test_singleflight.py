@@ -0,0 +1,108 @@
+import asyncio
+
+from fastapi import HTTPException
+from httpx import AsyncClient
+import pytest
+
+from wallet_app import models, singleflight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_call():
+    group = singleflight.Group("test")
+    started = 0
+
+    async def lookup():
+        nonlocal started
+        started += 1
+        await asyncio.sleep(0.01)
+        return object()
+
+    results = await asyncio.gather(*[group.do(1, lookup) for _ in range(10)])
+
+    assert started == 1
+    assert len({id(result) for result in results}) == 1
+    assert group.stats() == dict(in_flight=0, calls=1, coalesced=9)
+
+    await group.do(1, lookup)
+    assert started == 2
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_sources_are_separate():
+    group = singleflight.Group("test")
+
+    async def missing():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=404, detail="not found")
+
+    results = await asyncio.gather(
+        *[group.do(1, missing, source=source) for source in ["primary"] * 3 + ["replica"] * 2],
+        return_exceptions=True,
+    )
+
+    assert [result.status_code for result in results] == [404] * 5
+    assert group.calls == 2
+    assert group.coalesced == 3
+
+
+@pytest.mark.asyncio
+async def test_waiters_run_the_lookup_when_the_first_is_cancelled():
+    group = singleflight.Group("test")
+    release = asyncio.Event()
+
+    async def blocked():
+        await release.wait()
+        return "first"
+
+    async def lookup():
+        return "second"
+
+    first = asyncio.create_task(group.do(1, blocked))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(group.do(1, lookup))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    assert await second == "second"
+    assert group.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_forget_starts_a_new_lookup():
+    group = singleflight.Group("test")
+    release = asyncio.Event()
+
+    async def before_write():
+        await release.wait()
+        return "old"
+
+    async def after_write():
+        return "new"
+
+    first = asyncio.create_task(group.do(1, before_write))
+    await asyncio.sleep(0)
+    group.forget(1)
+
+    assert await group.do(1, after_write) == "new"
+    release.set()
+    assert await first == "old"
+    assert group.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_merchant_reads_are_coalesced(
+    client: AsyncClient, merchant_user1: models.DBMerchant
+):
+    calls = singleflight.merchants.calls
+
+    responses = await asyncio.gather(
+        *[client.get(f"/merchants/{merchant_user1.id}") for _ in range(20)]
+    )
+
+    assert [response.status_code for response in responses] == [200] * 20
+    assert len({response.text for response in responses}) == 1
+    assert singleflight.merchants.calls - calls < 20
+
+    stats = (await client.get("/stats/singleflight")).json()
+    assert stats["merchants"]["coalesced"] > 0
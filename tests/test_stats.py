@@ -0,0 +1,26 @@
+from httpx import AsyncClient
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_read_pool_stats(client: AsyncClient):
+    response = await client.get("/items?page=1")
+    assert response.status_code == 200
+
+    response = await client.get("/stats/pool")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["checked_out"] >= 0
+    assert data["waiters"] == 0
+    assert data["acquired"] > 0
+
+
+@pytest.mark.asyncio
+async def test_read_item_cache_stats(client: AsyncClient):
+    response = await client.get("/stats/item_cache")
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["items"]["maxsize"] > 0
+    assert data["pages"]["size"] >= 0
@@ -0,0 +1,103 @@
+from httpx import AsyncClient
+from digimon import models
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_striped_merchant_wallet(
+    client: AsyncClient,
+    token_user1: models.Token,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    merchant_headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    customer_headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+
+    response = await client.get(f"/wallets/{user1.id}")
+    balance = response.json()["balance"]
+
+    response = await client.put("/wallets/stripes", json={"stripes": 4}, headers=merchant_headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == balance
+
+    for _ in range(3):
+        response = await client.post("/buy", json={"item_id": item1.id}, headers=customer_headers)
+        assert response.status_code == 200
+
+    response = await client.get(f"/wallets/{user1.id}")
+    assert response.json()["balance"] == balance + 3 * item1.price
+
+    response = await client.put("/wallets/withdraw", json={"balance": item1.price}, headers=merchant_headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == balance + 2 * item1.price
+
+    response = await client.put("/wallets/stripes", json={"stripes": 0}, headers=merchant_headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == balance + 2 * item1.price
+
+
+@pytest.mark.asyncio
+async def test_customer_cannot_stripe_wallet(client: AsyncClient, token_customer_user1: models.Token):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    response = await client.put("/wallets/stripes", json={"stripes": 4}, headers=headers)
+
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_credit_falls_back_to_wallet_without_stripes(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    customer_headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+
+    response = await client.get(f"/wallets/{user1.id}")
+    balance = response.json()["balance"]
+
+    # as if the stripes were removed between the lookup and the credit
+    merchant_wallet1.stripes = 4
+    session.add(merchant_wallet1)
+    await session.commit()
+
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=customer_headers)
+    assert response.status_code == 200
+
+    merchant_wallet1.stripes = 0
+    session.add(merchant_wallet1)
+    await session.commit()
+
+    response = await client.get(f"/wallets/{user1.id}")
+    assert response.json()["balance"] == balance + item1.price
+
+
+@pytest.mark.asyncio
+async def test_top_up_striped_wallet_reports_full_balance(
+    client: AsyncClient,
+    token_user1: models.Token,
+    token_customer_user1: models.Token,
+    user1: models.DBUser,
+    item1: models.DBItem,
+    merchant_wallet1: models.DBWallet,
+):
+    merchant_headers = {"Authorization": f"{token_user1.token_type} {token_user1.access_token}"}
+    customer_headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+
+    response = await client.put("/wallets/stripes", json={"stripes": 4}, headers=merchant_headers)
+    assert response.status_code == 200
+    # lands on a stripe, not on the wallet row
+    response = await client.post("/buy", json={"item_id": item1.id}, headers=customer_headers)
+    assert response.status_code == 200
+    balance = (await client.get(f"/wallets/{user1.id}")).json()["balance"]
+
+    response = await client.put("/wallets/add", json={"balance": 5.0}, headers=merchant_headers)
+    assert response.status_code == 200
+    assert response.json()["balance"] == balance + 5.0
+
+    response = await client.put("/wallets/stripes", json={"stripes": 0}, headers=merchant_headers)
+    assert response.status_code == 200
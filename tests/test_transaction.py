@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+
+from digimon import exports, models
+
+
+@pytest.mark.asyncio
+async def test_export_transections(
+    client: AsyncClient, session: models.AsyncSession, monkeypatch
+):
+    transections = [
+        models.DBTransection(item_id=1, price=float(i), merchant_id=9001, customer_id=i % 2)
+        for i in range(7)
+    ]
+    session.add_all(transections)
+    await session.commit()
+    ids = [transection.id for transection in transections]
+    monkeypatch.setattr(exports, "CHUNK_SIZE", 3)
+
+    response = await client.get(
+        "/transections/export", params={"merchant_id": 9001}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert rows[0]["created_at"] == transections[0].created_at.isoformat()
+
+    response = await client.get(
+        "/transections/export",
+        params={"format": "csv", "merchant_id": 9001, "customer_id": 1, "min_id": ids[2]},
+    )
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == [ids[3], ids[5]]
+    assert rows[0]["created_at"] == transections[3].created_at.isoformat()
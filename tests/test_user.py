@@ -0,0 +1,135 @@
+import datetime
+
+from httpx import AsyncClient
+from sqlmodel import select
+from digimon import models, deps, onboarding, security
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_principal_cache(client: AsyncClient, session: models.AsyncSession):
+    user = models.DBUser(
+        username="cached-user",
+        password="-",
+        role=models.UserRole.customer,
+        email="cached@test.com",
+        first_name="Firstname",
+        last_name="lastname",
+    )
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+
+    token = security.create_access_token(
+        data={"sub": user.id}, expires_delta=datetime.timedelta(minutes=5)
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    response = await client.get(f"/users/{user.id}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == user.username
+
+    hits = deps.principal_cache.hits
+    response = await client.get(f"/users/{user.id}", headers=headers)
+    assert response.status_code == 200
+    assert deps.principal_cache.hits == hits + 1
+
+    response = await client.delete(f"/users/{user.id}", headers=headers)
+    assert response.status_code == 200
+
+    response = await client.get(f"/users/{user.id}", headers=headers)
+    assert response.status_code == 401
+
+    response = await client.get("/stats/principal_cache")
+    assert response.status_code == 200
+    assert response.json()["principals"]["hits"] > 0
+
+
+async def admin_headers(session: models.AsyncSession) -> dict:
+    query = await session.exec(
+        select(models.DBUser).where(models.DBUser.username == "admin1")
+    )
+    admin = query.one_or_none()
+    if admin is None:
+        admin = models.DBUser(
+            username="admin1",
+            password="-",
+            role=models.UserRole.admin,
+            email="admin@test.com",
+            first_name="Firstname",
+            last_name="lastname",
+        )
+        session.add(admin)
+        await session.commit()
+        await session.refresh(admin)
+
+    token = security.create_access_token(
+        data={"sub": admin.id}, expires_delta=datetime.timedelta(minutes=5)
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_onboard_users(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    user1: models.DBUser,
+    token_customer_user1: models.Token,
+    monkeypatch,
+):
+    def row(username, role, **kwargs):
+        return dict(
+            username=username,
+            email=f"{username}@test.com",
+            first_name="Firstname",
+            last_name="lastname",
+            password="password",
+            role=role,
+            name=f"{username} profile",
+            **kwargs,
+        )
+
+    users = [
+        row("onboard-merchant", "merchant"),
+        row("onboard-customer", "customer", balance=50.0),
+        dict(username="onboard-broken", role="customer"),
+        row(user1.username, "customer"),
+        row("onboard-customer", "customer"),
+        row("onboard-admin", "admin"),
+        row("onboard-rich", "customer", balance=1e12),
+    ]
+    headers = await admin_headers(session)
+
+    response = await client.post("/users/onboard", json=dict(users=users), headers=headers)
+    assert response.status_code == 404
+
+    monkeypatch.setattr(onboarding, "enabled", True)
+    response = await client.post("/users/onboard", json=dict(users=users))
+    assert response.status_code == 401
+    customer = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    response = await client.post("/users/onboard", json=dict(users=users), headers=customer)
+    assert response.status_code == 403
+
+    response = await client.post("/users/onboard", json=dict(users=users), headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert [error["row"] for error in data["errors"]] == [2, 3, 4, 5, 6]
+
+    response = await client.post(
+        "/token", data=dict(username="onboard-customer", password="password")
+    )
+    assert response.status_code == 200
+
+    result = await session.exec(
+        select(models.DBWallet)
+        .join(models.DBUser, models.DBUser.id == models.DBWallet.user_id)
+        .where(models.DBUser.username == "onboard-customer")
+    )
+    assert result.one().balance == 50.0
+    result = await session.exec(
+        select(models.DBMerchant)
+        .join(models.DBUser, models.DBUser.id == models.DBMerchant.user_id)
+        .where(models.DBUser.username == "onboard-merchant")
+    )
+    assert result.one().name == "onboard-merchant profile"
@@ -1,4 +1,5 @@
 from httpx import AsyncClient
+from sqlmodel import select
 from digimon import models
 import pytest
 
@@ -58,4 +59,28 @@ async def test_list_merchants(client: AsyncClient, merchant_user1: models.DBMerc
 
     assert found_merchant is not None
     assert found_merchant["id"] == merchant_user1.id
-    assert found_merchant["name"] == merchant_user1.name
\ No newline at end of file
+    assert found_merchant["name"] == merchant_user1.name
+
+@pytest.mark.asyncio
+async def test_wallet_amounts_must_be_positive(
+    client: AsyncClient,
+    session: models.AsyncSession,
+    customer_user1: models.DBUser,
+    token_customer_user1: models.Token,
+):
+    headers = {"Authorization": f"{token_customer_user1.token_type} {token_customer_user1.access_token}"}
+    wallet = (
+        await session.exec(
+            select(models.DBWallet).where(models.DBWallet.user_id == customer_user1.id)
+        )
+    ).one()
+    await session.refresh(wallet)
+    balance = wallet.balance
+
+    for path in ["/wallets/withdraw", "/wallets/add"]:
+        for amount in [-500.0, 0.0]:
+            response = await client.put(path, json={"balance": amount}, headers=headers)
+            assert response.status_code == 422
+
+    await session.refresh(wallet)
+    assert wallet.balance == balance